@@ -6,10 +6,18 @@ import glob
 import subprocess
 import time
 from datetime import datetime
-from labman.server import app
 from dotenv import load_dotenv, dotenv_values
 import difflib
 
+def _setup_database():
+    """Apply pending migrations and bootstrap defaults once, before any server process starts"""
+    from labman.server import app
+    from labman.lib.data import init_db
+
+    with app.app_context():
+        init_db()
+    return app
+
 def _stop_server(quiet=False):
     """Internal helper to stop the production server"""
     pid_file = "gunicorn.pid"
@@ -69,6 +77,7 @@ def serve(mode, port, host):
     """Start (dev/prod) or stop the server"""
     if mode == 'dev':
         click.echo(f"Starting dev server on {host}:{port}...")
+        app = _setup_database()
         app.run(debug=True, host=host, port=port)
     
     elif mode == 'stop':
@@ -83,6 +92,13 @@ def serve(mode, port, host):
             time.sleep(1) # Give it a moment to release the port
         click.echo(f"Starting prod server on {host}:{port} using gunicorn...")
         
+        # Migrate here, once, so the workers start against a current schema
+        try:
+            _setup_database()
+        except Exception as e:
+            click.secho(f"Database setup failed: {e}", fg="red")
+            return
+        
         # Check if gunicorn is installed
         gunicorn_cmd = "gunicorn"
         if os.path.exists(".venv/bin/gunicorn"):
@@ -139,6 +155,10 @@ def log():
 def backup(action, frequency):
     """Backup the database files"""
     load_dotenv()
+    if os.getenv('DATABASE_URL'):
+        click.secho("DATABASE_URL is set: back up the PostgreSQL database with pg_dump, e.g.", fg="yellow")
+        click.echo('  pg_dump --format=custom --file=backup/labman.dump "$DATABASE_URL"')
+        return
     db_filename = os.getenv('LAB_NAME', 'Demo Lab').lower().replace(" ", "_") + '.db'
     db_path = os.path.join('data', db_filename)
     
@@ -151,7 +171,15 @@ def backup(action, frequency):
     if action == 'now':
         date_str = datetime.now().strftime('%Y-%m-%d')
         backup_file = f"backup/{date_str}.db"
-        shutil.copy2(db_path, backup_file)
+        # Use SQLite's online backup so pages still in the WAL file are included
+        import sqlite3
+        src = sqlite3.connect(db_path)
+        dst = sqlite3.connect(backup_file)
+        try:
+            src.backup(dst)
+        finally:
+            dst.close()
+            src.close()
         click.secho(f"Backup created: {backup_file}", fg="green")
         
     elif action == 'auto' or action == 'stop':
@@ -249,6 +277,88 @@ def test(target):
         except Exception as e:
             click.secho(f"Failed to clear data: {e}", fg="red")
 
+@main.group()
+def db():
+    """Database maintenance commands"""
+    pass
+
+@db.command()
+@click.option('--to', 'target', type=int, default=None, help='Stop at this schema version')
+def migrate(target):
+    """Apply pending schema migrations"""
+    from labman.server import app
+    from labman.lib.data import get_db, get_pool, bootstrap_defaults
+    from labman.lib.migrations import migrate as apply_migrations, get_schema_version, latest_version
+
+    with app.app_context():
+        db_conn = get_db()
+        directory = get_pool().migrations_dir
+        click.echo(f"Schema version: {get_schema_version(db_conn)} (latest: {latest_version(directory)})")
+        try:
+            applied = apply_migrations(db_conn, target=target, directory=directory)
+            if target is None:
+                bootstrap_defaults(db_conn)
+        except Exception as e:
+            raise click.ClickException(f"Migration failed: {e}")
+
+        if not applied:
+            click.secho("Database schema is up to date.", fg="green")
+            return
+        for version, name in applied:
+            click.echo(f"  Applied {version:04d}_{name}")
+        click.secho(f"Migrated to version {get_schema_version(db_conn)}.", fg="green")
+
+@db.command()
+@click.option('--file', 'path', default=None, help='Slow-query log to read (default: SQL_SLOW_LOG)')
+@click.option('--top', default=20, help='Number of statements to show')
+def slowlog(path, top):
+    """Summarize the slow-query log by statement fingerprint"""
+    from labman.lib.instrumentation import read_slow_log, summarize_slow_log, SQL_SLOW_LOG
+
+    path = path or SQL_SLOW_LOG
+    if not os.path.exists(path):
+        click.secho(f"No slow-query log at {path}", fg="yellow")
+        return
+
+    summaries = summarize_slow_log(read_slow_log(path))
+    if not summaries:
+        click.secho("No slow queries recorded.", fg="green")
+        return
+
+    for item in summaries[:top]:
+        click.secho(f"[{item['fingerprint']}] {item['count']}x  total {item['total_ms']:.0f} ms  "
+                    f"avg {item['avg_ms']:.1f} ms  max {item['max_ms']:.1f} ms  last {item['last_seen']}", bold=True)
+        click.echo(f"  {item['sql']}")
+        for shape in item['params']:
+            click.echo(f"  params: ({shape})")
+        for step in item['plan'] or ['(no plan captured)']:
+            color = "red" if step.startswith('SCAN') else None
+            click.secho(f"  plan: {step}", fg=color)
+        click.echo()
+
+@db.command('index-text')
+@click.option('--all', 'reindex_all', is_flag=True, help='Re-extract every upload, not only those not indexed yet')
+def index_text(reindex_all):
+    """Extract and index the text of uploaded documents for search"""
+    from labman.server import app
+    from labman.lib.data import get_db, query_db
+    from labman.lib.extraction import index_content_text
+
+    with app.app_context():
+        where = '' if reindex_all else ' WHERE text_status IS NULL'
+        ids = [row['id'] for row in query_db(f'SELECT id FROM content{where} ORDER BY id')]
+        if not ids:
+            click.secho("All uploads are indexed.", fg="green")
+            return
+
+        counts = {}
+        with click.progressbar(ids, label=f"Indexing {len(ids)} uploads") as bar:
+            for content_id in bar:
+                status = index_content_text(get_db(), content_id)
+                counts[status] = counts.get(status, 0) + 1
+        summary = ', '.join(f"{count} {status}" for status, count in counts.items() if status)
+        click.secho(f"Done: {summary}.", fg="red" if counts.get('failed') else "green")
+
 @main.command()
 def status():
     """Check the status of the production server"""
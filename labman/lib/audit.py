@@ -1,19 +1,29 @@
-from labman.lib.data import execute_db, query_db
+from labman.lib.data import execute_db, query_db, stream_db
 
 def log_action(user_id, action, details=None):
     """Log an action to the audit_logs table"""
     try:
+        # Audit entries don't need a result, so let the writer thread batch them
         execute_db(
             'INSERT INTO audit_logs (user_id, action, details) VALUES (?, ?, ?)',
-            (user_id, action, details)
+            (user_id, action, details),
+            wait=False
         )
         return True
     except Exception as e:
         print(f"Error logging action: {e}")
         return False
 
-def get_audit_logs(limit=100, user_id=None, action=None):
-    """Get recent audit logs with user names and optional filters"""
+def _stream_audit_logs(query, params):
+    """Yield audit log rows lazily, logging any error before passing it on to the consumer"""
+    try:
+        yield from stream_db(query, params)
+    except Exception as e:
+        print(f"Error streaming audit logs: {e}")
+        raise
+
+def get_audit_logs(limit=100, user_id=None, action=None, stream=False):
+    """Get recent audit logs with user names and optional filters (stream=True yields them lazily)"""
     try:
         query = '''
             SELECT a.*, u.name as user_name
@@ -31,8 +41,13 @@ def get_audit_logs(limit=100, user_id=None, action=None):
             query += ' AND a.action = ?'
             params.append(action)
             
-        query += ' ORDER BY a.created_at DESC LIMIT ?'
-        params.append(limit)
+        query += ' ORDER BY a.created_at DESC'
+        if limit:
+            query += ' LIMIT ?'
+            params.append(limit)
+        
+        if stream:
+            return _stream_audit_logs(query, params)
         
         logs = query_db(query, params)
         return [dict(log) for log in logs]
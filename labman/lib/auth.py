@@ -1,7 +1,15 @@
-from flask import session, redirect, url_for, flash
+import os
+from flask import session, redirect, url_for, flash, g, has_app_context
 from functools import wraps
 from werkzeug.security import check_password_hash
 from labman.lib.data import get_db, query_db
+from labman.lib.cache import TTLCache
+
+# Seconds a worker may reuse a user's id, name, email and admin flag before
+# reading them again (changes made through lib.users apply at once)
+PRINCIPAL_CACHE_TTL = float(os.getenv('PRINCIPAL_CACHE_TTL', '30'))
+
+_principals = TTLCache(PRINCIPAL_CACHE_TTL)
 
 def login_user(email, password):
     """Authenticate user and return user object if successful"""
@@ -15,14 +23,33 @@ def logout_user():
     """Clear user session"""
     session.clear()
 
+def _load_principal(user_id):
+    user = query_db('SELECT id, name, email, is_admin FROM users WHERE id = ?', [user_id], one=True)
+    return dict(user) if user else None
+
+def get_principal(user_id):
+    """Get id, name, email and is_admin of a user, looked up at most once per request"""
+    if not user_id:
+        return None
+    user_id = int(user_id)
+    principals = g.setdefault('principals', {}) if has_app_context() else {}
+    if user_id not in principals:
+        principals[user_id] = _principals.get(user_id, lambda: _load_principal(user_id))
+    user = principals[user_id]
+    return dict(user) if user else None
+
+def invalidate_principal(user_id):
+    """Forget the cached details of a user after they change"""
+    user_id = int(user_id)
+    _principals.invalidate(user_id)
+    if has_app_context():
+        g.get('principals', {}).pop(user_id, None)
+
 def get_current_user():
     """Get currently logged in user"""
     if 'user_id' not in session:
         return None
-    
-    user = query_db('SELECT id, name, email, is_admin FROM users WHERE id = ?', 
-                    [session['user_id']], one=True)
-    return dict(user) if user else None
+    return get_principal(session['user_id'])
 
 def is_admin():
     """Check if current user is admin"""
@@ -37,7 +64,7 @@ def require_login(f):
             return redirect(url_for('login'))
         
         # Verify user still exists in database
-        user = query_db('SELECT id FROM users WHERE id = ?', [session['user_id']], one=True)
+        user = get_current_user()
         if not user:
             # User was deleted, clear session
             session.clear()
@@ -56,7 +83,7 @@ def require_admin(f):
             return redirect(url_for('login'))
         
         # Verify user still exists in database
-        user = query_db('SELECT id, email, is_admin FROM users WHERE id = ?', [session['user_id']], one=True)
+        user = get_current_user()
         if not user:
             # User was deleted, clear session
             session.clear()
@@ -75,14 +102,13 @@ def check_user_group_access(user_id, group_id):
         return False
     
     # Admins have access to all groups
-    user = query_db('SELECT is_admin FROM users WHERE id = ?', [user_id], one=True)
+    user = get_principal(user_id)
     if user and user['is_admin']:
         return True
     
     # Check if user is member of the group
-    membership = query_db('SELECT id FROM user_groups WHERE user_id = ? AND group_id = ?',
-                         [user_id, group_id], one=True)
-    return membership is not None
+    from labman.lib.groups import is_group_member
+    return is_group_member(user_id, group_id)
 
 def check_content_ownership(user_id, content_id):
     """Check if user owns the content"""
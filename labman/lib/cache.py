@@ -0,0 +1,113 @@
+"""
+Per-worker caches of values built from the database.
+
+The data_versions table holds one counter per kind of cached data. Triggers
+bump the counter on every write to the tables that data is built from, so
+writes made by any code path, worker or host invalidate it. Readers compare
+the counter (a primary-key lookup) with the version their cached value was
+built from and rebuild only when it moved. TTLCache is for values the
+writers invalidate themselves, where other workers may serve a stale value
+for at most the TTL.
+"""
+import time
+import threading
+from labman.lib import data
+from labman.lib.data import query_db
+
+
+def get_data_versions(names):
+    """Get the current values of several data-version counters in one query, as {name: version}"""
+    names = list(names)
+    if not names:
+        return {}
+    placeholders = ', '.join('?' * len(names))
+    rows = query_db(f'SELECT name, version FROM data_versions WHERE name IN ({placeholders})', names)
+    versions = dict.fromkeys(names, 0)
+    versions.update((row['name'], row['version']) for row in rows)
+    return versions
+
+def get_data_version(name):
+    """Get the current value of a data-version counter"""
+    return get_data_versions([name])[name]
+
+
+class VersionedCache:
+    """
+    Values built from the database, each remembered with the data version
+    it was built from.
+
+    The version must be read before building, so a write that lands while a
+    value is being built only ever makes the entry look older than it is.
+    Values built inside an open transaction are not kept, as a rollback
+    would hand their version number to different data. Entries are kept per
+    database, and the oldest are dropped beyond max_entries. Cached values
+    are shared between requests and must not be modified by callers.
+    """
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, key, version, build):
+        """Return the value cached for key at version, building it with build() if needed"""
+        key = (data._database_target(), key)
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] == version:
+            return entry[1]
+        value = build()
+        if data.get_db().transaction_depth:
+            return value
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = (version, value)
+            while len(self._entries) > self.max_entries:
+                self._entries.pop(next(iter(self._entries)))
+        return value
+
+    def clear(self):
+        """Drop every entry"""
+        with self._lock:
+            self._entries.clear()
+
+
+class TTLCache:
+    """
+    Values built from the database that expire ttl seconds after they were
+    built, unless invalidated sooner. Entries are kept per database, None is
+    never cached, and a ttl of 0 disables caching.
+    """
+
+    def __init__(self, ttl, max_entries=4096):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, key, build):
+        """Return the unexpired value cached for key, building it with build() if needed"""
+        if self.ttl <= 0:
+            return build()
+        key = (data._database_target(), key)
+        now = time.monotonic()
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] > now:
+            return entry[1]
+        value = build()
+        if value is not None:
+            with self._lock:
+                self._entries.pop(key, None)
+                self._entries[key] = (now + self.ttl, value)
+                while len(self._entries) > self.max_entries:
+                    self._entries.pop(next(iter(self._entries)))
+        return value
+
+    def invalidate(self, key):
+        """Drop the entry for key"""
+        with self._lock:
+            self._entries.pop((data._database_target(), key), None)
+
+    def clear(self):
+        """Drop every entry"""
+        with self._lock:
+            self._entries.clear()
@@ -1,7 +1,8 @@
 import os
+import re
 import secrets
 from werkzeug.utils import secure_filename
-from labman.lib.data import get_db, query_db, execute_db
+from labman.lib.data import get_db, get_pool, query_db, execute_db, transaction, stream_db, paginate, DB_PAGE_SIZE_MAX
 from labman.lib.auth import check_user_group_access
 from labman.lib.helpers import get_lab_members
 from labman.lib.email_queue import email_queue
@@ -45,8 +46,9 @@ def upload_content(file, title, description, uploaded_by, group_id=None, meeting
         if not is_valid:
             sanitized_description = ""  # Allow empty description
         
+        from labman.lib.uploads import receive, default_upload_folder
         if upload_folder is None:
-            upload_folder = os.path.join(os.getcwd(), 'data', 'uploads')
+            upload_folder = default_upload_folder()
         
         filename = secure_filename(sanitized_filename)
         
@@ -58,31 +60,35 @@ def upload_content(file, title, description, uploaded_by, group_id=None, meeting
         if research_plan_id:
             save_path = os.path.join(save_path, f"research_{research_plan_id}")
         
-        os.makedirs(save_path, exist_ok=True)
-        
-        base_filename = filename
-        counter = 1
-        while os.path.exists(os.path.join(save_path, filename)):
-            name, ext = os.path.splitext(base_filename)
-            filename = f"{name}_{counter}{ext}"
-            counter += 1
-        
-        file_path = os.path.join(save_path, filename)
-        file.save(file_path)
-        
-        file_size = os.path.getsize(file_path)
+        # Streamed requests already wrote, sized and hashed the file on arrival
+        incoming = receive(file, upload_folder, uploaded_by)
+        file_path = incoming.store(save_path, filename)
+        filename = os.path.basename(file_path)
         
         # Share link is no longer automatically generated as link access is deprecated
         share_link = None
         
-        cursor = execute_db(
-            '''INSERT INTO content (title, description, filename, file_path, file_size, 
-               uploaded_by, group_id, meeting_id, research_plan_id, access_level, share_link) 
-               VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''',
-            (sanitized_title, sanitized_description, filename, file_path, file_size, uploaded_by, 
-             group_id, meeting_id, research_plan_id, access_level, share_link)
-        )
-        content_id = cursor.lastrowid
+        from labman.lib.audit import log_action
+        try:
+            with transaction():
+                cursor = execute_db(
+                    '''INSERT INTO content (title, description, filename, file_path, file_size, sha256,
+                       uploaded_by, group_id, meeting_id, research_plan_id, access_level, share_link) 
+                       VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''',
+                    (sanitized_title, sanitized_description, filename, file_path, incoming.size, incoming.sha256,
+                     uploaded_by, group_id, meeting_id, research_plan_id, access_level, share_link)
+                )
+                content_id = cursor.lastrowid
+                
+                # Log action
+                log_action(uploaded_by, "uploaded content", f"Title: {sanitized_title}")
+        except Exception:
+            os.remove(file_path)
+            raise
+        
+        # Index the document's text for search, off the request path
+        from labman.lib.extraction import queue_text_extraction
+        queue_text_extraction(content_id)
         
         # Send notification if uploaded to a meeting
         if meeting_id:
@@ -100,17 +106,13 @@ def upload_content(file, title, description, uploaded_by, group_id=None, meeting
                     # Queue bulk content notification
                     email_queue.enqueue(send_content_bulk_notification, uploader=uploader, recipients=members, meeting=meeting, content=content_item)
         
-        # Log action
-        from labman.lib.audit import log_action
-        log_action(uploaded_by, "uploaded content", f"Title: {sanitized_title}")
-        
         return True
     except Exception as e:
         print(f"Error uploading content: {e}")
         return False
 
-def get_content(user_id=None, group_id=None, meeting_id=None, research_plan_id=None):
-    """Get content with optional filters"""
+def _content_query(user_id=None, group_id=None, meeting_id=None, research_plan_id=None):
+    """Build the filtered content listing query (without ORDER BY) and its params"""
     query = '''
         SELECT c.*, u.name as uploaded_by_name, g.name as group_name, m.title as meeting_title
         FROM content c
@@ -137,11 +139,25 @@ def get_content(user_id=None, group_id=None, meeting_id=None, research_plan_id=N
         query += ' AND c.research_plan_id = ?'
         params.append(research_plan_id)
     
+    return query, params
+
+def get_content(user_id=None, group_id=None, meeting_id=None, research_plan_id=None, stream=False):
+    """Get content with optional filters (stream=True yields items lazily)"""
+    query, params = _content_query(user_id, group_id, meeting_id, research_plan_id)
     query += ' ORDER BY c.created_at DESC'
     
+    if stream:
+        return stream_db(query, params)
+    
     content = query_db(query, params)
     return [dict(item) for item in content]
 
+def get_content_page(cursor=None, page_size=None, user_id=None, group_id=None, meeting_id=None, research_plan_id=None):
+    """Get one page of content, newest first, with optional filters"""
+    query, params = _content_query(user_id, group_id, meeting_id, research_plan_id)
+    return paginate(query, params, sort_column='c.created_at', id_column='c.id',
+                    descending=True, cursor=cursor, page_size=page_size)
+
 def get_content_by_id(content_id):
     """Get content by ID"""
     content = query_db('''
@@ -205,26 +221,107 @@ def delete_content(content_id):
         print(f"Error deleting content: {e}")
         return False
 
-def search_content(search_term, user_id=None):
-    """Search content by title, description, or filename"""
-    search_pattern = f"%{search_term}%"
-    query = '''
+# Search terms: "quoted phrases" and single words
+_SEARCH_TERM = re.compile(r'"([^"]*)"|[^\W_]+')
+# Words: runs of letters and digits, split like FTS5's unicode61 tokenizer
+_SEARCH_TOKEN = re.compile(r'[^\W_]+')
+
+# Weighted search document on PostgreSQL; must match idx_content_search
+_PG_DOCUMENT = """(
+    setweight(to_tsvector('simple', coalesce(c.title, '')), 'A') ||
+    setweight(to_tsvector('simple', regexp_replace(coalesce(c.filename, ''), '[^[:alnum:]]+', ' ', 'g')), 'B') ||
+    setweight(to_tsvector('simple', coalesce(c.description, '')), 'C')
+)"""
+
+# Extracted text on PostgreSQL; must match idx_content_chunks_search
+_PG_BODY = "to_tsvector('simple', ch.body)"
+
+def _search_terms(search_term):
+    """Split a search into words and "quoted phrases", as (tokens, is_phrase) pairs"""
+    terms = []
+    for match in _SEARCH_TERM.finditer(search_term or ''):
+        if match.group(1) is None:
+            terms.append(([match.group(0)], False))
+        else:
+            tokens = _SEARCH_TOKEN.findall(match.group(1))
+            if tokens:
+                terms.append((tokens, True))
+    return terms
+
+def search_content(search_term, user_id=None, group_id=None, limit=None):
+    """Search content by title, description, filename and document text, best matches first (every word as a prefix, "quoted phrases" exactly)"""
+    terms = _search_terms(search_term)
+    if not terms:
+        return []
+    
+    filters = []
+    filter_params = []
+    if user_id:
+        filters.append('c.uploaded_by = ?')
+        filter_params.append(user_id)
+    if group_id:
+        filters.append('c.group_id = ?')
+        filter_params.append(group_id)
+    limit = int(limit or DB_PAGE_SIZE_MAX)
+    where = ''.join(f' AND {condition}' for condition in filters)
+    
+    # Both backends produce per-document scores where lower is better: one
+    # from the metadata index and one from the best matching text chunk.
+    if get_pool().backend == 'postgresql':
+        match = ' & '.join(f"({' <-> '.join(tokens)})" if phrase else f'{tokens[0]}:*' for tokens, phrase in terms)
+        join = ' JOIN content c ON c.id = ch.content_id' if filters else ''
+        metadata = f'''
+            SELECT c.id, -ts_rank({_PG_DOCUMENT}, to_tsquery('simple', ?)) AS score
+            FROM content c
+            WHERE {_PG_DOCUMENT} @@ to_tsquery('simple', ?){where}
+        '''
+        body = f'''
+            SELECT ch.content_id AS id, -ts_rank({_PG_BODY}, to_tsquery('simple', ?)) * 0.5 AS score
+            FROM content_chunks ch{join}
+            WHERE {_PG_BODY} @@ to_tsquery('simple', ?){where}
+        '''
+        match_params = [match, match] + filter_params
+    else:
+        # Quote every word so FTS5 syntax in the input is matched literally
+        match = ' '.join(f'"{" ".join(tokens)}"' if phrase else f'"{tokens[0]}"*' for tokens, phrase in terms)
+        # bm25() weights per column: title, description, filename. bm25()
+        # only works in the query that scans the FTS table, so LIMIT -1 keeps
+        # SQLite from flattening the chunk scan into the MIN() aggregate.
+        metadata = f'''
+            SELECT content_fts.rowid AS id, bm25(content_fts, 10.0, 1.0, 5.0) AS score
+            FROM content_fts{' JOIN content c ON c.id = content_fts.rowid' if filters else ''}
+            WHERE content_fts MATCH ?{where}
+        '''
+        body = f'''
+            SELECT ch.content_id AS id, bm25(content_chunks_fts) * 0.5 AS score
+            FROM content_chunks_fts
+            JOIN content_chunks ch ON ch.id = content_chunks_fts.rowid{' JOIN content c ON c.id = ch.content_id' if filters else ''}
+            WHERE content_chunks_fts MATCH ?{where}
+            LIMIT -1
+        '''
+        match_params = [match] + filter_params
+    
+    # Rank and cut on ids first, then join only the rows shown
+    query = f'''
         SELECT c.*, u.name as uploaded_by_name, g.name as group_name, m.title as meeting_title
-        FROM content c
+        FROM (
+            SELECT id, SUM(score) AS score FROM (
+                {metadata}
+                UNION ALL
+                SELECT id, MIN(score) AS score FROM ({body}) AS chunk_hits GROUP BY id
+            ) AS matches
+            GROUP BY id
+            ORDER BY score, id DESC
+            LIMIT ?
+        ) hits
+        JOIN content c ON c.id = hits.id
         LEFT JOIN users u ON c.uploaded_by = u.id
         LEFT JOIN research_groups g ON c.group_id = g.id
         LEFT JOIN meetings m ON c.meeting_id = m.id
-        WHERE c.title LIKE ? OR c.description LIKE ? OR c.filename LIKE ?
+        ORDER BY hits.score, c.id DESC
     '''
-    params = [search_pattern, search_pattern, search_pattern]
     
-    if user_id:
-        query += ' AND c.uploaded_by = ?'
-        params.append(user_id)
-    
-    query += ' ORDER BY c.created_at DESC'
-    
-    content = query_db(query, params)
+    content = query_db(query, match_params + match_params + [limit])
     return [dict(item) for item in content]
 
 def get_content_by_group(group_id):
@@ -0,0 +1,60 @@
+"""
+Dashboard sections, rendered once and cached per user.
+
+Each section of the dashboard is a template fragment built from one to
+three queries. Rendered fragments are kept per worker, keyed on the user
+(unless the section is the same for everyone), the day and the data
+versions the section is built from, so a warm dashboard costs a single
+query: the one reading those versions.
+"""
+import os
+from datetime import date, timedelta
+from flask import render_template
+from markupsafe import Markup
+from labman.lib.cache import VersionedCache, get_data_versions
+from labman.lib.datetimes import format_meeting_times
+
+# Rendered sections kept per worker
+DASHBOARD_CACHE_SIZE = int(os.getenv('DASHBOARD_CACHE_SIZE', '1024'))
+
+_fragments = VersionedCache(max_entries=DASHBOARD_CACHE_SIZE)
+
+
+def _groups_section(user_id, today):
+    from labman.lib.groups import get_user_groups
+    groups = get_user_groups(user_id)
+    return render_template('dashboard_groups.html', groups=groups), len(groups)
+
+
+def _meetings_section(user_id, today):
+    from labman.lib.meetings import get_meetings_this_week
+    meetings = format_meeting_times(get_meetings_this_week(limit=3, today=today))
+    return render_template('dashboard_meetings.html', meetings=meetings), len(meetings)
+
+
+def _research_section(user_id, today):
+    from labman.lib.research import get_research_timeline
+    plan = get_research_timeline(user_id, today - timedelta(days=7), today + timedelta(days=14))
+    html = render_template('dashboard_research.html', research_plan=plan, current_date=today.strftime('%Y-%m-%d'))
+    return html, len(plan['tasks'])
+
+
+# name -> (data versions the section is built from, same for every user, builder)
+SECTIONS = {
+    'groups': (('groups',), False, _groups_section),
+    'meetings': (('meetings',), True, _meetings_section),
+    'research': (('research',), False, _research_section),
+}
+
+
+def load_dashboard(user_id, today=None):
+    """Get the rendered dashboard sections for a user as {name: {'html': ..., 'count': items shown}}"""
+    today = today or date.today()
+    versions = get_data_versions({name for names, _, _ in SECTIONS.values() for name in names})
+    sections = {}
+    for section, (names, shared, build) in SECTIONS.items():
+        key = (section, today.isoformat()) if shared else (section, today.isoformat(), user_id)
+        version = tuple(versions[name] for name in names)
+        html, count = _fragments.get(key, version, lambda: build(user_id, today))
+        sections[section] = {'html': Markup(html), 'count': count}
+    return sections
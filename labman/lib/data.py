@@ -1,7 +1,20 @@
 import sqlite3
+import threading
+import queue
+import random
+import time
+import atexit
+import logging
+import json
+import base64
+from collections import namedtuple
+from concurrent.futures import Future
+from contextlib import contextmanager, nullcontext
 from flask import g
 import os
 from dotenv import load_dotenv
+from labman.lib.migrations import migrate, get_schema_version, latest_version, MIGRATIONS_DIR
+from labman.lib.instrumentation import record_query
 
 load_dotenv()
 
@@ -13,251 +26,626 @@ os.makedirs(db_dir, exist_ok=True)
 db_filename = os.getenv('LAB_NAME', 'Lab Manager').lower().replace(" ", "_") + '.db'
 DATABASE = os.path.join(db_dir, db_filename)
 
+# Set to a postgresql:// URL to use a PostgreSQL server instead of the SQLite
+# file above (see labman.lib.postgres); lets several hosts share one database
+DATABASE_URL = os.getenv('DATABASE_URL', '')
+
+# Connection tuning, applied once to every pooled connection (in this order).
+# WAL lets readers in other workers proceed while a writer commits, and
+# synchronous=NORMAL is durable in WAL mode while avoiding an fsync per commit.
+# foreign_keys stays OFF by default: several legacy references (meetings,
+# content, audit_logs -> users) have no ON DELETE action and existing delete
+# paths rely on them not being enforced.
+DB_PRAGMAS = {
+    'busy_timeout': os.getenv('DB_BUSY_TIMEOUT', '5000'),
+    'journal_mode': os.getenv('DB_JOURNAL_MODE', 'WAL'),
+    'synchronous': os.getenv('DB_SYNCHRONOUS', 'NORMAL'),
+    'cache_size': os.getenv('DB_CACHE_SIZE', '-16000'),  # negative = KiB (16 MB)
+    'mmap_size': os.getenv('DB_MMAP_SIZE', str(128 * 1024 * 1024)),
+    'foreign_keys': os.getenv('DB_FOREIGN_KEYS', 'OFF'),
+}
+
+# Maximum number of idle connections each worker keeps around
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', '4'))
+
+# Rows fetched per round trip when streaming query results
+DB_ARRAYSIZE = int(os.getenv('DB_ARRAYSIZE', '256'))
+
+# Default and maximum number of rows per page for keyset-paginated lists
+DB_PAGE_SIZE = int(os.getenv('DB_PAGE_SIZE', '50'))
+DB_PAGE_SIZE_MAX = int(os.getenv('DB_PAGE_SIZE_MAX', '200'))
+
+# Write path: how often to retry taking SQLite's write lock when another
+# worker holds it past busy_timeout, the base delay between attempts
+# (doubled each time, with jitter), and when to warn about slow lock waits.
+DB_WRITE_RETRIES = int(os.getenv('DB_WRITE_RETRIES', '5'))
+DB_RETRY_DELAY_MS = int(os.getenv('DB_RETRY_DELAY_MS', '25'))
+DB_LOCK_WAIT_WARN_MS = int(os.getenv('DB_LOCK_WAIT_WARN_MS', '1000'))
+
+# Optional dedicated writer thread that group-commits queued writes
+DB_WRITER_THREAD = os.getenv('DB_WRITER_THREAD', 'False').lower() == 'true'
+DB_WRITER_BATCH = int(os.getenv('DB_WRITER_BATCH', '100'))
+
+logger = logging.getLogger(__name__)
+
+
+class PooledConnection(sqlite3.Connection):
+    """sqlite3 connection that remembers how deeply transaction() blocks are nested"""
+    transaction_depth = 0
+
+
+class ConnectionPool:
+    """
+    Per-process pool of configured SQLite connections.
+
+    Connections are opened lazily, configured once with the pool's PRAGMAs
+    and then reused across requests, so a worker only pays the connect and
+    page-cache warmup cost when the pool is cold. The pool notices when the
+    process has forked (e.g. gunicorn --preload) and drops the inherited
+    handles instead of sharing them with the parent.
+
+    The class attributes describe the backend to the write path and the
+    migrations; labman.lib.postgres.PostgresPool provides the same interface.
+    """
+
+    backend = 'sqlite'
+    begin_write = 'BEGIN IMMEDIATE'
+    serialize_writes = True  # SQLite allows one writer at a time
+    migrations_dir = MIGRATIONS_DIR
+
+    def __init__(self, database, size=DB_POOL_SIZE, pragmas=None):
+        self.database = database
+        self.size = size
+        self.pragmas = dict(DB_PRAGMAS if pragmas is None else pragmas)
+        self._idle = []
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+
+    def _connect(self):
+        """Open and configure a new connection"""
+        conn = sqlite3.connect(self.database, check_same_thread=False, factory=PooledConnection)
+        conn.row_factory = sqlite3.Row
+        for name, value in self.pragmas.items():
+            if not str(value).replace('-', '').replace('_', '').isalnum():
+                raise ValueError(f"Invalid value for PRAGMA {name}: {value!r}")
+            conn.execute(f'PRAGMA {name} = {value}')
+        return conn
+
+    def is_busy_error(self, error):
+        """Check whether an error means another connection holds the write lock"""
+        return isinstance(error, sqlite3.OperationalError) and _is_busy_error(error)
+
+    def _check_fork(self):
+        """Forget connections inherited from a parent process"""
+        if self._pid != os.getpid():
+            # Never close handles owned by the parent, just drop them
+            self._idle = []
+            self._pid = os.getpid()
+
+    def acquire(self):
+        """Get an idle connection, opening a new one if none is available"""
+        with self._lock:
+            self._check_fork()
+            if self._idle:
+                return self._idle.pop()
+        return self._connect()
+
+    def release(self, conn):
+        """Return a connection to the pool (or close it if the pool is full)"""
+        conn.transaction_depth = 0
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            conn.close()
+            return
+
+        with self._lock:
+            self._check_fork()
+            if len(self._idle) < self.size:
+                self._idle.append(conn)
+                return
+        conn.close()
+
+    def close_all(self):
+        """Close every idle connection"""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def _database_target():
+    """The database this process uses: DATABASE_URL if set, else the SQLite file"""
+    return DATABASE_URL or DATABASE
+
+def get_pool():
+    """Get this process's connection pool for the configured database"""
+    global _pool
+    target = _database_target()
+    if _pool is None or _pool.database != target:
+        with _pool_lock:
+            if _pool is None or _pool.database != target:
+                if _pool is not None:
+                    _pool.close_all()
+                if DATABASE_URL:
+                    from labman.lib.postgres import PostgresPool, is_postgres_url
+                    if not is_postgres_url(DATABASE_URL):
+                        raise ValueError(f"Unsupported DATABASE_URL scheme: {DATABASE_URL.split('://', 1)[0]}")
+                    _pool = PostgresPool(DATABASE_URL)
+                else:
+                    _pool = ConnectionPool(DATABASE)
+    return _pool
+
 def get_db():
     """Get database connection"""
     db = getattr(g, '_database', None)
     if db is None:
-        db = g._database = sqlite3.connect(DATABASE)
-        db.row_factory = sqlite3.Row
+        db = g._database = get_pool().acquire()
     return db
 
 
 def close_db(e=None):
-    """Close database connection"""
-    db = getattr(g, '_database', None)
+    """Return the request's database connection to the pool"""
+    db = g.pop('_database', None)
     if db is not None:
-        db.close()
+        get_pool().release(db)
+
+# Databases this process has already found (or made) current
+_schema_ready = set()
+_schema_lock = threading.Lock()
+
+def ensure_db():
+    """
+    Make sure the database schema is current, cheaply.
+
+    The first call in a process compares the stored schema version with the
+    latest migration (one SELECT, no DDL) and only runs init_db() when they
+    differ; later calls return immediately. Servers register this as a
+    before_request hook, so a worker started against an already migrated
+    database never runs schema setup itself.
+    """
+    target = _database_target()
+    if target in _schema_ready:
+        return
+    with _schema_lock:
+        if target in _schema_ready:
+            return
+        if get_schema_version(get_db()) < latest_version(get_pool().migrations_dir):
+            init_db()
+        _schema_ready.add(target)
 
 def init_db():
-    """Initialize database with schema"""
+    """Set up the database: apply pending schema migrations and bootstrap defaults"""
     db = get_db()
-    
-    # Users table
-    db.execute('''
-        CREATE TABLE IF NOT EXISTS users (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT NOT NULL,
-            email TEXT UNIQUE NOT NULL,
-            password_hash TEXT,
-            is_admin BOOLEAN DEFAULT 0,
-            email_notifications BOOLEAN DEFAULT 1,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
-    
-    # Research groups table
-    db.execute('''
-        CREATE TABLE IF NOT EXISTS research_groups (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT UNIQUE NOT NULL,
-            description TEXT,
-            parent_id INTEGER,
-            lead_id INTEGER,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (parent_id) REFERENCES research_groups(id),
-            FOREIGN KEY (lead_id) REFERENCES users(id)
-        )
-    ''')
-    
-    # User-Group membership table
-    db.execute('''
-        CREATE TABLE IF NOT EXISTS user_groups (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER NOT NULL,
-            group_id INTEGER NOT NULL,
-            joined_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
-            FOREIGN KEY (group_id) REFERENCES research_groups(id) ON DELETE CASCADE,
-            UNIQUE(user_id, group_id)
-        )
-    ''')
-    
-    # Meetings table
-    db.execute('''
-        CREATE TABLE IF NOT EXISTS meetings (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            title TEXT NOT NULL,
-            description TEXT,
-            meeting_time TIMESTAMP NOT NULL,
-            created_by INTEGER NOT NULL,
-            group_id INTEGER,
-            tags TEXT,
-            summary TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (created_by) REFERENCES users(id),
-            FOREIGN KEY (group_id) REFERENCES research_groups(id)
-        )
-    ''')
-    
-    # Meeting responses table
-    db.execute('''
-        CREATE TABLE IF NOT EXISTS meeting_responses (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            meeting_id INTEGER NOT NULL,
-            user_id INTEGER NOT NULL,
-            response TEXT CHECK(response IN ('join', 'wont_join')),
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (meeting_id) REFERENCES meetings(id) ON DELETE CASCADE,
-            FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
-            UNIQUE(meeting_id, user_id)
-        )
-    ''')
-    
-    # Content table
-    db.execute('''
-        CREATE TABLE IF NOT EXISTS content (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            title TEXT NOT NULL,
-            description TEXT,
-            filename TEXT NOT NULL,
-            file_path TEXT NOT NULL,
-            file_size INTEGER,
-            uploaded_by INTEGER NOT NULL,
-            group_id INTEGER,
-            meeting_id INTEGER,
-            research_plan_id INTEGER,  -- Linked to research_plans
-            access_level TEXT DEFAULT 'group',
-            share_link TEXT UNIQUE,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (uploaded_by) REFERENCES users(id),
-            FOREIGN KEY (group_id) REFERENCES research_groups(id),
-            FOREIGN KEY (meeting_id) REFERENCES meetings(id),
-            FOREIGN KEY (research_plan_id) REFERENCES research_plans(user_id)
-        )
-    ''')
-    
-    # Inventory table
-    db.execute('''
-        CREATE TABLE IF NOT EXISTS inventory (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT NOT NULL,
-            description TEXT,
-            quantity INTEGER DEFAULT 0,
-            location TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
-    
-    # Servers table
-    db.execute('''
-        CREATE TABLE IF NOT EXISTS servers (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            hostname TEXT NOT NULL,
-            ip_address TEXT NOT NULL,
-            admin_name TEXT,
-            location TEXT,
-            description TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
-    
-    # Research Plans table
-    db.execute('''
-        CREATE TABLE IF NOT EXISTS research_plans (
-            user_id INTEGER PRIMARY KEY,
-            problem_statement TEXT,
-            research_progress TEXT,  -- New field
-            github_link TEXT,
-            manuscript_link TEXT,
-            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            start_date DATE,
-            end_date DATE,
-            comments TEXT,
-            FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
-        )
-    ''')
-    
-    # Research Tasks table
-    db.execute('''
-        CREATE TABLE IF NOT EXISTS research_tasks (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER NOT NULL,
-            task_name TEXT NOT NULL,
-            due_date DATE,
-            start_date DATE,
-            previous_due_date DATE,
-            status TEXT DEFAULT 'pending',
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
-        )
-    ''')
-    
-    # Password reset tokens table
-    db.execute('''
-        CREATE TABLE IF NOT EXISTS password_reset_tokens (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER NOT NULL,
-            token TEXT UNIQUE NOT NULL,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            expires_at TIMESTAMP NOT NULL,
-            used BOOLEAN DEFAULT 0,
-            FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
-        )
-    ''')
-    
-    # Email failures table for tracking failed email attempts
-    db.execute('''
-        CREATE TABLE IF NOT EXISTS email_failures (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            email_type TEXT NOT NULL,
-            recipient TEXT NOT NULL,
-            error_message TEXT,
-            payload TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            retry_count INTEGER DEFAULT 0,
-            last_retry_at TIMESTAMP
-        )
-    ''')
-    
-    # Audit logs table
-    db.execute('''
-        CREATE TABLE IF NOT EXISTS audit_logs (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER,
-            action TEXT NOT NULL,
-            details TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (user_id) REFERENCES users(id)
-        )
-    ''')
+    migrate(db, directory=get_pool().migrations_dir)
+    bootstrap_defaults(db)
+    _schema_ready.add(_database_target())
 
-    # Create default Lab group if it doesn't exist
+def bootstrap_defaults(db):
+    """Create the default Lab group and an admin account if they are missing"""
     lab_name = os.getenv('LAB_NAME', 'Lab Manager')
-    existing_group = db.execute('SELECT id FROM research_groups WHERE name = ?', (lab_name,)).fetchone()
-    if not existing_group:
-        db.execute('INSERT INTO research_groups (name, description) VALUES (?, ?)',
-                  (lab_name, f'Default {lab_name} group for all members'))
+    # Check and insert under the write lock so workers starting together don't race
+    with serialized_write(db):
+        if hasattr(db, 'lock_exclusive'):
+            # BEGIN takes no lock on PostgreSQL; keep other hosts out until commit
+            db.lock_exclusive()
+        existing_group = db.execute('SELECT id FROM research_groups WHERE name = ?', (lab_name,)).fetchone()
+        if not existing_group:
+            db.execute('INSERT INTO research_groups (name, description) VALUES (?, ?)',
+                      (lab_name, f'Default {lab_name} group for all members'))
+            db.execute('INSERT INTO group_closure (ancestor_id, descendant_id, depth) '
+                       'SELECT id, id, 0 FROM research_groups WHERE name = ?', (lab_name,))
     
-    # Create default admin user if no admins exist
-    existing_admins = db.execute('SELECT COUNT(*) as count FROM users WHERE is_admin = 1').fetchone()
-    if existing_admins['count'] == 0:
-        from werkzeug.security import generate_password_hash
-        password_hash = generate_password_hash('admin123')
-        admin_email = os.getenv('SMTP_USERNAME', 'admin@example.com')
-        cursor = db.execute('INSERT INTO users (name, email, password_hash, is_admin) VALUES (?, ?, ?, ?)',
-                           ('Admin User', admin_email, password_hash, 1))
-        user_id = cursor.lastrowid
+        # Create default admin user if no admins exist
+        existing_admins = db.execute('SELECT COUNT(*) as count FROM users WHERE is_admin = 1').fetchone()
+        if existing_admins['count'] == 0:
+            from werkzeug.security import generate_password_hash
+            password_hash = generate_password_hash('admin123')
+            admin_email = os.getenv('SMTP_USERNAME', 'admin@example.com')
+            cursor = db.execute('INSERT INTO users (name, email, password_hash, is_admin) VALUES (?, ?, ?, ?)',
+                               ('Admin User', admin_email, password_hash, 1))
+            user_id = cursor.lastrowid
         
-        # Add admin to default Lab group
-        lab_group = db.execute('SELECT id FROM research_groups WHERE name = ?', (lab_name,)).fetchone()
-        if lab_group:
-            db.execute('INSERT INTO user_groups (user_id, group_id) VALUES (?, ?)',
-                      (user_id, lab_group['id']))
-    
-    db.commit()
+            # Add admin to default Lab group
+            lab_group = db.execute('SELECT id FROM research_groups WHERE name = ?', (lab_name,)).fetchone()
+            if lab_group:
+                db.execute('INSERT INTO user_groups (user_id, group_id) VALUES (?, ?)',
+                          (user_id, lab_group['id']))
+
+# Result of a write applied by the writer thread (mirrors the cursor attributes callers use)
+WriteResult = namedtuple('WriteResult', ['lastrowid', 'rowcount'])
+
+
+class WriteStats:
+    """Per-worker counters for the write path"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Zero all counters"""
+        with self._lock:
+            self.writes = 0
+            self.retries = 0
+            self.failures = 0
+            self.lock_wait_total = 0.0
+            self.lock_wait_max = 0.0
+
+    def record(self, wait, retries, failed=False):
+        """Record one attempt to take the write lock"""
+        with self._lock:
+            self.writes += 1
+            self.retries += retries
+            self.failures += int(failed)
+            self.lock_wait_total += wait
+            self.lock_wait_max = max(self.lock_wait_max, wait)
+
+    def snapshot(self):
+        """Get the current counters as a dict (times in milliseconds)"""
+        with self._lock:
+            return {
+                'writes': self.writes,
+                'retries': self.retries,
+                'failures': self.failures,
+                'lock_wait_total_ms': round(self.lock_wait_total * 1000, 3),
+                'lock_wait_max_ms': round(self.lock_wait_max * 1000, 3),
+                'lock_wait_avg_ms': round(self.lock_wait_total * 1000 / self.writes, 3) if self.writes else 0.0,
+            }
+
+
+write_stats = WriteStats()
+
+def get_write_stats():
+    """Get this worker's write lock statistics"""
+    return write_stats.snapshot()
+
+# Serializes writers within this worker; SQLite's own lock serializes workers.
+# Not taken on backends that handle concurrent writers (PostgreSQL).
+_write_lock = threading.RLock()
+
+def _is_busy_error(error):
+    """Check whether an OperationalError means another connection holds the lock"""
+    message = str(error).lower()
+    return 'locked' in message or 'busy' in message
+
+@contextmanager
+def serialized_write(db):
+    """
+    Hold the worker's write lock and an IMMEDIATE transaction on db.
+
+    Taking SQLite's write lock up front means statements inside the block
+    never hit SQLITE_BUSY half-way through. If another worker holds the lock
+    past busy_timeout, BEGIN is retried with jittered exponential backoff.
+    On PostgreSQL this is a plain transaction without the worker lock.
+    Commits on success, rolls back on error. Request code should use
+    transaction(); this is for connections a background thread checked out
+    of the pool itself.
+    """
+    pool = get_pool()
+    start = time.perf_counter()
+    with _write_lock if pool.serialize_writes else nullcontext():
+        if db.in_transaction:
+            db.commit()
+
+        attempt = 0
+        while True:
+            try:
+                db.execute(pool.begin_write)
+                break
+            except Exception as e:
+                if not pool.is_busy_error(e) or attempt >= DB_WRITE_RETRIES:
+                    write_stats.record(time.perf_counter() - start, attempt, failed=True)
+                    raise
+                delay = DB_RETRY_DELAY_MS / 1000 * (2 ** attempt)
+                time.sleep(delay * random.uniform(0.5, 1.5))
+                attempt += 1
+
+        wait = time.perf_counter() - start
+        write_stats.record(wait, attempt)
+        if wait * 1000 > DB_LOCK_WAIT_WARN_MS:
+            logger.warning(f"Waited {wait * 1000:.0f} ms for the database write lock ({attempt} retries)")
+
+        try:
+            yield db
+        except BaseException:
+            db.rollback()
+            raise
+        db.commit()
+
+
+class WriteQueue:
+    """
+    Dedicated writer thread that group-commits queued writes.
+
+    Statements submitted from any thread of this worker are applied on the
+    writer's own connection. Everything that queued up while the previous
+    batch was committing goes into the next single transaction, so a burst
+    of small writes (an RSVP wave, audit entries) costs one fsync instead of
+    one each. Every statement runs under its own savepoint, so one failing
+    statement does not undo the rest of its batch.
+    """
+
+    _STOP = object()
+
+    def __init__(self, batch_size=DB_WRITER_BATCH):
+        self.batch_size = batch_size
+        self.queue = queue.Queue()
+        self.pid = os.getpid()
+        self.worker_thread = threading.Thread(
+            target=self._worker,
+            daemon=True,
+            name="DatabaseWriter"
+        )
+        self.worker_thread.start()
+
+    def submit(self, query, args=()):
+        """
+        Queue a write statement.
+
+        Returns:
+            Future: Resolves to a WriteResult once the batch has committed
+        """
+        future = Future()
+        self.queue.put((query, args, future))
+        return future
+
+    def flush(self):
+        """Block until every queued write has been committed"""
+        self.queue.join()
+
+    def stop(self):
+        """Apply queued writes and stop the writer thread"""
+        self.queue.put(self._STOP)
+        self.worker_thread.join()
+
+    def _worker(self):
+        """Take whatever is queued, apply it as one batch, repeat"""
+        pool = get_pool()
+        conn = pool.acquire()
+        try:
+            while True:
+                batch = [self.queue.get()]
+                while len(batch) < self.batch_size:
+                    try:
+                        batch.append(self.queue.get_nowait())
+                    except queue.Empty:
+                        break
+
+                stop = any(item is self._STOP for item in batch)
+                items = [item for item in batch if item is not self._STOP]
+                try:
+                    if items:
+                        self._apply(conn, items)
+                finally:
+                    for _ in batch:
+                        self.queue.task_done()
+                if stop:
+                    return
+        finally:
+            pool.release(conn)
+
+    def _apply(self, conn, items):
+        """Apply one batch in a single transaction and resolve its futures"""
+        outcomes = []
+        try:
+            with serialized_write(conn):
+                for query, args, future in items:
+                    conn.execute('SAVEPOINT batch_item')
+                    try:
+                        cursor = conn.execute(query, args)
+                        outcomes.append((future, WriteResult(cursor.lastrowid, cursor.rowcount), None))
+                        conn.execute('RELEASE batch_item')
+                    except Exception as e:
+                        conn.execute('ROLLBACK TO batch_item')
+                        conn.execute('RELEASE batch_item')
+                        outcomes.append((future, None, e))
+        except Exception as e:
+            logger.error(f"Database writer failed to commit a batch of {len(items)}: {e}")
+            for _, _, future in items:
+                future.set_exception(e)
+            return
+
+        for future, result, error in outcomes:
+            if error is not None:
+                logger.error(f"Queued write failed: {error}")
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+def get_writer():
+    """Get this process's writer thread, starting it on first use"""
+    global _writer
+    if _writer is None or _writer.pid != os.getpid():
+        with _writer_lock:
+            if _writer is None or _writer.pid != os.getpid():
+                _writer = WriteQueue()
+    return _writer
+
+@atexit.register
+def _flush_writer():
+    """Don't lose fire-and-forget writes when the worker exits"""
+    if _writer is not None and _writer.pid == os.getpid():
+        _writer.stop()
 
 def query_db(query, args=(), one=False):
     """Execute a query and return results"""
+    start = time.perf_counter()
     cur = get_db().execute(query, args)
     rv = cur.fetchall()
     cur.close()
+    record_query(query, time.perf_counter() - start, args, cur.connection)
     return (rv[0] if rv else None) if one else rv
 
-def execute_db(query, args=()):
-    """Execute a query that modifies data"""
+def dict_factory(cursor, row):
+    """Row factory that builds plain dicts directly from a cursor row"""
+    return {col[0]: value for col, value in zip(cursor.description, row)}
+
+def stream_db(query, args=(), arraysize=None):
+    """
+    Execute a query and yield rows lazily as dicts.
+
+    Rows are fetched ``arraysize`` at a time (default DB_ARRAYSIZE) and built
+    straight into dicts, so iterating a large result holds one batch in
+    memory instead of the whole result set twice over (Row list + dicts).
+    """
+    cur = get_db().cursor()
+    cur.row_factory = dict_factory
+    cur.arraysize = arraysize or DB_ARRAYSIZE
+    elapsed = 0.0  # time spent in SQLite, not in the consumer
+    try:
+        start = time.perf_counter()
+        cur.execute(query, args)
+        elapsed += time.perf_counter() - start
+        while True:
+            start = time.perf_counter()
+            rows = cur.fetchmany()
+            elapsed += time.perf_counter() - start
+            if not rows:
+                break
+            yield from rows
+    finally:
+        cur.close()
+        record_query(query, elapsed, args, cur.connection)
+
+Page = namedtuple('Page', ['items', 'next_cursor', 'prev_cursor'])
+
+def encode_cursor(direction, sort_value, row_id):
+    """Encode a page boundary as an opaque, URL-safe cursor string"""
+    raw = json.dumps([direction, sort_value, row_id], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+def decode_cursor(cursor):
+    """Decode a cursor into (direction, sort_value, id), or None if it is missing or malformed"""
+    if not cursor:
+        return None
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        direction, sort_value, row_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        return None
+    if direction not in ('next', 'prev') or not isinstance(row_id, int) or isinstance(row_id, bool):
+        return None
+    # The sort value is bound into the keyset WHERE clause, so only scalars are allowed
+    if sort_value is not None and (isinstance(sort_value, bool) or not isinstance(sort_value, (str, int, float))):
+        return None
+    return direction, sort_value, row_id
+
+def paginate(query, args=(), sort_column='id', id_column='id', descending=False, cursor=None, page_size=None):
+    """
+    Run a list query one page at a time using keyset pagination.
+
+    ``query`` must end in a WHERE clause (``WHERE 1=1`` is fine) and have no
+    ORDER BY or LIMIT. Rows are ordered by (sort_column, id_column) and a
+    cursor seeks straight to the page boundary with a row-value comparison,
+    so with an index on sort_column every page costs the same no matter how
+    deep into the table it is. Returns a Page of dicts plus the cursors for
+    the neighbouring pages (None at either end).
+    """
+    page_size = max(1, min(int(page_size or DB_PAGE_SIZE), DB_PAGE_SIZE_MAX))
+    key = decode_cursor(cursor)
+    backwards = key is not None and key[0] == 'prev'
+    base_query = query
+    params = list(args)
+
+    if key:
+        # Going back walks the order in reverse from the first row shown
+        op = '<' if descending != backwards else '>'
+        query += f' AND ({sort_column}, {id_column}) {op} (?, ?)'
+        params += [key[1], key[2]]
+
+    order = 'DESC' if descending != backwards else 'ASC'
+    query += f' ORDER BY {sort_column} {order}, {id_column} {order} LIMIT ?'
+    params.append(page_size + 1)
+
+    rows = [dict(row) for row in query_db(query, params)]
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+
+    if backwards:
+        if not has_more:
+            # Reached the start: show a full first page rather than a stub
+            return paginate(base_query, args, sort_column, id_column, descending, page_size=page_size)
+        rows.reverse()
+
+    if not rows:
+        return Page([], None, None)
+
+    sort_field = sort_column.split('.')[-1]
+    id_field = id_column.split('.')[-1]
+    first, last = rows[0], rows[-1]
+    has_next = True if backwards else has_more
+    has_prev = True if backwards else key is not None
+    return Page(
+        rows,
+        encode_cursor('next', last[sort_field], last[id_field]) if has_next else None,
+        encode_cursor('prev', first[sort_field], first[id_field]) if has_prev else None,
+    )
+
+def execute_db(query, args=(), wait=True):
+    """
+    Execute a query that modifies data.
+
+    Inside transaction() the statement just joins the open transaction.
+    Otherwise it is committed on its own, serialized with the worker's other
+    writers; with DB_WRITER_THREAD enabled it is handed to the writer thread
+    instead, and ``wait=False`` returns immediately without a result.
+    """
     db = get_db()
-    cursor = db.execute(query, args)
-    db.commit()
-    return cursor
+    start = time.perf_counter()
+    try:
+        if db.transaction_depth:
+            return db.execute(query, args)
+
+        if DB_WRITER_THREAD:
+            future = get_writer().submit(query, args)
+            return future.result() if wait else None
+
+        with serialized_write(db):
+            cursor = db.execute(query, args)
+        return cursor
+    finally:
+        record_query(query, time.perf_counter() - start, args, db)
+
+@contextmanager
+def transaction():
+    """
+    Run a block of statements as one atomic unit of work.
+
+    execute_db() calls made inside the block (including from lib functions
+    it calls) do not commit on their own; the block commits once when it
+    exits normally and rolls back if it raises. The write lock is taken up
+    front, so the block never fails half-way on a lock upgrade. Nested
+    blocks become savepoints, so an inner failure only undoes the inner
+    block.
+    """
+    db = get_db()
+    depth = db.transaction_depth
+    if depth == 0:
+        with serialized_write(db):
+            db.transaction_depth = 1
+            try:
+                yield db
+            finally:
+                db.transaction_depth = 0
+        return
+
+    db.execute(f'SAVEPOINT txn_{depth}')
+    db.transaction_depth = depth + 1
+    try:
+        yield db
+    except BaseException:
+        db.execute(f'ROLLBACK TO txn_{depth}')
+        db.execute(f'RELEASE txn_{depth}')
+        raise
+    finally:
+        db.transaction_depth = depth
+    db.execute(f'RELEASE txn_{depth}')
@@ -0,0 +1,119 @@
+"""
+Shared parsing and formatting of stored date/time strings.
+
+Meeting times are stored as naive 'YYYY-MM-DD HH:MM:SS' strings in the lab's
+local time (TIMEZONE). List pages format hundreds of them per render, so the
+time zone is resolved once, parsing uses datetime.fromisoformat, and both
+parsed values and formatted strings are memoized per distinct input.
+"""
+import os
+import calendar
+from datetime import date, datetime, timezone
+from functools import lru_cache
+from zoneinfo import ZoneInfo
+
+# Time zone the stored meeting times are in
+TIMEZONE = os.getenv('TIMEZONE', 'Asia/Kolkata')
+
+# Distinct strings memoized by each cache
+DATETIME_CACHE_SIZE = int(os.getenv('DATETIME_CACHE_SIZE', '4096'))
+
+
+@lru_cache(maxsize=None)
+def _zone(name):
+    return ZoneInfo(name)
+
+
+def get_timezone(name=None):
+    """Get a ZoneInfo for name (default: the lab's TIMEZONE), built once per name"""
+    return _zone(name or TIMEZONE)
+
+
+@lru_cache(maxsize=DATETIME_CACHE_SIZE)
+def _parse(value):
+    try:
+        return datetime.fromisoformat(value.strip())
+    except ValueError:
+        return None
+
+
+def parse_datetime(value):
+    """Parse a stored or submitted time ('2026-01-30 14:52:00', '2026-01-30T14:52', ...); None if invalid"""
+    if isinstance(value, datetime):
+        return value
+    if not isinstance(value, str):
+        return None
+    return _parse(value)
+
+
+@lru_cache(maxsize=DATETIME_CACHE_SIZE)
+def _parse_date(value):
+    try:
+        return date.fromisoformat(value.strip()[:10])
+    except ValueError:
+        return None
+
+
+def parse_date(value):
+    """Parse the date part of a stored date or time ('2026-01-30', '2026-01-30 14:52:00'); None if invalid"""
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    if not isinstance(value, str):
+        return None
+    return _parse_date(value)
+
+
+def to_utc(value):
+    """Convert a lab-local time (string or naive datetime) to an aware UTC datetime"""
+    dt = parse_datetime(value)
+    if dt is None:
+        raise ValueError(f"Could not parse datetime: {value}")
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=get_timezone())
+    return dt.astimezone(timezone.utc)
+
+
+def to_lab_time(value):
+    """Convert a time to the naive lab-local datetime it is stored as"""
+    dt = parse_datetime(value)
+    if dt is None:
+        raise ValueError(f"Could not parse datetime: {value}")
+    if dt.tzinfo is not None:
+        dt = dt.astimezone(get_timezone()).replace(tzinfo=None)
+    return dt
+
+
+def utc_stamp(dt):
+    """Format an aware datetime as a UTC calendar timestamp (20260130T092200Z)"""
+    return dt.astimezone(timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+
+
+@lru_cache(maxsize=DATETIME_CACHE_SIZE)
+def _format_meeting(value):
+    dt = _parse(value)
+    if dt is None:
+        return value
+    weekday = calendar.day_abbr[dt.weekday()]
+    return f"{dt.day} {calendar.month_abbr[dt.month]}, {dt.year} ({weekday}) @ {dt.strftime('%I:%M %p')}"
+
+
+def format_meeting_datetime(value):
+    """Format a stored time as '22 Jan, 2026 (Thu) @ 10:00 AM' (unparseable values are returned as is)"""
+    if isinstance(value, datetime):
+        value = value.isoformat(' ')
+    if not isinstance(value, str):
+        return value
+    return _format_meeting(value)
+
+
+def format_meeting_times(meetings, key='meeting_time'):
+    """Format the time of every meeting dict in a list in place, once per distinct value; returns the list"""
+    formatted = {}
+    for meeting in meetings:
+        value = meeting.get(key)
+        if value not in formatted:
+            formatted[value] = format_meeting_datetime(value)
+        meeting[key] = formatted[value]
+    return meetings
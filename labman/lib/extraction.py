@@ -0,0 +1,254 @@
+"""
+Background text extraction for uploaded content.
+
+After an upload commits, its id is handed to a per-worker extractor thread,
+so the request only pays for a queue put. The thread streams the file's
+text in bounded chunks (text files are read a block at a time, PDFs a page
+at a time) and writes the chunks to ``content_chunks``, whose full-text
+index (``content_chunks_fts`` on SQLite, a GIN index on PostgreSQL) lets
+``search_content`` find documents by words and phrases in their body. The
+result is recorded in ``content.text_status``; uploads whose extraction was
+lost (e.g. the worker restarted) are picked up by ``labman db index-text``.
+"""
+import os
+import re
+import queue
+import threading
+import logging
+from labman.lib.data import get_pool, serialized_write
+
+# Extract and index the text of uploads at all
+TEXT_INDEX = os.getenv('TEXT_INDEX', 'True').lower() == 'true'
+
+# Characters per indexed chunk, and how much of the previous chunk's tail
+# is repeated at the start of the next so phrases across a boundary match
+TEXT_INDEX_CHUNK_CHARS = int(os.getenv('TEXT_INDEX_CHUNK_CHARS', '4000'))
+TEXT_INDEX_OVERLAP_CHARS = int(os.getenv('TEXT_INDEX_OVERLAP_CHARS', '200'))
+
+# Stop indexing a document after this many characters
+TEXT_INDEX_MAX_CHARS = int(os.getenv('TEXT_INDEX_MAX_CHARS', '2000000'))
+
+# Chunks written per transaction, so the write lock is never held for long
+TEXT_INDEX_BATCH = int(os.getenv('TEXT_INDEX_BATCH', '50'))
+
+# Extensions read as plain text; PDFs need the optional pypdf package
+TEXT_EXTENSIONS = {'.txt', '.md', '.tex', '.bib', '.csv', '.json', '.py'}
+PDF_EXTENSIONS = {'.pdf'}
+
+# Bytes of a text file decoded per read
+_READ_CHARS = 64 * 1024
+
+logger = logging.getLogger(__name__)
+
+
+def is_extractable(filename):
+    """Check whether text can be extracted from a file of this name"""
+    ext = os.path.splitext(filename)[1].lower()
+    return ext in TEXT_EXTENSIONS or ext in PDF_EXTENSIONS
+
+
+def _read_text_file(path):
+    """Yield a text file's contents a block at a time"""
+    with open(path, 'r', encoding='utf-8', errors='replace') as f:
+        while True:
+            block = f.read(_READ_CHARS)
+            if not block:
+                return
+            yield block
+
+
+def _read_pdf(path):
+    """Yield a PDF's text a page at a time"""
+    from pypdf import PdfReader
+    with open(path, 'rb') as f:
+        # pypdf resolves objects from the open file on demand, page by page
+        for page in PdfReader(f).pages:
+            yield (page.extract_text() or '') + '\n'
+
+
+def iter_text(path, filename=None):
+    """
+    Stream the text of a document.
+
+    Raises:
+        ValueError: If text can't be extracted from this file type
+        ImportError: For PDFs when pypdf is not installed
+    """
+    ext = os.path.splitext(filename or path)[1].lower()
+    if ext in TEXT_EXTENSIONS:
+        return _read_text_file(path)
+    if ext in PDF_EXTENSIONS:
+        return _read_pdf(path)
+    raise ValueError(f"No text extractor for {ext or 'files without an extension'}")
+
+
+_SPACE = re.compile(r'\s')
+
+
+def _last_space(text, start, end):
+    """Index of the last whitespace character in text[start:end], or -1"""
+    for i in range(end - 1, start - 1, -1):
+        if text[i].isspace():
+            return i
+    return -1
+
+
+def _first_space(text, start, end):
+    """Index of the first whitespace character in text[start:end], or -1"""
+    match = _SPACE.search(text, start, end)
+    return match.start() if match else -1
+
+
+def chunk_text(pieces, size=None, overlap=None, max_chars=None):
+    """
+    Regroup a stream of text into chunks of at most ``size`` characters.
+
+    Chunks end at whitespace where possible, and each chunk after the first
+    starts with up to ``overlap`` characters (whole words) from the end of
+    the previous one. At most ``max_chars`` characters of input are used.
+    """
+    size = size or TEXT_INDEX_CHUNK_CHARS
+    overlap = min(TEXT_INDEX_OVERLAP_CHARS if overlap is None else overlap, size // 2)
+    max_chars = max_chars or TEXT_INDEX_MAX_CHARS
+
+    buffer = ''
+    consumed = 0
+    for piece in pieces:
+        piece = piece[:max_chars - consumed]
+        consumed += len(piece)
+        buffer += piece
+        while len(buffer) >= size:
+            cut = _last_space(buffer, 0, size)
+            if cut <= overlap:
+                cut = size  # no break outside the overlap (e.g. one very long word)
+            yield buffer[:cut]
+            # Carry the whole words within `overlap` characters of the cut
+            space = _first_space(buffer, cut - overlap, cut)
+            buffer = buffer[space + 1 if space >= 0 else cut:]
+        if consumed >= max_chars:
+            break
+    if buffer.strip():
+        yield buffer
+
+
+def _set_status(conn, content_id, status):
+    """Record the extraction outcome for a content item"""
+    with serialized_write(conn):
+        conn.execute('UPDATE content SET text_status = ? WHERE id = ?', (status, content_id))
+
+
+def index_content_text(conn, content_id):
+    """
+    Extract a content item's text and replace its indexed chunks.
+
+    Runs on the given connection outside any request. Returns the status
+    recorded in content.text_status: 'indexed', 'unsupported' or 'failed'
+    (or None if the content no longer exists).
+    """
+    row = conn.execute('SELECT file_path, filename FROM content WHERE id = ?', (content_id,)).fetchone()
+    if conn.in_transaction:
+        conn.commit()
+    if row is None:
+        return None
+    file_path, filename = row[0], row[1]
+    if not is_extractable(filename):
+        _set_status(conn, content_id, 'unsupported')
+        return 'unsupported'
+
+    try:
+        with serialized_write(conn):
+            conn.execute('DELETE FROM content_chunks WHERE content_id = ?', (content_id,))
+
+        batch = []
+        number = 0
+        for chunk in chunk_text(iter_text(file_path, filename)):
+            batch.append((content_id, number, chunk.replace('\x00', ' ')))
+            number += 1
+            if len(batch) >= TEXT_INDEX_BATCH:
+                if not _write_chunks(conn, content_id, batch):
+                    return None
+                batch = []
+        if batch and not _write_chunks(conn, content_id, batch):
+            return None
+    except ImportError:
+        logger.warning(f"Cannot extract text from {filename}: install pypdf to index PDFs")
+        _set_status(conn, content_id, 'unsupported')
+        return 'unsupported'
+    except Exception as e:
+        logger.error(f"Text extraction failed for content {content_id} ({filename}): {e}")
+        _set_status(conn, content_id, 'failed')
+        return 'failed'
+
+    _set_status(conn, content_id, 'indexed')
+    return 'indexed'
+
+
+def _write_chunks(conn, content_id, batch):
+    """Insert one batch of chunks; False if the content was deleted meanwhile"""
+    with serialized_write(conn):
+        if conn.execute('SELECT 1 FROM content WHERE id = ?', (content_id,)).fetchone() is None:
+            conn.execute('DELETE FROM content_chunks WHERE content_id = ?', (content_id,))
+            return False
+        conn.executemany('INSERT INTO content_chunks (content_id, chunk, body) VALUES (?, ?, ?)', batch)
+    return True
+
+
+class TextExtractor:
+    """
+    Per-worker background thread that indexes uploaded documents.
+
+    Uploads are queued by id and processed one at a time on the thread's
+    own pooled connection, so extraction never runs on the request path.
+    """
+
+    def __init__(self):
+        self.queue = queue.Queue()
+        self.pid = os.getpid()
+        self.worker_thread = threading.Thread(
+            target=self._worker,
+            daemon=True,
+            name="TextExtractor"
+        )
+        self.worker_thread.start()
+
+    def submit(self, content_id):
+        """Queue a content item for text extraction"""
+        self.queue.put(content_id)
+
+    def flush(self):
+        """Block until every queued item has been processed"""
+        self.queue.join()
+
+    def _worker(self):
+        """Index queued content items, one at a time"""
+        while True:
+            content_id = self.queue.get()
+            try:
+                pool = get_pool()
+                conn = pool.acquire()
+                try:
+                    index_content_text(conn, content_id)
+                finally:
+                    pool.release(conn)
+            except Exception as e:
+                logger.error(f"Text extractor error for content {content_id}: {e}")
+            finally:
+                self.queue.task_done()
+
+
+_extractor = None
+_extractor_lock = threading.Lock()
+
+def get_extractor():
+    """Get this process's extractor thread, starting it on first use"""
+    global _extractor
+    if _extractor is None or _extractor.pid != os.getpid():
+        with _extractor_lock:
+            if _extractor is None or _extractor.pid != os.getpid():
+                _extractor = TextExtractor()
+    return _extractor
+
+def queue_text_extraction(content_id):
+    """Index a content item's text in the background (no-op if TEXT_INDEX is off)"""
+    if TEXT_INDEX:
+        get_extractor().submit(content_id)
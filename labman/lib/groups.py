@@ -1,23 +1,33 @@
-from labman.lib.data import get_db, query_db, execute_db
+from flask import g as flask_g, has_app_context
+from labman.lib.data import get_db, query_db, execute_db, transaction
 from labman.lib.helpers import get_lab_name
+from labman.lib.cache import VersionedCache, get_data_version
+
+# Assembled research trees, rebuilt when the 'groups' data version moves
+_tree_cache = VersionedCache(max_entries=8)
+
+# Who belongs to which group, rebuilt when the 'memberships' data version moves
+_membership_cache = VersionedCache(max_entries=8)
 
 def create_group(name, description, parent_id=None, lead_id=None):
     """Create a new research group and add creator as member"""
     try:
-        cursor = execute_db(
-            'INSERT INTO research_groups (name, description, parent_id, lead_id) VALUES (?, ?, ?, ?)',
-            (name, description, parent_id, lead_id)
-        )
-        group_id = cursor.lastrowid
-        
-        # Creator automatically joins the group
-        if lead_id:
-            add_user_to_group(lead_id, group_id)
-            
-        # Log action
         from flask import session
         from labman.lib.audit import log_action
-        log_action(session.get('user_id'), "created group", f"Name: {name}")
+        with transaction():
+            cursor = execute_db(
+                'INSERT INTO research_groups (name, description, parent_id, lead_id) VALUES (?, ?, ?, ?)',
+                (name, description, parent_id, lead_id)
+            )
+            group_id = cursor.lastrowid
+            _closure_add(group_id, parent_id)
+            
+            # Creator automatically joins the group
+            if lead_id:
+                add_user_to_group(lead_id, group_id)
+                
+            # Log action
+            log_action(session.get('user_id'), "created group", f"Name: {name}")
         
         return True
     except Exception as e:
@@ -39,12 +49,10 @@ def get_all_groups_with_counts():
     """Get all research groups with member counts"""
     groups = query_db('''
         SELECT g.*, pg.name as parent_name, u.name as lead_name,
-               COUNT(DISTINCT ug.user_id) as member_count
+               (SELECT COUNT(*) FROM user_groups ug WHERE ug.group_id = g.id) as member_count
         FROM research_groups g
         LEFT JOIN research_groups pg ON g.parent_id = pg.id
-        LEFT JOIN user_groups ug ON g.id = ug.group_id
         LEFT JOIN users u ON g.lead_id = u.id
-        GROUP BY g.id
         ORDER BY g.name
     ''')
     return [dict(group) for group in groups]
@@ -79,15 +87,28 @@ def update_group(group_id, name, description, parent_id=None, lead_id=None):
             print(f"Cannot rename default '{lab_name}' group")
             return False
         
-        execute_db(
-            'UPDATE research_groups SET name = ?, description = ?, parent_id = ?, lead_id = ? WHERE id = ?',
-            (name, description, parent_id, lead_id, group_id)
-        )
+        parent_id = int(parent_id) if parent_id else None
         
-        # Log action
         from flask import session
         from labman.lib.audit import log_action
-        log_action(session.get('user_id'), "updated group", f"Name: {name}")
+        with transaction():
+            # The update holds the write lock (on PostgreSQL, the 'groups'
+            # data_versions row its trigger bumps) until commit, so the cycle
+            # check below sees any reparent that landed before it and none
+            # can land after it
+            execute_db(
+                'UPDATE research_groups SET name = ?, description = ?, parent_id = ?, lead_id = ? WHERE id = ?',
+                (name, description, parent_id, lead_id, group_id)
+            )
+            if parent_id and is_descendant(parent_id, group_id):
+                raise ValueError(f"Cannot move group {group_id} under itself or one of its subgroups")
+            old_parent = query_db('SELECT ancestor_id FROM group_closure WHERE descendant_id = ? AND depth = 1',
+                                  (group_id,), one=True)
+            if parent_id != (old_parent['ancestor_id'] if old_parent else None):
+                _closure_move(group_id, parent_id)
+            
+            # Log action
+            log_action(session.get('user_id'), "updated group", f"Name: {name}")
         
         return True
     except Exception as e:
@@ -108,13 +129,18 @@ def delete_group(group_id):
             print(f"Cannot delete default '{lab_name}' group")
             return False
         
-        execute_db('DELETE FROM user_groups WHERE group_id = ?', (group_id,))
-        execute_db('DELETE FROM research_groups WHERE id = ?', (group_id,))
-        
-        # Log action
         from flask import session
         from labman.lib.audit import log_action
-        log_action(session.get('user_id'), "deleted group", f"Name: {group['name']}")
+        with transaction():
+            # Subgroups move up to the deleted group's parent
+            execute_db('UPDATE research_groups SET parent_id = ? WHERE parent_id = ?', (group['parent_id'], group_id))
+            _closure_remove(group_id)
+            execute_db('DELETE FROM user_groups WHERE group_id = ?', (group_id,))
+            execute_db('DELETE FROM research_groups WHERE id = ?', (group_id,))
+            
+            # Log action
+            log_action(session.get('user_id'), "deleted group", f"Name: {group['name']}")
+        invalidate_membership_index()
         
         return True
     except Exception as e:
@@ -125,9 +151,10 @@ def add_user_to_group(user_id, group_id):
     """Add a user to a research group"""
     try:
         execute_db(
-            'INSERT OR IGNORE INTO user_groups (user_id, group_id) VALUES (?, ?)',
+            'INSERT INTO user_groups (user_id, group_id) VALUES (?, ?) ON CONFLICT (user_id, group_id) DO NOTHING',
             (user_id, group_id)
         )
+        invalidate_membership_index()
         return True
     except Exception as e:
         print(f"Error adding user to group: {e}")
@@ -151,6 +178,7 @@ def remove_user_from_group(user_id, group_id):
             'DELETE FROM user_groups WHERE user_id = ? AND group_id = ?',
             (user_id, group_id)
         )
+        invalidate_membership_index()
         return True
     except Exception as e:
         print(f"Error removing user from group: {e}")
@@ -178,6 +206,41 @@ def get_group_members(group_id):
     ''', [group_id])
     return [dict(member) for member in members]
 
+def _build_membership_index():
+    groups_by_user = {}
+    members_by_group = {}
+    for row in query_db('SELECT user_id, group_id FROM user_groups'):
+        groups_by_user.setdefault(row['user_id'], set()).add(row['group_id'])
+        members_by_group.setdefault(row['group_id'], set()).add(row['user_id'])
+    return ({user_id: frozenset(ids) for user_id, ids in groups_by_user.items()},
+            {group_id: frozenset(ids) for group_id, ids in members_by_group.items()})
+
+def get_membership_index():
+    """Get (group ids by user id, member ids by group id), cached per worker and reused for the request"""
+    if has_app_context() and 'membership_index' in flask_g:
+        return flask_g.membership_index
+    index = _membership_cache.get('memberships', get_data_version('memberships'), _build_membership_index)
+    if has_app_context() and not get_db().transaction_depth:
+        flask_g.membership_index = index
+    return index
+
+def invalidate_membership_index():
+    """Make the next membership check in this request see memberships just changed"""
+    if has_app_context():
+        flask_g.pop('membership_index', None)
+
+def get_user_group_ids(user_id):
+    """Get the ids of the groups a user belongs to"""
+    return get_membership_index()[0].get(int(user_id), frozenset())
+
+def get_group_member_ids(group_id):
+    """Get the ids of the members of a group"""
+    return get_membership_index()[1].get(int(group_id), frozenset())
+
+def is_group_member(user_id, group_id):
+    """Check if a user belongs to a group"""
+    return int(group_id) in get_user_group_ids(user_id)
+
 def get_subgroups(parent_id):
     """Get all subgroups of a parent group"""
     subgroups = query_db(
@@ -186,22 +249,108 @@ def get_subgroups(parent_id):
     )
     return [dict(group) for group in subgroups]
 
+def _closure_add(group_id, parent_id):
+    """Link a new group into group_closure under parent_id (run inside the creating transaction)"""
+    execute_db('INSERT INTO group_closure (ancestor_id, descendant_id, depth) VALUES (?, ?, 0)', (group_id, group_id))
+    if parent_id:
+        execute_db('''
+            INSERT INTO group_closure (ancestor_id, descendant_id, depth)
+            SELECT ancestor_id, ?, depth + 1 FROM group_closure WHERE descendant_id = ?
+        ''', (group_id, parent_id))
+
+def _closure_move(group_id, parent_id):
+    """Re-link a group and its subtree under a new parent_id (None for a top-level group)"""
+    # Drop the paths from the old ancestors into the subtree...
+    execute_db('''
+        DELETE FROM group_closure
+        WHERE descendant_id IN (SELECT descendant_id FROM group_closure WHERE ancestor_id = ?)
+          AND ancestor_id NOT IN (SELECT descendant_id FROM group_closure WHERE ancestor_id = ?)
+    ''', (group_id, group_id))
+    # ...and add one from every new ancestor to every group in the subtree
+    if parent_id:
+        execute_db('''
+            INSERT INTO group_closure (ancestor_id, descendant_id, depth)
+            SELECT above.ancestor_id, below.descendant_id, above.depth + below.depth + 1
+            FROM group_closure above, group_closure below
+            WHERE above.descendant_id = ? AND below.ancestor_id = ?
+        ''', (parent_id, group_id))
+
+def _closure_remove(group_id):
+    """Unlink a group being deleted; the paths through it shorten as its subgroups move up"""
+    execute_db('''
+        UPDATE group_closure SET depth = depth - 1
+        WHERE ancestor_id IN (SELECT ancestor_id FROM group_closure WHERE descendant_id = ? AND depth > 0)
+          AND descendant_id IN (SELECT descendant_id FROM group_closure WHERE ancestor_id = ? AND depth > 0)
+    ''', (group_id, group_id))
+    execute_db('DELETE FROM group_closure WHERE ancestor_id = ?', (group_id,))
+    execute_db('DELETE FROM group_closure WHERE descendant_id = ?', (group_id,))
+
+def rebuild_group_closure():
+    """Recompute group_closure from the parent links (after groups were written directly)"""
+    with transaction():
+        execute_db('DELETE FROM group_closure')
+        execute_db('''
+            INSERT INTO group_closure (ancestor_id, descendant_id, depth)
+            WITH RECURSIVE chain (ancestor_id, descendant_id, depth) AS (
+                SELECT id, id, 0 FROM research_groups
+                UNION ALL
+                SELECT g.parent_id, chain.descendant_id, chain.depth + 1
+                FROM chain
+                JOIN research_groups g ON g.id = chain.ancestor_id
+                JOIN research_groups p ON p.id = g.parent_id
+                WHERE chain.depth < 64
+            )
+            SELECT ancestor_id, descendant_id, MIN(depth) FROM chain GROUP BY ancestor_id, descendant_id
+        ''')
+
+def is_descendant(group_id, ancestor_id):
+    """Check whether group_id is ancestor_id itself or one of its subgroups at any depth"""
+    row = query_db('SELECT 1 FROM group_closure WHERE ancestor_id = ? AND descendant_id = ?',
+                   [ancestor_id, group_id], one=True)
+    return row is not None
+
 def get_group_hierarchy(group_id):
-    """Get the full hierarchy path for a group"""
-    hierarchy = []
-    current_group = get_group_by_id(group_id)
-    
-    while current_group:
-        hierarchy.insert(0, current_group)
-        if current_group['parent_id']:
-            current_group = get_group_by_id(current_group['parent_id'])
-        else:
-            break
-    
-    return hierarchy
+    """Get the full hierarchy path for a group, top-level group first (breadcrumbs)"""
+    hierarchy = query_db('''
+        SELECT g.*, pg.name as parent_name, u.name as lead_name, u.email as lead_email
+        FROM group_closure c
+        JOIN research_groups g ON g.id = c.ancestor_id
+        LEFT JOIN research_groups pg ON g.parent_id = pg.id
+        LEFT JOIN users u ON g.lead_id = u.id
+        WHERE c.descendant_id = ?
+        ORDER BY c.depth DESC
+    ''', [group_id])
+    return [dict(group) for group in hierarchy]
+
+def get_group_descendants(group_id, include_self=False):
+    """Get all subgroups of a group at any depth, nearest first, with their depth below it"""
+    descendants = query_db(f'''
+        SELECT g.*, c.depth
+        FROM group_closure c
+        JOIN research_groups g ON g.id = c.descendant_id
+        WHERE c.ancestor_id = ?{'' if include_self else ' AND c.depth > 0'}
+        ORDER BY c.depth, g.name
+    ''', [group_id])
+    return [dict(group) for group in descendants]
+
+def get_subtree_members(group_id):
+    """Get the members of a group and of all its subgroups (inherited membership)"""
+    members = query_db('''
+        SELECT u.id, u.name, u.email, u.is_admin, MIN(ug.joined_at) as joined_at
+        FROM group_closure c
+        JOIN user_groups ug ON ug.group_id = c.descendant_id
+        JOIN users u ON u.id = ug.user_id
+        WHERE c.ancestor_id = ?
+        GROUP BY u.id, u.name, u.email, u.is_admin
+        ORDER BY u.name
+    ''', [group_id])
+    return [dict(member) for member in members]
 
 def get_research_tree():
-    """Get hierarchy of groups with members"""
+    """Get hierarchy of groups with members (cached per worker; do not modify the result)"""
+    return _tree_cache.get('research_tree', get_data_version('groups'), _build_research_tree)
+
+def _build_research_tree():
     groups = get_all_groups()
     
     # Get all members for all groups
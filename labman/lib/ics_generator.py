@@ -1,47 +1,20 @@
 def generate_ics_file(meeting):
     """Generate ICS file content for a meeting"""
-    from datetime import timedelta
-    import os
-    from zoneinfo import ZoneInfo
-    from datetime import datetime
+    from datetime import datetime, timedelta, timezone
     import uuid
+    from labman.lib.datetimes import to_utc, utc_stamp
     
     try:
-        # Get timezone from environment variable
-        timezone_str = os.getenv('TIMEZONE', 'Asia/Kolkata')
-        
-        # Parse meeting time - handle multiple formats
-        meeting_time_str = meeting['meeting_time']
-        dt = None
-        
-        # Try different datetime formats
-        formats_to_try = [
-            '%Y-%m-%dT%H:%M',           # ISO format without seconds
-            '%Y-%m-%d %H:%M:%S',        # Standard format with seconds
-            '%Y-%m-%dT%H:%M:%S',        # ISO format with seconds
-        ]
-        
-        for fmt in formats_to_try:
-            try:
-                dt = datetime.strptime(meeting_time_str, fmt)
-                break
-            except ValueError:
-                continue
-        
-        if dt is None:
-            raise ValueError(f"Could not parse datetime: {meeting_time_str}")
-        
-        # Assume the stored time is in local timezone, convert to UTC
-        dt_local = dt.replace(tzinfo=ZoneInfo(timezone_str))
-        dt_utc = dt_local.astimezone(ZoneInfo('UTC'))
+        # The stored time is in the lab's time zone; ICS wants UTC
+        dt_utc = to_utc(meeting['meeting_time'])
         
         # Assume 1-hour duration
         end_dt_utc = dt_utc + timedelta(hours=1)
         
         # Format for ICS (YYYYMMDDTHHMMSSZ)
-        start_str = dt_utc.strftime('%Y%m%dT%H%M%SZ')
-        end_str = end_dt_utc.strftime('%Y%m%dT%H%M%SZ')
-        timestamp = datetime.utcnow().strftime('%Y%m%dT%H%M%SZ')
+        start_str = utc_stamp(dt_utc)
+        end_str = utc_stamp(end_dt_utc)
+        timestamp = utc_stamp(datetime.now(timezone.utc))
         
         # Generate unique ID
         uid = f"{meeting['id']}-{uuid.uuid4()}@labman"
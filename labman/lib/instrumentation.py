@@ -0,0 +1,257 @@
+"""
+Per-request SQL instrumentation.
+
+``query_db``, ``stream_db`` and ``execute_db`` report every statement here.
+While a request is being handled the statement count, total time and a
+normalized form of each statement are collected on ``flask.g``. When the
+request finishes they are written as one structured log line and, if
+enabled, as debug response headers. A statement shape that repeats more than
+``SQL_REPEAT_WARN`` times in one request (the classic N+1 pattern) is logged
+as a warning.
+
+Independently of requests, any statement slower than ``SQL_SLOW_MS`` is
+appended to a dedicated slow-query log (JSON lines) together with the shape
+of its bound parameters and its ``EXPLAIN QUERY PLAN`` at that moment;
+``labman db slowlog`` aggregates that file by statement fingerprint.
+"""
+import os
+import re
+import json
+import time
+import hashlib
+import logging
+import logging.handlers
+from functools import lru_cache
+from flask import g, current_app, has_app_context, has_request_context, request
+
+# Collect per-request statistics at all
+SQL_STATS = os.getenv('SQL_STATS', 'True').lower() == 'true'
+
+# Warn when one statement shape runs more than this many times per request
+SQL_REPEAT_WARN = int(os.getenv('SQL_REPEAT_WARN', '10'))
+
+# Add X-SQL-Queries / X-SQL-Time-Ms headers to responses (always on in debug mode)
+SQL_DEBUG_HEADERS = os.getenv('SQL_DEBUG_HEADERS', 'False').lower() == 'true'
+
+# Level of the per-request summary line
+SQL_LOG_LEVEL = getattr(logging, os.getenv('SQL_LOG_LEVEL', 'DEBUG').upper(), logging.DEBUG)
+
+# Statements slower than this go to the slow-query log (0 disables it)
+SQL_SLOW_MS = float(os.getenv('SQL_SLOW_MS', '100'))
+SQL_SLOW_LOG = os.getenv('SQL_SLOW_LOG', os.path.join(os.getcwd(), 'data', 'slow_queries.log'))
+
+logger = logging.getLogger(__name__)
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r'(?<![\w.])-?\d+(?:\.\d+)?\b')
+_IN_LIST = re.compile(r'\bIN\s*\(\s*\?(?:\s*,\s*\?)*\s*\)', re.IGNORECASE)
+_WHITESPACE = re.compile(r'\s+')
+
+
+@lru_cache(maxsize=1024)
+def normalize_sql(sql):
+    """Reduce a statement to its shape: literals become ?, IN lists collapse, whitespace is squashed"""
+    shape = _STRING_LITERAL.sub('?', sql)
+    shape = _NUMBER_LITERAL.sub('?', shape)
+    shape = _IN_LIST.sub('IN (?)', shape)
+    return _WHITESPACE.sub(' ', shape).strip()
+
+
+class RequestStats:
+    """Statement count, time and shapes seen while handling one request"""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.shapes = {}  # shape -> [count, seconds]
+
+    def record(self, sql, seconds):
+        """Add one executed statement"""
+        shape = normalize_sql(sql)
+        entry = self.shapes.setdefault(shape, [0, 0.0])
+        entry[0] += 1
+        entry[1] += seconds
+        self.count += 1
+        self.seconds += seconds
+
+        if entry[0] == SQL_REPEAT_WARN + 1:
+            path = request.path if has_request_context() else None
+            logger.warning(f"Possible N+1 query on {path}: statement ran more than {SQL_REPEAT_WARN} times: {shape}")
+
+    def repeated(self):
+        """Shapes that ran more than SQL_REPEAT_WARN times, most frequent first"""
+        hot = [(shape, n) for shape, (n, _) in self.shapes.items() if n > SQL_REPEAT_WARN]
+        return sorted(hot, key=lambda item: -item[1])
+
+
+def get_request_stats():
+    """Get the statistics for the current request, or None outside one"""
+    if not has_app_context():
+        return None
+    return g.get('_sql_stats')
+
+
+def record_query(sql, seconds, args=(), db=None):
+    """Record a statement executed by the data layer on connection db"""
+    stats = get_request_stats()
+    if stats is not None:
+        stats.record(sql, seconds)
+    if SQL_SLOW_MS and seconds * 1000 >= SQL_SLOW_MS:
+        log_slow_query(sql, seconds, args, db)
+
+
+def fingerprint(sql):
+    """Short stable identifier for a statement shape"""
+    return hashlib.sha1(normalize_sql(sql).encode()).hexdigest()[:12]
+
+
+def param_shape(args):
+    """Describe bound parameters by type without recording their values"""
+    values = args.values() if isinstance(args, dict) else args
+    shape = []
+    for value in values or ():
+        if value is None:
+            shape.append('null')
+        elif isinstance(value, (bool, int)):
+            shape.append('int')
+        elif isinstance(value, float):
+            shape.append('real')
+        elif isinstance(value, bytes):
+            shape.append('blob')
+        elif isinstance(value, str) and '%' in value:
+            # Keep only where the wildcards are: a leading % defeats any index
+            shape.append('like:' + ('%' if value.startswith('%') else '') + '...' + ('%' if value.endswith('%') else ''))
+        else:
+            shape.append('text')
+    return shape
+
+
+def explain(db, sql, args=()):
+    """Get EXPLAIN QUERY PLAN details for a statement, or None if it can't be explained"""
+    if db is None:
+        return None
+    # On PostgreSQL a failed EXPLAIN would abort the caller's transaction
+    savepoint = db.in_transaction
+    try:
+        if savepoint:
+            db.execute('SAVEPOINT explain_plan')
+        try:
+            # The detail is the last column on SQLite (id, parent, notused, detail) and the only one on PostgreSQL
+            return [row[-1] for row in db.execute('EXPLAIN QUERY PLAN ' + sql, args).fetchall()]
+        except Exception:
+            if savepoint:
+                db.execute('ROLLBACK TO explain_plan')
+            return None
+        finally:
+            if savepoint:
+                db.execute('RELEASE explain_plan')
+    except Exception:
+        return None
+
+
+_slow_logger = None
+
+
+def _get_slow_logger():
+    """Logger writing to SQL_SLOW_LOG, (re)opened when the path changes"""
+    global _slow_logger
+    if _slow_logger is None or _slow_logger.path != SQL_SLOW_LOG:
+        os.makedirs(os.path.dirname(SQL_SLOW_LOG) or '.', exist_ok=True)
+        slow_logger = logging.getLogger(__name__ + '.slow')
+        slow_logger.propagate = False
+        slow_logger.setLevel(logging.INFO)
+        for handler in list(slow_logger.handlers):
+            slow_logger.removeHandler(handler)
+            handler.close()
+        # WatchedFileHandler reopens the file after logrotate moves it
+        slow_logger.addHandler(logging.handlers.WatchedFileHandler(SQL_SLOW_LOG))
+        slow_logger.path = SQL_SLOW_LOG
+        _slow_logger = slow_logger
+    return _slow_logger
+
+
+def log_slow_query(sql, seconds, args=(), db=None):
+    """Append a slow statement, its parameter shape and query plan to the slow-query log"""
+    try:
+        entry = {
+            'ts': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'ms': round(seconds * 1000, 2),
+            'fingerprint': fingerprint(sql),
+            'sql': normalize_sql(sql),
+            'params': param_shape(args),
+            'plan': explain(db, sql, args),
+            'path': request.path if has_request_context() else None,
+        }
+        _get_slow_logger().info(json.dumps(entry))
+    except Exception as e:
+        logger.error(f"Could not write slow-query log: {e}")
+
+
+def read_slow_log(path=None):
+    """Yield the entries of a slow-query log, skipping malformed lines"""
+    with open(path or SQL_SLOW_LOG, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                yield json.loads(line)
+            except ValueError:
+                continue
+
+
+def summarize_slow_log(entries):
+    """
+    Aggregate slow-query log entries by statement fingerprint.
+
+    Returns:
+        List[Dict]: One summary per fingerprint (count, total/avg/max ms,
+        statement, parameter shapes, latest plan), slowest total first
+    """
+    groups = {}
+    for entry in entries:
+        group = groups.setdefault(entry['fingerprint'], {
+            'fingerprint': entry['fingerprint'], 'sql': entry['sql'], 'count': 0,
+            'total_ms': 0.0, 'max_ms': 0.0, 'params': set(), 'plan': None, 'last_seen': None,
+        })
+        group['count'] += 1
+        group['total_ms'] += entry['ms']
+        group['max_ms'] = max(group['max_ms'], entry['ms'])
+        group['params'].add(', '.join(entry.get('params') or []))
+        if entry.get('plan'):
+            group['plan'] = entry['plan']
+        group['last_seen'] = entry.get('ts')
+
+    summaries = sorted(groups.values(), key=lambda item: -item['total_ms'])
+    for group in summaries:
+        group['avg_ms'] = group['total_ms'] / group['count']
+        group['params'] = sorted(group['params'])
+    return summaries
+
+
+def start_request():
+    """before_request hook: start collecting statistics for this request"""
+    if SQL_STATS:
+        g._sql_stats = RequestStats()
+
+
+def finish_request(response):
+    """after_request hook: emit the summary log line and debug headers"""
+    stats = get_request_stats()
+    if stats is None:
+        return response
+
+    if SQL_DEBUG_HEADERS or current_app.debug:
+        response.headers['X-SQL-Queries'] = str(stats.count)
+        response.headers['X-SQL-Time-Ms'] = f'{stats.seconds * 1000:.2f}'
+
+    repeated = stats.repeated()
+    if logger.isEnabledFor(SQL_LOG_LEVEL) or repeated:
+        summary = {
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'queries': stats.count,
+            'sql_ms': round(stats.seconds * 1000, 2),
+            'distinct': len(stats.shapes),
+            'repeated': [{'sql': shape, 'count': n} for shape, n in repeated],
+        }
+        logger.log(logging.WARNING if repeated else SQL_LOG_LEVEL, f"sql {json.dumps(summary)}")
+    return response
@@ -1,27 +1,34 @@
-from labman.lib.data import get_db, query_db, execute_db
+from labman.lib.data import get_db, query_db, execute_db, transaction, stream_db, paginate
 from datetime import datetime
 
 def add_inventory_item(name, description, quantity, location):
     """Add a new inventory item"""
     try:
-        execute_db(
-            'INSERT INTO inventory (name, description, quantity, location) VALUES (?, ?, ?, ?)',
-            (name, description, quantity, location)
-        )
-        # Log action
         from flask import session
         from labman.lib.audit import log_action
-        log_action(session.get('user_id'), "added inventory item", f"Name: {name}")
+        with transaction():
+            execute_db(
+                'INSERT INTO inventory (name, description, quantity, location) VALUES (?, ?, ?, ?)',
+                (name, description, quantity, location)
+            )
+            # Log action
+            log_action(session.get('user_id'), "added inventory item", f"Name: {name}")
         return True
     except Exception as e:
         print(f"Error adding inventory item: {e}")
         return False
 
-def get_all_inventory():
-    """Get all inventory items"""
+def get_all_inventory(stream=False):
+    """Get all inventory items (stream=True yields them lazily)"""
+    if stream:
+        return stream_db('SELECT * FROM inventory ORDER BY name')
     items = query_db('SELECT * FROM inventory ORDER BY name')
     return [dict(item) for item in items]
 
+def get_inventory_page(cursor=None, page_size=None):
+    """Get one page of inventory items ordered by name"""
+    return paginate('SELECT * FROM inventory WHERE 1=1', sort_column='name', cursor=cursor, page_size=page_size)
+
 def get_inventory_by_id(item_id):
     """Get inventory item by ID"""
     item = query_db('SELECT * FROM inventory WHERE id = ?', [item_id], one=True)
@@ -30,16 +37,17 @@ def get_inventory_by_id(item_id):
 def update_inventory_item(item_id, name, description, quantity, location):
     """Update inventory item"""
     try:
-        execute_db(
-            '''UPDATE inventory 
-               SET name = ?, description = ?, quantity = ?, location = ?, updated_at = CURRENT_TIMESTAMP 
-               WHERE id = ?''',
-            (name, description, quantity, location, item_id)
-        )
-        # Log action
         from flask import session
         from labman.lib.audit import log_action
-        log_action(session.get('user_id'), "updated inventory item", f"ItemID: {item_id}, Name: {name}")
+        with transaction():
+            execute_db(
+                '''UPDATE inventory 
+                   SET name = ?, description = ?, quantity = ?, location = ?, updated_at = CURRENT_TIMESTAMP 
+                   WHERE id = ?''',
+                (name, description, quantity, location, item_id)
+            )
+            # Log action
+            log_action(session.get('user_id'), "updated inventory item", f"ItemID: {item_id}, Name: {name}")
         return True
     except Exception as e:
         print(f"Error updating inventory item: {e}")
@@ -63,12 +71,13 @@ def delete_inventory_item(item_id):
     """Delete an inventory item"""
     try:
         item = get_inventory_by_id(item_id)
-        execute_db('DELETE FROM inventory WHERE id = ?', (item_id,))
-        # Log action
         from flask import session
         from labman.lib.audit import log_action
-        if item:
-            log_action(session.get('user_id'), "deleted inventory item", f"Name: {item['name']}")
+        with transaction():
+            execute_db('DELETE FROM inventory WHERE id = ?', (item_id,))
+            # Log action
+            if item:
+                log_action(session.get('user_id'), "deleted inventory item", f"Name: {item['name']}")
         return True
     except Exception as e:
         print(f"Error deleting inventory item: {e}")
@@ -1,27 +1,38 @@
-from labman.lib.data import get_db, query_db, execute_db
+from labman.lib.data import get_db, query_db, execute_db, transaction, stream_db, paginate
 from labman.lib.helpers import get_lab_members
 from labman.lib.email_queue import email_queue
-from datetime import datetime
-import calendar
+from labman.lib.datetimes import to_lab_time, to_utc, utc_stamp
+from datetime import date, timedelta
+
+def normalize_meeting_time(value):
+    """Convert a meeting time ('2026-01-30T14:52', a datetime, ...) to the stored form '2026-01-30 14:52:00'"""
+    return to_lab_time(value).strftime('%Y-%m-%d %H:%M:%S')
 
 def create_meeting(title, description, meeting_time, created_by, group_id=None, tags=None, summary=None):
     """Create a new meeting"""
     try:
+        meeting_time = normalize_meeting_time(meeting_time)
+        tags = _clean_tags(tags)
         tags_str = ','.join(tags) if tags else None
-        cursor = execute_db(
-            'INSERT INTO meetings (title, description, meeting_time, created_by, group_id, tags, summary) VALUES (?, ?, ?, ?, ?, ?, ?)',
-            (title, description, meeting_time, created_by, group_id, tags_str, summary)
-        )
-        meeting_id = cursor.lastrowid
-        
-        # Auto-join creator to the meeting
-        record_meeting_response(meeting_id, created_by, 'join')
+        from labman.lib.audit import log_action
+        with transaction():
+            cursor = execute_db(
+                'INSERT INTO meetings (title, description, meeting_time, created_by, group_id, tags, summary) VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (title, description, meeting_time, created_by, group_id, tags_str, summary)
+            )
+            meeting_id = cursor.lastrowid
+            _set_meeting_tags(meeting_id, tags)
+            
+            # Auto-join creator to the meeting
+            record_meeting_response(meeting_id, created_by, 'join')
+            
+            # Log action
+            log_action(created_by, "created meeting", f"Title: {title}, Group ID: {group_id}")
         
         # Send notifications to Group members in background
         from labman.lib.email_service import send_meeting_bulk_notification
         from labman.lib.users import get_user_by_id
         from labman.lib.groups import get_group_members
-        from labman.lib.audit import log_action
         
         meeting = get_meeting_by_id(meeting_id)
         
@@ -37,16 +48,13 @@ def create_meeting(title, description, meeting_time, created_by, group_id=None,
             # Queue bulk notification
             email_queue.enqueue(send_meeting_bulk_notification, creator=creator, recipients=members, meeting=meeting)
         
-        # Log action
-        log_action(created_by, "created meeting", f"Title: {title}, Group ID: {group_id}")
-        
         return True
     except Exception as e:
         print(f"Error creating meeting: {e}")
         return False
 
-def get_all_meetings(limit=None):
-    """Get all meetings"""
+def get_all_meetings(limit=None, stream=False):
+    """Get all meetings (stream=True yields them lazily)"""
     query = '''
         SELECT m.*, u.name as created_by_name, g.name as group_name
         FROM meetings m
@@ -54,50 +62,96 @@ def get_all_meetings(limit=None):
         LEFT JOIN research_groups g ON m.group_id = g.id
         ORDER BY m.meeting_time DESC
     '''
+    params = []
     
     if limit:
-        query += f' LIMIT {limit}'
+        query += ' LIMIT ?'
+        params.append(int(limit))
     
-    meetings = query_db(query)
+    if stream:
+        return stream_db(query, params)
+    
+    meetings = query_db(query, params)
     return [dict(meeting) for meeting in meetings]
 
-def get_meetings_this_week():
-    """Get meetings for current week"""
-    meetings = query_db('''
+def get_meetings_page(cursor=None, page_size=None, tags=None):
+    """Get one page of meetings, newest first, optionally filtered by tags"""
+    query = '''
         SELECT m.*, u.name as created_by_name, g.name as group_name
         FROM meetings m
         LEFT JOIN users u ON m.created_by = u.id
         LEFT JOIN research_groups g ON m.group_id = g.id
-        WHERE DATE(m.meeting_time) >= DATE('now', 'weekday 0', '-6 days')
-        AND DATE(m.meeting_time) <= DATE('now', 'weekday 0')
-        ORDER BY m.meeting_time ASC
-    ''')
-    return [dict(meeting) for meeting in meetings]
+        WHERE 1=1
+    '''
+    params = []
+    
+    if tags:
+        tag_conditions, tag_params = _tag_filter(tags)
+        query += f' AND ({tag_conditions})'
+        params.extend(tag_params)
+    
+    return paginate(query, params, sort_column='m.meeting_time', id_column='m.id',
+                    descending=True, cursor=cursor, page_size=page_size)
 
-def get_meetings_by_month(year, month):
-    """Get meetings for specific month"""
-    meetings = query_db('''
+def _meetings_between(start, end, limit=None):
+    """Get meetings on or after date start and before date end, earliest first"""
+    # Bare column comparisons work on any backend and can use the meeting_time index
+    query = '''
         SELECT m.*, u.name as created_by_name, g.name as group_name
         FROM meetings m
         LEFT JOIN users u ON m.created_by = u.id
         LEFT JOIN research_groups g ON m.group_id = g.id
-        WHERE strftime('%Y', m.meeting_time) = ?
-        AND strftime('%m', m.meeting_time) = ?
+        WHERE m.meeting_time >= ? AND m.meeting_time < ?
         ORDER BY m.meeting_time ASC
-    ''', [str(year), f"{month:02d}"])
+    '''
+    params = [start.isoformat(), end.isoformat()]
+    if limit:
+        query += ' LIMIT ?'
+        params.append(int(limit))
+    meetings = query_db(query, params)
     return [dict(meeting) for meeting in meetings]
 
+def get_meetings_this_week(limit=None, today=None):
+    """Get meetings for current week (Monday to Sunday), optionally only the first few"""
+    today = today or date.today()
+    monday = today - timedelta(days=today.weekday())
+    return _meetings_between(monday, monday + timedelta(days=7), limit)
+
+def get_meetings_by_month(year, month):
+    """Get meetings for specific month"""
+    start = date(year, month, 1)
+    end = date(year + 1, 1, 1) if month == 12 else date(year, month + 1, 1)
+    return _meetings_between(start, end)
+
+def _clean_tags(tags):
+    """Strip tags and drop empty and repeated ones, keeping their order"""
+    cleaned = []
+    for tag in tags or []:
+        tag = tag.strip()
+        if tag and tag not in cleaned:
+            cleaned.append(tag)
+    return cleaned
+
+def _set_meeting_tags(meeting_id, tags):
+    """Replace a meeting's rows in meeting_tags (run inside the meeting's transaction)"""
+    execute_db('DELETE FROM meeting_tags WHERE meeting_id = ?', (meeting_id,))
+    for tag in tags:
+        execute_db('INSERT INTO meeting_tags (meeting_id, tag) VALUES (?, ?)', (meeting_id, tag))
+
+def _tag_filter(tags):
+    """Build the WHERE condition and params matching meetings with any of tags (ignoring case)"""
+    tags = [tag.strip() for tag in tags]
+    placeholders = ', '.join('lower(?)' for _ in tags)
+    # Looks the tags up in idx_meeting_tags_tag, then the meetings by id
+    tag_conditions = f'm.id IN (SELECT mt.meeting_id FROM meeting_tags mt WHERE lower(mt.tag) IN ({placeholders}))'
+    return tag_conditions, tags
+
 def get_meetings_by_tags(tags):
     """Get meetings filtered by tags"""
     if not tags:
         return get_all_meetings()
     
-    # Use exact matching strategy for comma-separated values
-    # We pad the stored tags with commas: ',tag1,tag2,' and search for ',tag,'
-    tag_conditions = ' OR '.join(["',' || tags || ',' LIKE ?" for _ in tags])
-    
-    # Pad the search terms with commas
-    tag_params = [f'%,{tag.strip()},%' for tag in tags]
+    tag_conditions, tag_params = _tag_filter(tags)
     
     meetings = query_db(f'''
         SELECT m.*, u.name as created_by_name, g.name as group_name
@@ -135,11 +189,20 @@ def get_meetings_by_group(group_id):
 def update_meeting(meeting_id, title, description, meeting_time, group_id=None, tags=None, summary=None, send_notification=False):
     """Update meeting information"""
     try:
+        meeting_time = normalize_meeting_time(meeting_time)
+        tags = _clean_tags(tags)
         tags_str = ','.join(tags) if tags else None
-        execute_db(
-            'UPDATE meetings SET title = ?, description = ?, meeting_time = ?, group_id = ?, tags = ?, summary = ? WHERE id = ?',
-            (title, description, meeting_time, group_id, tags_str, summary, meeting_id)
-        )
+        from flask import session
+        from labman.lib.audit import log_action
+        with transaction():
+            execute_db(
+                'UPDATE meetings SET title = ?, description = ?, meeting_time = ?, group_id = ?, tags = ?, summary = ? WHERE id = ?',
+                (title, description, meeting_time, group_id, tags_str, summary, meeting_id)
+            )
+            _set_meeting_tags(meeting_id, tags)
+            
+            # Log action
+            log_action(session.get('user_id'), "updated meeting", f"Meeting ID: {meeting_id}, Title: {title}")
         
         # Send notification if time changed
         if send_notification:
@@ -163,81 +226,32 @@ def update_meeting(meeting_id, title, description, meeting_time, group_id=None,
                 # Queue bulk update notification
                 email_queue.enqueue(send_meeting_update_bulk_notification, creator=creator, recipients=members, meeting=meeting)
         
-        # Log action
-        from flask import session
-        from labman.lib.audit import log_action
-        log_action(session.get('user_id'), "updated meeting", f"Meeting ID: {meeting_id}, Title: {title}")
-        
         return True
     except Exception as e:
         print(f"Error updating meeting: {e}")
         return False
 
+def get_tag_counts():
+    """Get the number of meetings using each tag"""
+    counts = query_db('SELECT tag, meeting_count FROM meeting_tag_counts')
+    return {row['tag']: row['meeting_count'] for row in counts}
+
 def get_all_tags():
     """Get all unique tags used in meetings"""
-    tags_data = query_db('SELECT tags FROM meetings WHERE tags IS NOT NULL AND tags != ""')
-    unique_tags = set()
-    
-    for row in tags_data:
-        if row['tags']:
-            for tag in row['tags'].split(','):
-                unique_tags.add(tag.strip())
-                
-    return sorted(list(unique_tags))
-
-def format_meeting_datetime(dt_str):
-    """Format datetime string to '22 Jan, 2026 (Thu) @ 10:00 AM' with timezone support"""
-    import os
-    from zoneinfo import ZoneInfo
-    
-    # Get timezone from environment variable, default to Asia/Kolkata
-    timezone_str = os.getenv('TIMEZONE', 'Asia/Kolkata')
-    
-    try:
-        # Parse the datetime string - try multiple formats
-        dt = None
-        formats_to_try = [
-            '%Y-%m-%dT%H:%M',           # ISO format without seconds: 2026-01-30T14:52
-            '%Y-%m-%d %H:%M:%S',        # Standard format with seconds: 2026-01-30 14:52:00
-            '%Y-%m-%dT%H:%M:%S',        # ISO format with seconds: 2026-01-30T14:52:00
-        ]
-        
-        for fmt in formats_to_try:
-            try:
-                dt = datetime.strptime(dt_str, fmt)
-                break
-            except ValueError:
-                continue
-        
-        if dt is None:
-            # If we can't parse it, return the original string
-            return dt_str
-        
-        # Assume the stored time is in local timezone
-        dt_local = dt.replace(tzinfo=ZoneInfo(timezone_str))
-        
-        day = dt_local.day
-        month = calendar.month_abbr[dt_local.month]
-        year = dt_local.year
-        weekday = calendar.day_abbr[dt_local.weekday()]
-        time = dt_local.strftime('%I:%M %p')
-        return f"{day} {month}, {year} ({weekday}) @ {time}"
-    except Exception as e:
-        print(f"Error formatting datetime '{dt_str}': {e}")
-        return dt_str
-
+    return sorted(get_tag_counts())
 
 def delete_meeting(meeting_id):
     """Delete a meeting"""
     try:
         meeting = get_meeting_by_id(meeting_id)
-        execute_db('DELETE FROM meetings WHERE id = ?', (meeting_id,))
-        
-        # Log action
         from flask import session
         from labman.lib.audit import log_action
-        if meeting:
-            log_action(session.get('user_id'), "deleted meeting", f"Title: {meeting.get('title')}")
+        with transaction():
+            execute_db('DELETE FROM meetings WHERE id = ?', (meeting_id,))
+            
+            # Log action
+            if meeting:
+                log_action(session.get('user_id'), "deleted meeting", f"Title: {meeting.get('title')}")
             
         return True
     except Exception as e:
@@ -248,8 +262,9 @@ def record_meeting_response(meeting_id, user_id, response):
     """Record user's response to meeting"""
     try:
         execute_db('''
-            INSERT OR REPLACE INTO meeting_responses (meeting_id, user_id, response)
+            INSERT INTO meeting_responses (meeting_id, user_id, response)
             VALUES (?, ?, ?)
+            ON CONFLICT (meeting_id, user_id) DO UPDATE SET response = excluded.response
         ''', (meeting_id, user_id, response))
         return True
     except Exception as e:
@@ -270,15 +285,16 @@ def get_meeting_responses(meeting_id):
 def update_meeting_summary(meeting_id, summary):
     """Update only the summary field of a meeting"""
     try:
-        execute_db(
-            'UPDATE meetings SET summary = ? WHERE id = ?',
-            (summary, meeting_id)
-        )
-        
-        # Log action
         from flask import session
         from labman.lib.audit import log_action
-        log_action(session.get('user_id'), "updated meeting summary", f"Meeting ID: {meeting_id}")
+        with transaction():
+            execute_db(
+                'UPDATE meetings SET summary = ? WHERE id = ?',
+                (summary, meeting_id)
+            )
+            
+            # Log action
+            log_action(session.get('user_id'), "updated meeting summary", f"Meeting ID: {meeting_id}")
         
         return True
     except Exception as e:
@@ -288,45 +304,17 @@ def update_meeting_summary(meeting_id, summary):
 def generate_calendar_links(meeting):
     """Generate Google and Outlook calendar links for a meeting"""
     from urllib.parse import quote
-    from datetime import timedelta
-    import os
-    from zoneinfo import ZoneInfo
     
     try:
-        # Get timezone from environment variable
-        timezone_str = os.getenv('TIMEZONE', 'Asia/Kolkata')
-        
-        # Parse meeting time - handle multiple formats
-        meeting_time_str = meeting['meeting_time']
-        dt = None
-        
-        # Try different datetime formats
-        formats_to_try = [
-            '%Y-%m-%dT%H:%M',           # ISO format without seconds: 2026-01-30T14:52
-            '%Y-%m-%d %H:%M:%S',        # Standard format with seconds: 2026-01-30 14:52:00
-            '%Y-%m-%dT%H:%M:%S',        # ISO format with seconds: 2026-01-30T14:52:00
-        ]
-        
-        for fmt in formats_to_try:
-            try:
-                dt = datetime.strptime(meeting_time_str, fmt)
-                break
-            except ValueError:
-                continue
-        
-        if dt is None:
-            raise ValueError(f"Could not parse datetime: {meeting_time_str}")
-        
-        # Assume the stored time is in local timezone, convert to UTC
-        dt_local = dt.replace(tzinfo=ZoneInfo(timezone_str))
-        dt_utc = dt_local.astimezone(ZoneInfo('UTC'))
+        # The stored time is in the lab's time zone; calendars want UTC
+        dt_utc = to_utc(meeting['meeting_time'])
         
         # Assume 1-hour duration
         end_dt_utc = dt_utc + timedelta(hours=1)
         
         # Format for calendar APIs (use UTC times in ISO format)
-        start_str = dt_utc.strftime('%Y%m%dT%H%M%SZ')
-        end_str = end_dt_utc.strftime('%Y%m%dT%H%M%SZ')
+        start_str = utc_stamp(dt_utc)
+        end_str = utc_stamp(end_dt_utc)
         
         title = quote(meeting['title'])
         description = quote(meeting['description'] or '')
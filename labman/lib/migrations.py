@@ -0,0 +1,155 @@
+"""
+Versioned schema migrations for Lab Manager.
+
+Migrations are numbered SQL files in ``labman/migrations`` named
+``NNNN_description.sql``. Each pending file is applied exactly once, inside
+its own write transaction, and recorded in the ``schema_version`` table.
+Migrations never change once released; schema changes go in a new file.
+
+PostgreSQL databases use the parallel set in ``labman/migrations/postgresql``,
+which keeps the same version numbers and names.
+"""
+import os
+import re
+import sqlite3
+from typing import List, Optional, Tuple
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'migrations')
+
+_MIGRATION_FILE = re.compile(r'^(\d{4})_(\w+)\.sql$')
+
+
+def list_migrations(directory: str = MIGRATIONS_DIR) -> List[Tuple[int, str, str]]:
+    """
+    List available migrations in version order.
+
+    Returns:
+        List[Tuple[int, str, str]]: (version, name, path) for every migration file
+
+    Raises:
+        ValueError: If two files share a version number
+    """
+    migrations = []
+    for filename in sorted(os.listdir(directory)):
+        match = _MIGRATION_FILE.match(filename)
+        if match:
+            migrations.append((int(match.group(1)), match.group(2), os.path.join(directory, filename)))
+
+    versions = [version for version, _, _ in migrations]
+    if len(versions) != len(set(versions)):
+        raise ValueError(f"Duplicate migration versions in {directory}")
+    return migrations
+
+
+def latest_version(directory: str = MIGRATIONS_DIR) -> int:
+    """Get the version the schema will be at once all migrations are applied"""
+    migrations = list_migrations(directory)
+    return migrations[-1][0] if migrations else 0
+
+
+def split_statements(sql: str) -> List[str]:
+    """
+    Split a migration script into individual statements.
+
+    Uses SQLite's own tokenizer to find statement boundaries, so semicolons
+    inside string literals or trigger bodies are handled correctly.
+
+    Raises:
+        ValueError: If the script ends with an incomplete statement
+    """
+    statements = []
+    buffer = ''
+    for line in sql.splitlines(keepends=True):
+        buffer += line
+        if sqlite3.complete_statement(buffer):
+            statements.append(buffer.strip())
+            buffer = ''
+
+    leftover = [line for line in buffer.splitlines() if line.strip() and not line.strip().startswith('--')]
+    if leftover:
+        raise ValueError(f"Incomplete SQL statement: {buffer.strip()[:80]}")
+    return statements
+
+
+def ensure_version_table(db) -> None:
+    """Create the schema_version bookkeeping table if needed"""
+    db.execute('''
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+
+def get_schema_version(db) -> int:
+    """Get the highest migration version applied to the database (0 for a new database)"""
+    try:
+        row = db.execute('SELECT COALESCE(MAX(version), 0) FROM schema_version').fetchone()
+    except Exception:
+        # No schema_version table yet (sqlite3 or psycopg error); reading must not run DDL
+        return 0
+    return row[0]
+
+
+def begin_exclusive(db) -> None:
+    """
+    Open a transaction that keeps other processes from migrating concurrently.
+
+    SQLite takes its database write lock (``BEGIN IMMEDIATE``); connections
+    that provide ``begin_exclusive()`` (PostgreSQL) take their own lock.
+    """
+    if db.in_transaction:
+        db.commit()
+    if hasattr(db, 'begin_exclusive'):
+        db.begin_exclusive()
+    else:
+        db.execute('BEGIN IMMEDIATE')
+
+
+def get_pending_migrations(db, directory: str = MIGRATIONS_DIR) -> List[Tuple[int, str, str]]:
+    """Get migrations that have not been applied yet"""
+    current = get_schema_version(db)
+    return [m for m in list_migrations(directory) if m[0] > current]
+
+
+def migrate(db, target: Optional[int] = None, directory: str = MIGRATIONS_DIR) -> List[Tuple[int, str]]:
+    """
+    Apply pending migrations up to ``target`` (default: latest).
+
+    Each migration runs in an exclusive write transaction and re-checks
+    the stored version once it holds the write lock, so several workers
+    starting at the same time apply every migration only once.
+
+    Returns:
+        List[Tuple[int, str]]: (version, name) of each migration applied
+    """
+    applied = []
+    pending = get_pending_migrations(db, directory)
+    if pending:
+        begin_exclusive(db)
+        ensure_version_table(db)
+        db.commit()
+
+    for version, name, path in pending:
+        if target is not None and version > target:
+            break
+
+        with open(path, 'r', encoding='utf-8') as f:
+            statements = split_statements(f.read())
+
+        begin_exclusive(db)
+        try:
+            if get_schema_version(db) >= version:
+                # Another process got here first
+                db.rollback()
+                continue
+            for statement in statements:
+                db.execute(statement)
+            db.execute('INSERT INTO schema_version (version, name) VALUES (?, ?)', (version, name))
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        applied.append((version, name))
+    return applied
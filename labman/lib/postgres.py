@@ -0,0 +1,298 @@
+"""
+PostgreSQL backend for the data layer.
+
+Selected by setting ``DATABASE_URL`` to a ``postgresql://`` URL. The lib
+modules keep writing the SQL they always have (``?`` placeholders, rows
+indexed by column name, ``cursor.lastrowid``); this module adapts it to
+psycopg 3 so the same code runs against a shared PostgreSQL server, which
+lets several application hosts sit behind one load balancer.
+
+Connections come from a psycopg_pool pool per worker and run in autocommit
+mode; the data layer opens transactions explicitly with ``BEGIN`` exactly as
+it does on SQLite. Date and time columns are returned as strings in the same
+``YYYY-MM-DD HH:MM:SS`` form SQLite returns, so templates and formatting
+helpers see identical values on both backends.
+"""
+import os
+import re
+import zlib
+from functools import lru_cache
+
+try:
+    import psycopg
+    import psycopg_pool
+    from psycopg.adapt import Dumper
+    from psycopg.types.string import TextLoader
+except ImportError:  # optional dependency, only needed when DATABASE_URL is set
+    psycopg = None
+
+# Connections kept open per worker (min) and the most it will open (max)
+DB_PG_POOL_MIN = int(os.getenv('DB_PG_POOL_MIN', '1'))
+DB_PG_POOL_MAX = int(os.getenv('DB_PG_POOL_MAX', '10'))
+
+# Seconds to wait for a free connection before failing the request
+DB_PG_POOL_TIMEOUT = float(os.getenv('DB_PG_POOL_TIMEOUT', '30'))
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'migrations', 'postgresql')
+
+# Key for the advisory lock that serializes schema migrations across hosts
+MIGRATION_LOCK_KEY = zlib.crc32(b'labman.migrations')
+
+_TOKEN = re.compile(r"""'(?:[^']|'')*'|"(?:[^"]|"")*"|--[^\n]*|/\*.*?\*/|\?|%|\bLIKE\b|\bEXPLAIN\s+QUERY\s+PLAN\b""",
+                    re.IGNORECASE | re.DOTALL)
+
+
+def is_postgres_url(url):
+    """Check whether a DATABASE_URL points at PostgreSQL"""
+    return bool(url) and url.split('://', 1)[0] in ('postgres', 'postgresql')
+
+
+@lru_cache(maxsize=1024)
+def translate(sql):
+    """
+    Rewrite a statement written for SQLite into psycopg's dialect.
+
+    Outside quoted literals, identifiers and comments, ``?`` placeholders become
+    ``%s``, a literal ``%`` is escaped, ``LIKE`` becomes ``ILIKE`` (SQLite's
+    LIKE ignores case, PostgreSQL's does not) and ``EXPLAIN QUERY PLAN``
+    becomes ``EXPLAIN``.
+    """
+    def replace(match):
+        token = match.group(0)
+        if token[0] in '\'"' or token[:2] in ('--', '/*'):
+            return token.replace('%', '%%')
+        if token == '?':
+            return '%s'
+        if token == '%':
+            return '%%'
+        if token.upper() == 'LIKE':
+            return 'ILIKE'
+        return 'EXPLAIN'
+    return _TOKEN.sub(replace, sql)
+
+
+class Row(tuple):
+    """Result row that, like sqlite3.Row, can be indexed by position or column name"""
+
+    def __new__(cls, values, index):
+        row = super().__new__(cls, values)
+        row._index = index
+        return row
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            return tuple.__getitem__(self, self._index[key])
+        return tuple.__getitem__(self, key)
+
+    def keys(self):
+        """Column names, in result order"""
+        return list(self._index)
+
+
+def _row_factory(cursor):
+    """psycopg row factory building Row objects"""
+    index = {column.name: i for i, column in enumerate(cursor.description or ())}
+    return lambda values: Row(values, index)
+
+
+class PostgresCursor:
+    """DB-API cursor with the sqlite3 conveniences the data layer uses"""
+
+    def __init__(self, connection, raw):
+        self.connection = connection
+        self._raw = raw
+        self._is_insert = False
+        self.row_factory = None  # sqlite3 style: row_factory(cursor, values)
+        self.arraysize = raw.arraysize
+
+    def execute(self, sql, args=()):
+        self._is_insert = sql.lstrip()[:6].upper() == 'INSERT'
+        self._raw.execute(translate(sql), tuple(args) if not isinstance(args, dict) else args)
+        return self
+
+    def executemany(self, sql, seq_of_args):
+        self._is_insert = sql.lstrip()[:6].upper() == 'INSERT'
+        self._raw.executemany(translate(sql), [tuple(args) for args in seq_of_args])
+        return self
+
+    @property
+    def description(self):
+        return self._raw.description
+
+    @property
+    def rowcount(self):
+        return self._raw.rowcount
+
+    @property
+    def lastrowid(self):
+        """Id generated by the last INSERT on this connection (via lastval()), or None"""
+        if not self._is_insert:
+            return None
+        raw = self.connection.raw
+        try:
+            # A savepoint keeps a failed lookup from aborting an open transaction
+            with raw.transaction():
+                return raw.execute('SELECT lastval()').fetchone()[0]
+        except psycopg.Error:
+            return None
+
+    def _convert(self, rows):
+        if self.row_factory is None:
+            return rows
+        return [self.row_factory(self, tuple(row)) for row in rows]
+
+    def fetchone(self):
+        row = self._raw.fetchone()
+        if row is None or self.row_factory is None:
+            return row
+        return self.row_factory(self, tuple(row))
+
+    def fetchmany(self, size=None):
+        return self._convert(self._raw.fetchmany(size or self.arraysize))
+
+    def fetchall(self):
+        return self._convert(self._raw.fetchall())
+
+    def __iter__(self):
+        return iter(self.fetchall())
+
+    def close(self):
+        self._raw.close()
+
+
+class PostgresConnection:
+    """
+    Wrapper giving a pooled psycopg connection the sqlite3 interface.
+
+    The connection is in autocommit mode, so a statement outside an explicit
+    ``BEGIN`` commits on its own; ``commit()`` and ``rollback()`` only act
+    when a transaction is open, like their sqlite3 counterparts.
+    """
+
+    def __init__(self, raw):
+        self.raw = raw
+        self.transaction_depth = 0
+
+    def cursor(self):
+        return PostgresCursor(self, self.raw.cursor(row_factory=_row_factory))
+
+    def execute(self, sql, args=()):
+        return self.cursor().execute(sql, args)
+
+    def executemany(self, sql, seq_of_args):
+        return self.cursor().executemany(sql, seq_of_args)
+
+    @property
+    def in_transaction(self):
+        return self.raw.info.transaction_status != psycopg.pq.TransactionStatus.IDLE
+
+    def commit(self):
+        if self.in_transaction:
+            self.raw.execute('COMMIT')
+
+    def rollback(self):
+        if self.in_transaction:
+            self.raw.execute('ROLLBACK')
+
+    def begin_exclusive(self):
+        """Open a transaction holding the cluster-wide migration lock"""
+        self.raw.execute('BEGIN')
+        self.lock_exclusive()
+
+    def lock_exclusive(self):
+        """Take the migration lock in the open transaction (released when it ends)"""
+        self.raw.execute('SELECT pg_advisory_xact_lock(%s)', (MIGRATION_LOCK_KEY,))
+
+    def close(self):
+        self.raw.close()
+
+
+if psycopg is not None:
+    class BoolAsIntDumper(Dumper):
+        """Send Python bools as 0/1, matching the INTEGER flag columns"""
+        oid = psycopg.postgres.types['int4'].oid
+
+        def dump(self, obj):
+            return b'1' if obj else b'0'
+
+
+def _configure(conn):
+    """Set up a new pooled connection: UTC session, dates returned as text, bools sent as 0/1"""
+    conn.execute("SET TIME ZONE 'UTC'")
+    for type_name in ('date', 'timestamp', 'timestamptz'):
+        conn.adapters.register_loader(type_name, TextLoader)
+    conn.adapters.register_dumper(bool, BoolAsIntDumper)
+
+
+class PostgresPool:
+    """
+    Per-process pool of PostgreSQL connections.
+
+    Implements the same interface as the SQLite ConnectionPool in
+    ``labman.lib.data`` (``acquire``, ``release``, ``close_all`` and the
+    backend attributes the write path and migrations consult).
+    """
+
+    backend = 'postgresql'
+    begin_write = 'BEGIN'
+    serialize_writes = False  # the server handles concurrent writers itself
+    migrations_dir = MIGRATIONS_DIR
+
+    def __init__(self, database, min_size=DB_PG_POOL_MIN, max_size=DB_PG_POOL_MAX):
+        if psycopg is None:
+            raise RuntimeError(
+                "DATABASE_URL points at PostgreSQL but psycopg is not installed. "
+                "Install it with: pip install 'ra-labMan[postgres]'"
+            )
+        self.database = database
+        self.min_size = min_size
+        self.max_size = max(min_size, max_size)
+        self._pid = os.getpid()
+        self._pool = self._open()
+
+    def _open(self):
+        """Open the underlying psycopg pool"""
+        return psycopg_pool.ConnectionPool(
+            self.database,
+            min_size=self.min_size,
+            max_size=self.max_size,
+            timeout=DB_PG_POOL_TIMEOUT,
+            kwargs={'autocommit': True},
+            configure=_configure,
+            open=True,
+        )
+
+    def _check_fork(self):
+        """Start a fresh pool in a forked child instead of sharing the parent's sockets"""
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._pool = self._open()
+
+    def is_busy_error(self, error):
+        """PostgreSQL has no database-wide write lock to retry on"""
+        return False
+
+    def acquire(self):
+        """Check a connection out of the pool, reopening it after close_all()"""
+        self._check_fork()
+        if self._pool is None:
+            self._pool = self._open()
+        return PostgresConnection(self._pool.getconn())
+
+    def release(self, conn):
+        """Roll back anything left open and return the connection to the pool"""
+        conn.transaction_depth = 0
+        try:
+            conn.rollback()
+        except psycopg.Error:
+            pass
+        if self._pool is None or getattr(conn.raw, '_pool', None) is not self._pool:
+            conn.close()
+            return
+        self._pool.putconn(conn.raw)
+
+    def close_all(self):
+        """Close every connection; the pool reopens on the next acquire()"""
+        pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.close()
@@ -1,46 +1,61 @@
-from labman.lib.data import query_db, execute_db
-from datetime import datetime
+from labman.lib.data import query_db, execute_db, transaction, paginate
+from labman.lib.cache import VersionedCache, get_data_version
+from labman.lib.datetimes import parse_date
+
+# Research plans with their Gantt layout, rebuilt when that plan's own
+# 'research:<user_id>' data version moves
+_timeline_cache = VersionedCache(max_entries=512)
 
 def get_research_plan(user_id):
     """Get research problem, progress, tasks and documents for a user"""
-    # Get problem statement and progress
-    plan = query_db('SELECT * FROM research_plans WHERE user_id = ?', [user_id], one=True)
-    plan_dict = dict(plan) if plan else {}
-    problem_statement = plan_dict.get('problem_statement', "")
-    research_progress = plan_dict.get('research_progress', "")
-    github_link = plan_dict.get('github_link', "")
-    manuscript_link = plan_dict.get('manuscript_link', "")
+    return get_research_plans([user_id])[int(user_id)]
+
+def get_research_plans(user_ids):
+    """Get the research plans of several users in three queries, as {user_id: plan like get_research_plan}"""
+    user_ids = list(dict.fromkeys(int(user_id) for user_id in user_ids))
+    if not user_ids:
+        return {}
+    placeholders = ', '.join('?' * len(user_ids))
     
-    # Get tasks
-    tasks = query_db('SELECT * FROM research_tasks WHERE user_id = ? ORDER BY due_date ASC, created_at ASC', [user_id])
-    tasks_list = [dict(task) for task in tasks]
+    # Problem statements and progress
+    plans = {row['user_id']: dict(row) for row in
+             query_db(f'SELECT * FROM research_plans WHERE user_id IN ({placeholders})', user_ids)}
     
-    # Get related documents
-    from labman.lib.content import get_content
-    documents = get_content(research_plan_id=user_id)
+    # Tasks, in each plan's order
+    tasks = {user_id: [] for user_id in user_ids}
+    for task in query_db(f'''
+        SELECT * FROM research_tasks WHERE user_id IN ({placeholders})
+        ORDER BY user_id, due_date ASC, created_at ASC
+    ''', user_ids):
+        tasks[task['user_id']].append(dict(task))
     
+    # Related documents (just what the plans list)
+    documents = {user_id: [] for user_id in user_ids}
+    for doc in query_db(f'''
+        SELECT id, title, filename, created_at, research_plan_id FROM content
+        WHERE research_plan_id IN ({placeholders})
+        ORDER BY created_at DESC
+    ''', user_ids):
+        documents[doc['research_plan_id']].append(dict(doc))
+    
+    return {user_id: _assemble_plan(plans.get(user_id, {}), tasks[user_id], documents[user_id])
+            for user_id in user_ids}
+
+def _assemble_plan(plan_dict, tasks_list, documents):
     # Calculate date range
-    start_date = None
-    end_date = None
     dates = []
-    
     for t in tasks_list:
-        if t.get('start_date'):
-            dates.append(str(t['start_date']).split(' ')[0])
-        elif t.get('created_at'):
-            dates.append(str(t['created_at']).split(' ')[0])
-        if t.get('due_date'):
-            dates.append(str(t['due_date']).split(' ')[0])
-            
-    if dates:
-        start_date = min(dates)
-        end_date = max(dates)
-        
+        dates.append(_task_start(t))
+        dates.append(parse_date(t.get('due_date')))
+    dates = [d for d in dates if d]
+    start_date = min(dates).isoformat() if dates else None
+    end_date = max(dates).isoformat() if dates else None
+    
     return {
-        'problem_statement': problem_statement,
-        'research_progress': research_progress,
-        'github_link': github_link,
-        'manuscript_link': manuscript_link,
+        'problem_statement': plan_dict.get('problem_statement', ""),
+        'research_progress': plan_dict.get('research_progress', ""),
+        'github_link': plan_dict.get('github_link', ""),
+        'manuscript_link': plan_dict.get('manuscript_link', ""),
         'comments': plan_dict.get('comments', ''),
         'tasks': tasks_list,
         'documents': documents,
@@ -48,6 +63,80 @@ def get_research_plan(user_id):
         'end_date': end_date
     }
 
+def _task_start(task):
+    """The day a task starts on the timeline: its start date, else the day it was created"""
+    return parse_date(task.get('start_date')) or parse_date(task.get('created_at'))
+
+def layout_timeline(tasks, start, end):
+    """
+    Lay out Gantt bars for tasks in the window from start to end (dates or
+    'YYYY-MM-DD' strings).
+
+    Tasks without a start begin at the window start and tasks without a due
+    date run to its end; a task due before it starts gets an empty bar at
+    its start. Bars are given as percentages of the window, clipped to it;
+    tasks entirely outside it are left out. Returns None if the window is
+    empty.
+    """
+    window_start = parse_date(start)
+    window_end = parse_date(end)
+    if not window_start or not window_end or window_end <= window_start:
+        return None
+    origin = window_start.toordinal()
+    span = window_end.toordinal() - origin
+
+    rows = []
+    for task in tasks:
+        task_start = _task_start(task) or window_start
+        task_end = parse_date(task.get('due_date')) or window_end
+        left = (task_start.toordinal() - origin) / span * 100
+        width = max(task_end.toordinal() - task_start.toordinal(), 0) / span * 100
+        if left + width <= 0 or left >= 100:
+            continue
+        if left < 0:
+            width += left
+            left = 0
+        if left + width > 100:
+            width = 100 - left
+        rows.append({
+            'task': task,
+            'start': task_start.isoformat(),
+            'end': task_end.isoformat(),
+            'left_pct': left,
+            'width_pct': width,
+        })
+    return {'start': window_start.isoformat(), 'end': window_end.isoformat(), 'rows': rows}
+
+def get_research_timeline(user_id, start, end):
+    """Get a user's research plan with its Gantt layout for a window as plan['timeline'] (cached; do not modify)"""
+    def build():
+        plan = get_research_plan(user_id)
+        plan['timeline'] = layout_timeline(plan['tasks'], start, end) if plan['tasks'] else None
+        return plan
+    key = (int(user_id), str(start), str(end))
+    return _timeline_cache.get(key, get_data_version(f'research:{int(user_id)}'), build)
+
+def get_research_portfolio(start, end, cursor=None, page_size=None, group_id=None):
+    """Get one page of members by name with their plans and Gantt layouts (member['plan']), in four queries"""
+    query = 'SELECT u.id, u.name, u.email FROM users u WHERE 1=1'
+    args = []
+    if group_id:
+        # Members of the group and of its subgroups
+        query += ''' AND u.id IN (
+            SELECT ug.user_id FROM user_groups ug
+            JOIN group_closure c ON c.descendant_id = ug.group_id
+            WHERE c.ancestor_id = ?
+        )'''
+        args.append(group_id)
+    page = paginate(query, args, sort_column='u.name', id_column='u.id', cursor=cursor, page_size=page_size)
+    
+    plans = get_research_plans([member['id'] for member in page.items])
+    for member in page.items:
+        plan = plans[member['id']]
+        plan['timeline'] = layout_timeline(plan['tasks'], start, end) if plan['tasks'] else None
+        member['plan'] = plan
+    return page
+
 def update_research_problem(user_id, problem_statement=None, research_progress=None):
     """Update research problem statement and progress independently"""
     try:
@@ -98,7 +187,7 @@ def add_research_task(user_id, task_name, due_date, status='pending', start_date
         execute_db('''
             INSERT INTO research_tasks (user_id, task_name, due_date, status, start_date)
             VALUES (?, ?, ?, ?, ?)
-        ''', (user_id, task_name, due_date, status, start_date))
+        ''', (user_id, task_name, due_date or None, status, start_date))
         return True
     except Exception as e:
         print(f"Error adding research task: {e}")
@@ -151,6 +240,9 @@ def update_task_due_date(task_id, new_due_date):
         if not current_task:
             print(f"Task {task_id} not found")
             return False
+        
+        # An empty form field clears the date (DATE columns reject '')
+        new_due_date = new_due_date or None
             
         if current_task.get('due_date'):
             old_date = str(current_task['due_date']).split(' ')[0]
@@ -171,7 +263,7 @@ def update_task_due_date(task_id, new_due_date):
 def update_task_start_date(task_id, new_start_date):
     """Update research task start date"""
     try:
-        execute_db('UPDATE research_tasks SET start_date = ? WHERE id = ?', (new_start_date, task_id))
+        execute_db('UPDATE research_tasks SET start_date = ? WHERE id = ?', (new_start_date or None, task_id))
         return True
     except Exception as e:
         print(f"Error updating task start date: {e}")
@@ -180,30 +272,31 @@ def update_task_start_date(task_id, new_start_date):
 def update_research_comments(user_id, comments):
     """Update research comments (admin/group lead only)"""
     try:
-        # Check if record exists first
-        existing = query_db('SELECT * FROM research_plans WHERE user_id = ?', [user_id], one=True)
-        
-        if not existing:
-            # Create new record with comments
-            execute_db('''
-                INSERT INTO research_plans (user_id, comments) 
-                VALUES (?, ?)
-            ''', (user_id, comments))
-        else:
-            # Update existing record
-            execute_db('''
-                UPDATE research_plans 
-                SET comments = ?, updated_at = CURRENT_TIMESTAMP 
-                WHERE user_id = ?
-            ''', (comments, user_id))
-        
-        # Log action (optional - don't fail if logging fails)
-        try:
-            from flask import session
-            from labman.lib.audit import log_action
-            log_action(session.get('user_id'), "updated research comments", f"User ID: {user_id}")
-        except Exception as log_error:
-            print(f"Warning: Could not log action: {log_error}")
+        with transaction():
+            # Check if record exists first
+            existing = query_db('SELECT * FROM research_plans WHERE user_id = ?', [user_id], one=True)
+            
+            if not existing:
+                # Create new record with comments
+                execute_db('''
+                    INSERT INTO research_plans (user_id, comments) 
+                    VALUES (?, ?)
+                ''', (user_id, comments))
+            else:
+                # Update existing record
+                execute_db('''
+                    UPDATE research_plans 
+                    SET comments = ?, updated_at = CURRENT_TIMESTAMP 
+                    WHERE user_id = ?
+                ''', (comments, user_id))
+            
+            # Log action (optional - don't fail if logging fails)
+            try:
+                from flask import session
+                from labman.lib.audit import log_action
+                log_action(session.get('user_id'), "updated research comments", f"User ID: {user_id}")
+            except Exception as log_error:
+                print(f"Warning: Could not log action: {log_error}")
         
         return True
     except Exception as e:
@@ -1,4 +1,4 @@
-from labman.lib.data import get_db, query_db, execute_db
+from labman.lib.data import get_db, query_db, execute_db, paginate
 
 def add_server(hostname, ip_address, admin_name, location, description):
     """Add a new server"""
@@ -17,6 +17,10 @@ def get_all_servers():
     servers = query_db('SELECT * FROM servers ORDER BY hostname')
     return [dict(server) for server in servers]
 
+def get_servers_page(cursor=None, page_size=None):
+    """Get one page of servers ordered by hostname"""
+    return paginate('SELECT * FROM servers WHERE 1=1', sort_column='hostname', cursor=cursor, page_size=page_size)
+
 def get_server_by_id(server_id):
     """Get server by ID"""
     server = query_db('SELECT * FROM servers WHERE id = ?', [server_id], one=True)
@@ -0,0 +1,167 @@
+"""
+Streaming file uploads.
+
+Werkzeug normally spools each uploaded file into a temporary file (or
+memory) before the view runs, and saving it afterwards copies it again.
+StreamingRequest hands the multipart parser an IncomingFile instead: each
+chunk of the request is written straight into the upload folder as it
+arrives, while the size and SHA-256 are counted, and the upload is cut off
+as soon as it passes the size limit or the uploader's storage quota.
+upload_content() then only renames the finished file into place. Only the
+endpoints listed in upload_endpoints stream this way, and only for a
+logged-in user; other requests keep Werkzeug's default handling.
+"""
+import os
+import time
+import shutil
+import hashlib
+import tempfile
+from flask import Request, current_app, session
+from werkzeug.exceptions import RequestEntityTooLarge
+from labman.lib.data import query_db
+
+# Largest single upload, and how much each user may store in total (0 = no quota)
+UPLOAD_MAX_MB = int(os.getenv('UPLOAD_MAX_MB', '100'))
+UPLOAD_QUOTA_MB = int(os.getenv('UPLOAD_QUOTA_MB', '0'))
+
+# Bytes read at a time when an upload doesn't come from a request
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+# Partly received uploads live here, inside the upload folder so that
+# storing one is a rename rather than a copy
+INCOMING_DIR = '.incoming'
+
+# Partial uploads untouched for this long were abandoned by a worker that
+# died mid-upload, and are removed when the next upload starts
+INCOMING_MAX_AGE = 3600
+
+MB = 1024 * 1024
+
+
+def default_upload_folder():
+    """Get the upload folder used when none is configured"""
+    return os.path.join(os.getcwd(), 'data', 'uploads')
+
+def upload_limit(user_id=None):
+    """Get the most bytes user_id may upload now, and the message shown when an upload goes over"""
+    limit, message = UPLOAD_MAX_MB * MB, f"Files can be at most {UPLOAD_MAX_MB} MB"
+    if UPLOAD_QUOTA_MB > 0 and user_id:
+        used = query_db('SELECT COALESCE(SUM(file_size), 0) FROM content WHERE uploaded_by = ?', (user_id,), one=True)[0]
+        remaining = max(UPLOAD_QUOTA_MB * MB - used, 0)
+        if remaining < limit:
+            limit, message = remaining, f"Upload exceeds your {UPLOAD_QUOTA_MB} MB storage quota"
+    return limit, message
+
+def sweep_incoming(folder, max_age=INCOMING_MAX_AGE):
+    """Remove partial uploads in folder that haven't been written to for max_age seconds"""
+    cutoff = time.time() - max_age
+    for entry in os.scandir(folder):
+        try:
+            if entry.name.endswith('.part') and entry.stat().st_mtime < cutoff:
+                os.remove(entry.path)
+        except FileNotFoundError:
+            pass  # finished or swept by another worker meanwhile
+
+
+class IncomingFile:
+    """
+    An upload being received into the upload folder. Chunks are written as
+    they arrive and counted towards size and sha256; writing past limit
+    discards the file and raises RequestEntityTooLarge. Closing a file that
+    was never stored discards it too.
+    """
+
+    def __init__(self, upload_folder, limit=None, message=None):
+        folder = os.path.join(upload_folder, INCOMING_DIR)
+        os.makedirs(folder, exist_ok=True)
+        sweep_incoming(folder)
+        fd, self.path = tempfile.mkstemp(suffix='.part', dir=folder)
+        self._file = os.fdopen(fd, 'w+b')
+        self._hash = hashlib.sha256()
+        self.size = 0
+        self.limit = limit
+        self.message = message
+
+    def write(self, chunk):
+        self._count(chunk)
+        return self._file.write(chunk)
+
+    def _count(self, chunk):
+        self.size += len(chunk)
+        if self.limit is not None and self.size > self.limit:
+            self.close()
+            raise RequestEntityTooLarge(self.message)
+        self._hash.update(chunk)
+
+    @property
+    def sha256(self):
+        return self._hash.hexdigest()
+
+    def store(self, folder, filename):
+        """Move the file into folder as filename (or the first free name_N.ext) and return its path"""
+        self._file.close()
+        os.makedirs(folder, exist_ok=True)
+        name, ext = os.path.splitext(filename)
+        counter = 0
+        while True:
+            path = os.path.join(folder, f"{name}_{counter}{ext}" if counter else filename)
+            try:
+                # Claim the name atomically, so concurrent uploads never share it
+                os.close(os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+                break
+            except FileExistsError:
+                counter += 1
+        shutil.move(self.path, path)
+        self.path = None
+        return path
+
+    def close(self):
+        """Close the file, discarding it unless it was stored"""
+        self._file.close()
+        if self.path:
+            try:
+                os.remove(self.path)
+            except FileNotFoundError:
+                pass
+            self.path = None
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return getattr(self._file, name)
+
+
+def receive(file, upload_folder, user_id=None):
+    """Get the IncomingFile holding an uploaded FileStorage, copying it in chunks if it wasn't streamed into upload_folder"""
+    stream = getattr(file, 'stream', None)
+    if isinstance(stream, IncomingFile):
+        return stream
+    incoming = IncomingFile(upload_folder, *upload_limit(user_id))
+    try:
+        if stream is None:
+            # Objects that can only save() themselves (like the populate
+            # script's MockFile) are saved in place, then read back to count
+            file.save(incoming.path)
+            with open(incoming.path, 'rb') as saved:
+                for chunk in iter(lambda: saved.read(UPLOAD_CHUNK_SIZE), b''):
+                    incoming._count(chunk)
+        else:
+            for chunk in iter(lambda: stream.read(UPLOAD_CHUNK_SIZE), b''):
+                incoming.write(chunk)
+    except BaseException:
+        incoming.close()
+        raise
+    return incoming
+
+
+class StreamingRequest(Request):
+    """Request whose uploaded files are received straight into the upload folder on the upload endpoints"""
+
+    # Endpoints whose uploaded files are streamed; set by the app
+    upload_endpoints = ()
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        if self.endpoint not in self.upload_endpoints or 'user_id' not in session:
+            return super()._get_file_stream(total_content_length, content_type, filename, content_length)
+        upload_folder = current_app.config.get('UPLOAD_FOLDER') or default_upload_folder()
+        return IncomingFile(upload_folder, *upload_limit(session['user_id']))
@@ -1,6 +1,8 @@
 from werkzeug.security import generate_password_hash
-from labman.lib.data import get_db, query_db, execute_db
+from labman.lib.data import get_db, query_db, execute_db, transaction, paginate
 from labman.lib.helpers import get_lab_group, get_server_url
+from labman.lib.auth import invalidate_principal
+from labman.lib.groups import invalidate_membership_index
 from labman.lib.validators import validate_email_address, sanitize_text, validate_password_strength
 from datetime import datetime, timedelta
 import secrets
@@ -19,29 +21,33 @@ def create_user(name, email, password, is_admin=False):
             print(f"Invalid email: {error}")
             return False
         
-        # Create user without password (will be set on activation)
-        cursor = execute_db(
-            'INSERT INTO users (name, email, password_hash, is_admin) VALUES (?, ?, ?, ?)',
-            (sanitized_name, normalized_email, None, is_admin)
-        )
-        user_id = cursor.lastrowid
+        from flask import session
+        from labman.lib.audit import log_action
         
-        # Add user to default Lab group
         lab_group = get_lab_group()
-        if lab_group:
-            execute_db('INSERT INTO user_groups (user_id, group_id) VALUES (?, ?)',
-                      (user_id, lab_group['id']))
+        with transaction():
+            # Create user without password (will be set on activation)
+            cursor = execute_db(
+                'INSERT INTO users (name, email, password_hash, is_admin) VALUES (?, ?, ?, ?)',
+                (sanitized_name, normalized_email, None, is_admin)
+            )
+            user_id = cursor.lastrowid
+            
+            # Add user to default Lab group
+            if lab_group:
+                execute_db('INSERT INTO user_groups (user_id, group_id) VALUES (?, ?)',
+                          (user_id, lab_group['id']))
+            
+            token = create_password_reset_token(user_id)
+            
+            # Log action
+            log_action(session.get('user_id'), "created user", f"Name: {sanitized_name}, Email: {normalized_email}")
+        invalidate_membership_index()
         
-        # Send activation email using centralized service
+        # Send activation email using centralized service, once the account is committed
         from labman.lib.email_service import send_activation_email
-        token = create_password_reset_token(user_id)
         activation_link = f"{get_server_url()}/activate/{token}"
         send_activation_email(normalized_email, sanitized_name, activation_link)
-        
-        # Log action
-        from flask import session
-        from labman.lib.audit import log_action
-        log_action(session.get('user_id'), "created user", f"Name: {sanitized_name}, Email: {normalized_email}")
 
         return True
     except Exception as e:
@@ -55,6 +61,27 @@ def get_all_users():
     users = query_db('SELECT id, name, email, is_admin, email_notifications, created_at, password_hash FROM users ORDER BY name')
     return [dict(user) for user in users]
 
+def get_user_directory(cursor=None, page_size=None, search=None):
+    """Get one page of users ordered by name, with their status and when a pending user's activation link was sent"""
+    query = '''
+        SELECT u.id, u.name, u.email, u.is_admin, u.email_notifications, u.created_at,
+               CASE WHEN u.password_hash IS NULL THEN 'pending' ELSE 'active' END AS status,
+               CASE WHEN u.password_hash IS NULL THEN (
+                   SELECT t.created_at FROM password_reset_tokens t
+                   WHERE t.user_id = u.id AND t.used = 0
+                   ORDER BY t.created_at DESC LIMIT 1
+               ) END AS activation_sent_at
+        FROM users u
+        WHERE 1=1
+    '''
+    args = []
+    if search:
+        # Match the term literally: %, _ and \ in it are not wildcards
+        pattern = '%' + search.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+        query += " AND (u.name LIKE ? ESCAPE '\\' OR u.email LIKE ? ESCAPE '\\')"
+        args += [pattern, pattern]
+    return paginate(query, args, sort_column='u.name', id_column='u.id', cursor=cursor, page_size=page_size)
+
 def get_user_by_id(user_id):
     """Get user by ID"""
     user = query_db('SELECT id, name, email, is_admin, email_notifications, created_at FROM users WHERE id = ?', 
@@ -81,14 +108,16 @@ def update_user(user_id, name, email, is_admin=False):
             print(f"Invalid email: {error}")
             return False
         
-        execute_db(
-            'UPDATE users SET name = ?, email = ?, is_admin = ? WHERE id = ?',
-            (sanitized_name, normalized_email, is_admin, user_id)
-        )
-        # Log action
         from flask import session
         from labman.lib.audit import log_action
-        log_action(session.get('user_id'), "updated user", f"UserID: {user_id}, Name: {sanitized_name}")
+        with transaction():
+            execute_db(
+                'UPDATE users SET name = ?, email = ?, is_admin = ? WHERE id = ?',
+                (sanitized_name, normalized_email, is_admin, user_id)
+            )
+            # Log action
+            log_action(session.get('user_id'), "updated user", f"UserID: {user_id}, Name: {sanitized_name}")
+        invalidate_principal(user_id)
         return True
     except Exception as e:
         print(f"Error updating user: {e}")
@@ -104,12 +133,13 @@ def update_user_password(user_id, new_password):
             return False
         
         password_hash = generate_password_hash(new_password)
-        execute_db('UPDATE users SET password_hash = ? WHERE id = ?', (password_hash, user_id))
         
-        # Log action
-        from flask import session
         from labman.lib.audit import log_action
-        log_action(user_id, "updated password", "User updated their own password")
+        with transaction():
+            execute_db('UPDATE users SET password_hash = ? WHERE id = ?', (password_hash, user_id))
+            # Log action
+            log_action(user_id, "updated password", "User updated their own password")
+        invalidate_principal(user_id)
         
         return True
     except Exception as e:
@@ -119,12 +149,11 @@ def update_user_password(user_id, new_password):
 def update_user_notifications(user_id, enabled):
     """Update user notification preferences"""
     try:
-        execute_db('UPDATE users SET email_notifications = ? WHERE id = ?', (enabled, user_id))
-        
-        # Log action
-        from flask import session
         from labman.lib.audit import log_action
-        log_action(user_id, "updated notification settings", f"Enabled: {enabled}")
+        with transaction():
+            execute_db('UPDATE users SET email_notifications = ? WHERE id = ?', (enabled, user_id))
+            # Log action
+            log_action(user_id, "updated notification settings", f"Enabled: {enabled}")
         
         return True
     except Exception as e:
@@ -140,29 +169,32 @@ def update_user_profile(user_id, name, new_email):
         
         # If email is changing, send verification
         if new_email and new_email != current_user['email']:
-            # Create verification token
-            token = create_password_reset_token(user_id)
-            # Generate verification link
-            verification_link = f"{get_server_url()}/verify-email/{token}?email={new_email}"
+            from labman.lib.audit import log_action
+            with transaction():
+                # Create verification token
+                token = create_password_reset_token(user_id)
+                
+                # Only update name for now, email will be updated after verification
+                execute_db('UPDATE users SET name = ? WHERE id = ?', (name, user_id))
+                
+                # Log action
+                log_action(user_id, "updated profile", f"Name: {name} (Email change pending)")
+            invalidate_principal(user_id)
             
             # Send verification email to NEW email
+            verification_link = f"{get_server_url()}/verify-email/{token}?email={new_email}"
             send_email_verification(new_email, name, verification_link)
             
-            # Only update name for now, email will be updated after verification
-            execute_db('UPDATE users SET name = ? WHERE id = ?', (name, user_id))
-            
-            # Log action
-            from labman.lib.audit import log_action
-            log_action(user_id, "updated profile", f"Name: {name} (Email change pending)")
-            
             return 'verification_sent'
         else:
-            # Only updating name
-            execute_db('UPDATE users SET name = ? WHERE id = ?', (name, user_id))
-            
-            # Log action
             from labman.lib.audit import log_action
-            log_action(user_id, "updated profile", f"Name: {name}")
+            with transaction():
+                # Only updating name
+                execute_db('UPDATE users SET name = ? WHERE id = ?', (name, user_id))
+                
+                # Log action
+                log_action(user_id, "updated profile", f"Name: {name}")
+            invalidate_principal(user_id)
             
             return True
     except Exception as e:
@@ -173,6 +205,7 @@ def verify_email_change(user_id, new_email):
     """Verify and update email after user confirms"""
     try:
         execute_db('UPDATE users SET email = ? WHERE id = ?', (new_email, user_id))
+        invalidate_principal(user_id)
         return True
     except Exception as e:
         print(f"Error verifying email: {e}")
@@ -187,13 +220,16 @@ def delete_user(user_id):
     """Delete a user"""
     try:
         user = get_user_by_id(user_id)
-        execute_db('DELETE FROM user_groups WHERE user_id = ?', (user_id,))
-        execute_db('DELETE FROM users WHERE id = ?', (user_id,))
-        # Log action
         from flask import session
         from labman.lib.audit import log_action
-        if user:
-            log_action(session.get('user_id'), "deleted user", f"Name: {user['name']}")
+        with transaction():
+            execute_db('DELETE FROM user_groups WHERE user_id = ?', (user_id,))
+            execute_db('DELETE FROM users WHERE id = ?', (user_id,))
+            # Log action
+            if user:
+                log_action(session.get('user_id'), "deleted user", f"Name: {user['name']}")
+        invalidate_principal(user_id)
+        invalidate_membership_index()
         return True
     except Exception as e:
         print(f"Error deleting user: {e}")
@@ -219,8 +255,8 @@ def verify_reset_token(token):
     try:
         result = query_db(
             '''SELECT user_id FROM password_reset_tokens 
-               WHERE token = ? AND used = 0 AND expires_at > datetime('now')''',
-            [token], one=True
+               WHERE token = ? AND used = 0 AND expires_at > ?''',
+            [token, datetime.now()], one=True
         )
         return result['user_id'] if result else None
     except Exception as e:
@@ -248,11 +284,12 @@ def resend_activation_email(user_id):
         if not user:
             return False
             
-        # Delete existing unused tokens
-        execute_db('DELETE FROM password_reset_tokens WHERE user_id = ? AND used = 0', (user_id,))
-        
-        # Create new activation token
-        token = create_password_reset_token(user_id)
+        with transaction():
+            # Delete existing unused tokens
+            execute_db('DELETE FROM password_reset_tokens WHERE user_id = ? AND used = 0', (user_id,))
+            
+            # Create new activation token
+            token = create_password_reset_token(user_id)
         if not token:
             return False
             
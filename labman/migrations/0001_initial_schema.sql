@@ -0,0 +1,167 @@
+-- Initial schema: the tables labman has always created on startup.
+-- IF NOT EXISTS keeps this a no-op for databases created before migrations.
+
+-- Users table
+CREATE TABLE IF NOT EXISTS users (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL,
+    email TEXT UNIQUE NOT NULL,
+    password_hash TEXT,
+    is_admin BOOLEAN DEFAULT 0,
+    email_notifications BOOLEAN DEFAULT 1,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Research groups table
+CREATE TABLE IF NOT EXISTS research_groups (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT UNIQUE NOT NULL,
+    description TEXT,
+    parent_id INTEGER,
+    lead_id INTEGER,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (parent_id) REFERENCES research_groups(id),
+    FOREIGN KEY (lead_id) REFERENCES users(id)
+);
+
+-- User-Group membership table
+CREATE TABLE IF NOT EXISTS user_groups (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER NOT NULL,
+    group_id INTEGER NOT NULL,
+    joined_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
+    FOREIGN KEY (group_id) REFERENCES research_groups(id) ON DELETE CASCADE,
+    UNIQUE(user_id, group_id)
+);
+
+-- Meetings table
+CREATE TABLE IF NOT EXISTS meetings (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    title TEXT NOT NULL,
+    description TEXT,
+    meeting_time TIMESTAMP NOT NULL,
+    created_by INTEGER NOT NULL,
+    group_id INTEGER,
+    tags TEXT,
+    summary TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (created_by) REFERENCES users(id),
+    FOREIGN KEY (group_id) REFERENCES research_groups(id)
+);
+
+-- Meeting responses table
+CREATE TABLE IF NOT EXISTS meeting_responses (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    meeting_id INTEGER NOT NULL,
+    user_id INTEGER NOT NULL,
+    response TEXT CHECK(response IN ('join', 'wont_join')),
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (meeting_id) REFERENCES meetings(id) ON DELETE CASCADE,
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
+    UNIQUE(meeting_id, user_id)
+);
+
+-- Content table
+CREATE TABLE IF NOT EXISTS content (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    title TEXT NOT NULL,
+    description TEXT,
+    filename TEXT NOT NULL,
+    file_path TEXT NOT NULL,
+    file_size INTEGER,
+    uploaded_by INTEGER NOT NULL,
+    group_id INTEGER,
+    meeting_id INTEGER,
+    research_plan_id INTEGER,  -- Linked to research_plans
+    access_level TEXT DEFAULT 'group',
+    share_link TEXT UNIQUE,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (uploaded_by) REFERENCES users(id),
+    FOREIGN KEY (group_id) REFERENCES research_groups(id),
+    FOREIGN KEY (meeting_id) REFERENCES meetings(id),
+    FOREIGN KEY (research_plan_id) REFERENCES research_plans(user_id)
+);
+
+-- Inventory table
+CREATE TABLE IF NOT EXISTS inventory (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL,
+    description TEXT,
+    quantity INTEGER DEFAULT 0,
+    location TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Servers table
+CREATE TABLE IF NOT EXISTS servers (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    hostname TEXT NOT NULL,
+    ip_address TEXT NOT NULL,
+    admin_name TEXT,
+    location TEXT,
+    description TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Research Plans table
+CREATE TABLE IF NOT EXISTS research_plans (
+    user_id INTEGER PRIMARY KEY,
+    problem_statement TEXT,
+    research_progress TEXT,  -- New field
+    github_link TEXT,
+    manuscript_link TEXT,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    start_date DATE,
+    end_date DATE,
+    comments TEXT,
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+);
+
+-- Research Tasks table
+CREATE TABLE IF NOT EXISTS research_tasks (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER NOT NULL,
+    task_name TEXT NOT NULL,
+    due_date DATE,
+    start_date DATE,
+    previous_due_date DATE,
+    status TEXT DEFAULT 'pending',
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+);
+
+-- Password reset tokens table
+CREATE TABLE IF NOT EXISTS password_reset_tokens (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER NOT NULL,
+    token TEXT UNIQUE NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    expires_at TIMESTAMP NOT NULL,
+    used BOOLEAN DEFAULT 0,
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+);
+
+-- Email failures table for tracking failed email attempts
+CREATE TABLE IF NOT EXISTS email_failures (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    email_type TEXT NOT NULL,
+    recipient TEXT NOT NULL,
+    error_message TEXT,
+    payload TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    retry_count INTEGER DEFAULT 0,
+    last_retry_at TIMESTAMP
+);
+
+-- Audit logs table
+CREATE TABLE IF NOT EXISTS audit_logs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER,
+    action TEXT NOT NULL,
+    details TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (user_id) REFERENCES users(id)
+);
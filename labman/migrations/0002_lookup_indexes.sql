@@ -0,0 +1,22 @@
+-- Secondary indexes for the hot lookups in lib/meetings.py, lib/content.py,
+-- lib/audit.py and lib/users.py. Columns already covered by a UNIQUE
+-- constraint (e.g. user_groups(user_id, ...)) are not repeated here.
+
+-- Group member lists and lab-wide membership lookups
+CREATE INDEX IF NOT EXISTS idx_user_groups_group_id ON user_groups(group_id);
+
+-- Meeting lists ordered by time and per-group meeting lists
+CREATE INDEX IF NOT EXISTS idx_meetings_meeting_time ON meetings(meeting_time);
+CREATE INDEX IF NOT EXISTS idx_meetings_group_id ON meetings(group_id);
+
+-- Content attached to meetings, research plans and groups
+CREATE INDEX IF NOT EXISTS idx_content_meeting_id ON content(meeting_id);
+CREATE INDEX IF NOT EXISTS idx_content_research_plan_id ON content(research_plan_id);
+CREATE INDEX IF NOT EXISTS idx_content_group_id ON content(group_id);
+
+-- Audit history, newest first, optionally filtered by user and action
+CREATE INDEX IF NOT EXISTS idx_audit_logs_created_at ON audit_logs(created_at);
+CREATE INDEX IF NOT EXISTS idx_audit_logs_user_action ON audit_logs(user_id, action);
+
+-- Pending activation / reset tokens per user
+CREATE INDEX IF NOT EXISTS idx_password_reset_tokens_user_used ON password_reset_tokens(user_id, used);
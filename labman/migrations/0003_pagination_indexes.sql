@@ -0,0 +1,7 @@
+-- Sort-key indexes for keyset pagination. SQLite appends the rowid to
+-- every index, so each one also orders ties by id and a page seek on
+-- (sort_key, id) is a single index range scan.
+CREATE INDEX IF NOT EXISTS idx_content_created_at ON content(created_at);
+CREATE INDEX IF NOT EXISTS idx_users_name ON users(name);
+CREATE INDEX IF NOT EXISTS idx_inventory_name ON inventory(name);
+CREATE INDEX IF NOT EXISTS idx_servers_hostname ON servers(hostname);
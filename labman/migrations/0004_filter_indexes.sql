@@ -0,0 +1,9 @@
+-- Indexes for filters found by the query-plan regression tests
+-- (labman/tests/test_query_plans.py). Each leads with the filter column and
+-- ends with the sort column, so filtered lists need no separate sort step.
+
+-- "My uploads" style listings: WHERE uploaded_by = ? ORDER BY created_at
+CREATE INDEX IF NOT EXISTS idx_content_uploaded_by ON content(uploaded_by, created_at);
+
+-- Audit history filtered by action: WHERE action = ? ORDER BY created_at
+CREATE INDEX IF NOT EXISTS idx_audit_logs_action ON audit_logs(action, created_at);
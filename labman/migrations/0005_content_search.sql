@@ -0,0 +1,35 @@
+-- Full-text index for content search (lib/content.py search_content).
+-- An external-content FTS5 table over content(title, description, filename):
+-- the text lives only in content, the index is kept in sync by the triggers
+-- below and ranked with bm25(). prefix='2 3' adds prefix indexes so short
+-- "repo*" style queries don't walk the whole term list. unicode61 splits on
+-- punctuation, so "report_v2.pdf" is found by "report", "v2" or "pdf".
+CREATE VIRTUAL TABLE IF NOT EXISTS content_fts USING fts5(
+    title,
+    description,
+    filename,
+    content='content',
+    content_rowid='id',
+    tokenize='unicode61 remove_diacritics 2',
+    prefix='2 3'
+);
+
+CREATE TRIGGER IF NOT EXISTS content_fts_insert AFTER INSERT ON content BEGIN
+    INSERT INTO content_fts (rowid, title, description, filename)
+    VALUES (new.id, new.title, new.description, new.filename);
+END;
+
+CREATE TRIGGER IF NOT EXISTS content_fts_delete AFTER DELETE ON content BEGIN
+    INSERT INTO content_fts (content_fts, rowid, title, description, filename)
+    VALUES ('delete', old.id, old.title, old.description, old.filename);
+END;
+
+CREATE TRIGGER IF NOT EXISTS content_fts_update AFTER UPDATE OF title, description, filename ON content BEGIN
+    INSERT INTO content_fts (content_fts, rowid, title, description, filename)
+    VALUES ('delete', old.id, old.title, old.description, old.filename);
+    INSERT INTO content_fts (rowid, title, description, filename)
+    VALUES (new.id, new.title, new.description, new.filename);
+END;
+
+-- Index the rows uploaded before this migration
+INSERT INTO content_fts (content_fts) VALUES ('rebuild');
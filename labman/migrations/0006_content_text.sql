@@ -0,0 +1,38 @@
+-- Text extracted from uploaded documents (lib/extraction.py), searched by
+-- lib/content.py search_content. Each document's text is stored as a run
+-- of bounded chunks with an external-content FTS5 index over them, so a
+-- large upload never becomes one huge row. Chunks are only ever inserted
+-- and deleted, so no update trigger is needed.
+-- content.text_status records the outcome of extraction ('indexed',
+-- 'unsupported' or 'failed'); NULL means not extracted yet, which is what
+-- `labman db index-text` picks up.
+ALTER TABLE content ADD COLUMN text_status TEXT;
+
+CREATE TABLE IF NOT EXISTS content_chunks (
+    id INTEGER PRIMARY KEY,
+    content_id INTEGER NOT NULL,
+    chunk INTEGER NOT NULL,
+    body TEXT NOT NULL,
+    UNIQUE (content_id, chunk)
+);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS content_chunks_fts USING fts5(
+    body,
+    content='content_chunks',
+    content_rowid='id',
+    tokenize='unicode61 remove_diacritics 2',
+    prefix='2 3'
+);
+
+CREATE TRIGGER IF NOT EXISTS content_chunks_fts_insert AFTER INSERT ON content_chunks BEGIN
+    INSERT INTO content_chunks_fts (rowid, body) VALUES (new.id, new.body);
+END;
+
+CREATE TRIGGER IF NOT EXISTS content_chunks_fts_delete AFTER DELETE ON content_chunks BEGIN
+    INSERT INTO content_chunks_fts (content_chunks_fts, rowid, body) VALUES ('delete', old.id, old.body);
+END;
+
+-- Foreign keys are not enforced on SQLite, so drop a document's chunks here
+CREATE TRIGGER IF NOT EXISTS content_chunks_cleanup AFTER DELETE ON content BEGIN
+    DELETE FROM content_chunks WHERE content_id = old.id;
+END;
@@ -0,0 +1,44 @@
+-- Meeting tags as rows instead of a comma-separated string, so filtering by
+-- tag is an index lookup (lib/meetings.py _tag_filter). meetings.tags is
+-- kept as the display string and written together with these rows.
+-- Tags match case-insensitively, hence the index on lower(tag).
+CREATE TABLE IF NOT EXISTS meeting_tags (
+    meeting_id INTEGER NOT NULL,
+    tag TEXT NOT NULL,
+    PRIMARY KEY (meeting_id, tag),
+    FOREIGN KEY (meeting_id) REFERENCES meetings(id) ON DELETE CASCADE
+);
+
+CREATE INDEX IF NOT EXISTS idx_meeting_tags_tag ON meeting_tags(lower(tag), meeting_id);
+
+-- Foreign keys are not enforced by default, so drop a meeting's tags here
+CREATE TRIGGER IF NOT EXISTS meeting_tags_cleanup AFTER DELETE ON meetings BEGIN
+    DELETE FROM meeting_tags WHERE meeting_id = old.id;
+END;
+
+-- Number of meetings per tag, kept current by the triggers below so the
+-- tag list (get_all_tags) reads a few rows instead of every meeting
+CREATE TABLE IF NOT EXISTS meeting_tag_counts (
+    tag TEXT PRIMARY KEY,
+    meeting_count INTEGER NOT NULL
+);
+
+CREATE TRIGGER IF NOT EXISTS meeting_tag_counts_insert AFTER INSERT ON meeting_tags BEGIN
+    INSERT INTO meeting_tag_counts (tag, meeting_count) VALUES (new.tag, 1)
+    ON CONFLICT (tag) DO UPDATE SET meeting_count = meeting_count + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS meeting_tag_counts_delete AFTER DELETE ON meeting_tags BEGIN
+    UPDATE meeting_tag_counts SET meeting_count = meeting_count - 1 WHERE tag = old.tag;
+    DELETE FROM meeting_tag_counts WHERE tag = old.tag AND meeting_count <= 0;
+END;
+
+-- Split the existing comma strings into rows (the triggers fill the counts)
+INSERT OR IGNORE INTO meeting_tags (meeting_id, tag)
+WITH RECURSIVE split (meeting_id, tag, rest) AS (
+    SELECT id, '', tags || ',' FROM meetings WHERE tags IS NOT NULL AND tags != ''
+    UNION ALL
+    SELECT meeting_id, trim(substr(rest, 1, instr(rest, ',') - 1)), substr(rest, instr(rest, ',') + 1)
+    FROM split WHERE rest != ''
+)
+SELECT meeting_id, tag FROM split WHERE tag != '';
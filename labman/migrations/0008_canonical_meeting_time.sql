@@ -0,0 +1,11 @@
+-- Store every meeting_time in one canonical form, 'YYYY-MM-DD HH:MM:SS' in
+-- the lab's local time. Older rows hold the browser's '2026-01-30T14:52' or
+-- '...T14:52:00' forms, which sort wrongly against the canonical ones
+-- ('T' > ' ') and so broke range scans over idx_meetings_meeting_time.
+-- New values are normalized by lib/meetings.py normalize_meeting_time.
+-- Only offset-free values are rewritten: datetime() would shift the others
+-- to UTC.
+UPDATE meetings SET meeting_time = datetime(meeting_time)
+WHERE length(meeting_time) <= 19
+  AND datetime(meeting_time) IS NOT NULL
+  AND meeting_time != datetime(meeting_time);
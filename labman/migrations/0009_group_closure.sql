@@ -0,0 +1,27 @@
+-- Closure table for the research group hierarchy: one row for every
+-- (ancestor, descendant) pair, including each group with itself at depth 0.
+-- Ancestors (breadcrumbs), descendants (subtrees) and inherited membership
+-- are single indexed lookups instead of one query per level.
+-- Kept current by lib/groups.py create_group, update_group and delete_group.
+CREATE TABLE IF NOT EXISTS group_closure (
+    ancestor_id INTEGER NOT NULL,
+    descendant_id INTEGER NOT NULL,
+    depth INTEGER NOT NULL,
+    PRIMARY KEY (ancestor_id, descendant_id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_group_closure_descendant ON group_closure(descendant_id, depth);
+
+-- Fill it from the existing parent links (dangling parents are ignored, and
+-- the depth bound stops a parent cycle from recursing forever)
+INSERT INTO group_closure (ancestor_id, descendant_id, depth)
+WITH RECURSIVE chain (ancestor_id, descendant_id, depth) AS (
+    SELECT id, id, 0 FROM research_groups
+    UNION ALL
+    SELECT g.parent_id, chain.descendant_id, chain.depth + 1
+    FROM chain
+    JOIN research_groups g ON g.id = chain.ancestor_id
+    JOIN research_groups p ON p.id = g.parent_id
+    WHERE chain.depth < 64
+)
+SELECT ancestor_id, descendant_id, MIN(depth) FROM chain GROUP BY ancestor_id, descendant_id;
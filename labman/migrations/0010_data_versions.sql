@@ -0,0 +1,44 @@
+-- Data-version counters for the per-worker caches in lib/cache.py. The
+-- triggers below bump a counter on every write to the tables its cached
+-- data is built from, so cached values are invalidated whichever code path
+-- or worker made the write.
+CREATE TABLE IF NOT EXISTS data_versions (
+    name TEXT PRIMARY KEY,
+    version INTEGER NOT NULL DEFAULT 0
+);
+
+-- 'groups': groups, memberships and the member details shown with them
+-- (the research tree)
+INSERT OR IGNORE INTO data_versions (name, version) VALUES ('groups', 0);
+
+CREATE TRIGGER IF NOT EXISTS research_groups_version_insert AFTER INSERT ON research_groups BEGIN
+    UPDATE data_versions SET version = version + 1 WHERE name = 'groups';
+END;
+
+CREATE TRIGGER IF NOT EXISTS research_groups_version_update AFTER UPDATE ON research_groups BEGIN
+    UPDATE data_versions SET version = version + 1 WHERE name = 'groups';
+END;
+
+CREATE TRIGGER IF NOT EXISTS research_groups_version_delete AFTER DELETE ON research_groups BEGIN
+    UPDATE data_versions SET version = version + 1 WHERE name = 'groups';
+END;
+
+CREATE TRIGGER IF NOT EXISTS user_groups_version_insert AFTER INSERT ON user_groups BEGIN
+    UPDATE data_versions SET version = version + 1 WHERE name = 'groups';
+END;
+
+CREATE TRIGGER IF NOT EXISTS user_groups_version_update AFTER UPDATE ON user_groups BEGIN
+    UPDATE data_versions SET version = version + 1 WHERE name = 'groups';
+END;
+
+CREATE TRIGGER IF NOT EXISTS user_groups_version_delete AFTER DELETE ON user_groups BEGIN
+    UPDATE data_versions SET version = version + 1 WHERE name = 'groups';
+END;
+
+CREATE TRIGGER IF NOT EXISTS users_groups_version_update AFTER UPDATE OF name, email, is_admin ON users BEGIN
+    UPDATE data_versions SET version = version + 1 WHERE name = 'groups';
+END;
+
+CREATE TRIGGER IF NOT EXISTS users_groups_version_delete AFTER DELETE ON users BEGIN
+    UPDATE data_versions SET version = version + 1 WHERE name = 'groups';
+END;
@@ -0,0 +1,16 @@
+-- 'memberships': who belongs to which group (the membership index in
+-- lib/groups.py). Kept apart from 'groups' so renaming a group or a user
+-- does not rebuild it.
+INSERT OR IGNORE INTO data_versions (name, version) VALUES ('memberships', 0);
+
+CREATE TRIGGER IF NOT EXISTS user_groups_membership_insert AFTER INSERT ON user_groups BEGIN
+    UPDATE data_versions SET version = version + 1 WHERE name = 'memberships';
+END;
+
+CREATE TRIGGER IF NOT EXISTS user_groups_membership_update AFTER UPDATE OF user_id, group_id ON user_groups BEGIN
+    UPDATE data_versions SET version = version + 1 WHERE name = 'memberships';
+END;
+
+CREATE TRIGGER IF NOT EXISTS user_groups_membership_delete AFTER DELETE ON user_groups BEGIN
+    UPDATE data_versions SET version = version + 1 WHERE name = 'memberships';
+END;
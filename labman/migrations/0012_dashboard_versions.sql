@@ -0,0 +1,59 @@
+-- Data versions for the dashboard fragments in lib/dashboard.py:
+-- 'meetings' moves with any meeting write, 'research' with research plans,
+-- tasks and the content fields the plan's document list shows.
+INSERT OR IGNORE INTO data_versions (name, version) VALUES ('meetings', 0);
+INSERT OR IGNORE INTO data_versions (name, version) VALUES ('research', 0);
+
+CREATE TRIGGER IF NOT EXISTS meetings_version_insert AFTER INSERT ON meetings BEGIN
+    UPDATE data_versions SET version = version + 1 WHERE name = 'meetings';
+END;
+
+CREATE TRIGGER IF NOT EXISTS meetings_version_update AFTER UPDATE ON meetings BEGIN
+    UPDATE data_versions SET version = version + 1 WHERE name = 'meetings';
+END;
+
+CREATE TRIGGER IF NOT EXISTS meetings_version_delete AFTER DELETE ON meetings BEGIN
+    UPDATE data_versions SET version = version + 1 WHERE name = 'meetings';
+END;
+
+CREATE TRIGGER IF NOT EXISTS research_plans_version_insert AFTER INSERT ON research_plans BEGIN
+    UPDATE data_versions SET version = version + 1 WHERE name = 'research';
+END;
+
+CREATE TRIGGER IF NOT EXISTS research_plans_version_update AFTER UPDATE ON research_plans BEGIN
+    UPDATE data_versions SET version = version + 1 WHERE name = 'research';
+END;
+
+CREATE TRIGGER IF NOT EXISTS research_plans_version_delete AFTER DELETE ON research_plans BEGIN
+    UPDATE data_versions SET version = version + 1 WHERE name = 'research';
+END;
+
+CREATE TRIGGER IF NOT EXISTS research_tasks_version_insert AFTER INSERT ON research_tasks BEGIN
+    UPDATE data_versions SET version = version + 1 WHERE name = 'research';
+END;
+
+CREATE TRIGGER IF NOT EXISTS research_tasks_version_update AFTER UPDATE ON research_tasks BEGIN
+    UPDATE data_versions SET version = version + 1 WHERE name = 'research';
+END;
+
+CREATE TRIGGER IF NOT EXISTS research_tasks_version_delete AFTER DELETE ON research_tasks BEGIN
+    UPDATE data_versions SET version = version + 1 WHERE name = 'research';
+END;
+
+CREATE TRIGGER IF NOT EXISTS content_research_version_insert AFTER INSERT ON content
+WHEN NEW.research_plan_id IS NOT NULL BEGIN
+    UPDATE data_versions SET version = version + 1 WHERE name = 'research';
+END;
+
+CREATE TRIGGER IF NOT EXISTS content_research_version_update AFTER UPDATE OF title, filename, research_plan_id ON content
+WHEN OLD.research_plan_id IS NOT NULL OR NEW.research_plan_id IS NOT NULL BEGIN
+    UPDATE data_versions SET version = version + 1 WHERE name = 'research';
+END;
+
+CREATE TRIGGER IF NOT EXISTS content_research_version_delete AFTER DELETE ON content
+WHEN OLD.research_plan_id IS NOT NULL BEGIN
+    UPDATE data_versions SET version = version + 1 WHERE name = 'research';
+END;
+
+-- A user's tasks, in the order the research plan lists them
+CREATE INDEX IF NOT EXISTS idx_research_tasks_user_due ON research_tasks(user_id, due_date, created_at);
@@ -0,0 +1,3 @@
+-- SHA-256 of each uploaded file, computed while the upload streams in.
+-- NULL for files uploaded before this migration.
+ALTER TABLE content ADD COLUMN sha256 TEXT;
@@ -0,0 +1,59 @@
+-- Per-plan data versions for the research timelines in lib/research.py:
+-- 'research:<user_id>' moves with any write to that user's plan, tasks or
+-- the content fields the plan's document list shows. Rows are created on
+-- the first write; a missing row reads as version 0.
+CREATE TRIGGER IF NOT EXISTS research_plans_plan_version_insert AFTER INSERT ON research_plans BEGIN
+    INSERT INTO data_versions (name, version) VALUES ('research:' || NEW.user_id, 1)
+        ON CONFLICT(name) DO UPDATE SET version = version + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS research_plans_plan_version_update AFTER UPDATE ON research_plans BEGIN
+    INSERT INTO data_versions (name, version) VALUES ('research:' || NEW.user_id, 1)
+        ON CONFLICT(name) DO UPDATE SET version = version + 1;
+    INSERT INTO data_versions (name, version) VALUES ('research:' || OLD.user_id, 1)
+        ON CONFLICT(name) DO UPDATE SET version = version + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS research_plans_plan_version_delete AFTER DELETE ON research_plans BEGIN
+    INSERT INTO data_versions (name, version) VALUES ('research:' || OLD.user_id, 1)
+        ON CONFLICT(name) DO UPDATE SET version = version + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS research_tasks_plan_version_insert AFTER INSERT ON research_tasks BEGIN
+    INSERT INTO data_versions (name, version) VALUES ('research:' || NEW.user_id, 1)
+        ON CONFLICT(name) DO UPDATE SET version = version + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS research_tasks_plan_version_update AFTER UPDATE ON research_tasks BEGIN
+    INSERT INTO data_versions (name, version) VALUES ('research:' || NEW.user_id, 1)
+        ON CONFLICT(name) DO UPDATE SET version = version + 1;
+    INSERT INTO data_versions (name, version) VALUES ('research:' || OLD.user_id, 1)
+        ON CONFLICT(name) DO UPDATE SET version = version + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS research_tasks_plan_version_delete AFTER DELETE ON research_tasks BEGIN
+    INSERT INTO data_versions (name, version) VALUES ('research:' || OLD.user_id, 1)
+        ON CONFLICT(name) DO UPDATE SET version = version + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS content_plan_version_insert AFTER INSERT ON content
+WHEN NEW.research_plan_id IS NOT NULL BEGIN
+    INSERT INTO data_versions (name, version) VALUES ('research:' || NEW.research_plan_id, 1)
+        ON CONFLICT(name) DO UPDATE SET version = version + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS content_plan_version_update AFTER UPDATE OF title, filename, research_plan_id ON content
+WHEN OLD.research_plan_id IS NOT NULL OR NEW.research_plan_id IS NOT NULL BEGIN
+    INSERT INTO data_versions (name, version)
+        SELECT 'research:' || NEW.research_plan_id, 1 WHERE NEW.research_plan_id IS NOT NULL
+        ON CONFLICT(name) DO UPDATE SET version = version + 1;
+    INSERT INTO data_versions (name, version)
+        SELECT 'research:' || OLD.research_plan_id, 1 WHERE OLD.research_plan_id IS NOT NULL
+        ON CONFLICT(name) DO UPDATE SET version = version + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS content_plan_version_delete AFTER DELETE ON content
+WHEN OLD.research_plan_id IS NOT NULL BEGIN
+    INSERT INTO data_versions (name, version) VALUES ('research:' || OLD.research_plan_id, 1)
+        ON CONFLICT(name) DO UPDATE SET version = version + 1;
+END;
@@ -0,0 +1,162 @@
+-- Initial schema for PostgreSQL, table for table the same as the SQLite one.
+-- Flags stay INTEGER 0/1 so the lib modules' "= 1" comparisons work
+-- unchanged, and timestamps default to UTC like SQLite's CURRENT_TIMESTAMP.
+-- SQLite runs with foreign_keys OFF and the delete paths rely on that, so
+-- only the ON DELETE CASCADE references are declared here; PostgreSQL
+-- would otherwise refuse to delete users that still own meetings or content.
+
+-- Users table
+CREATE TABLE IF NOT EXISTS users (
+    id SERIAL PRIMARY KEY,
+    name TEXT NOT NULL,
+    email TEXT UNIQUE NOT NULL,
+    password_hash TEXT,
+    is_admin INTEGER DEFAULT 0,
+    email_notifications INTEGER DEFAULT 1,
+    created_at TIMESTAMP(0) DEFAULT (CURRENT_TIMESTAMP AT TIME ZONE 'UTC')
+);
+
+-- Research groups table
+CREATE TABLE IF NOT EXISTS research_groups (
+    id SERIAL PRIMARY KEY,
+    name TEXT UNIQUE NOT NULL,
+    description TEXT,
+    parent_id INTEGER,
+    lead_id INTEGER,
+    created_at TIMESTAMP(0) DEFAULT (CURRENT_TIMESTAMP AT TIME ZONE 'UTC')
+);
+
+-- User-Group membership table
+CREATE TABLE IF NOT EXISTS user_groups (
+    id SERIAL PRIMARY KEY,
+    user_id INTEGER NOT NULL,
+    group_id INTEGER NOT NULL,
+    joined_at TIMESTAMP(0) DEFAULT (CURRENT_TIMESTAMP AT TIME ZONE 'UTC'),
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
+    FOREIGN KEY (group_id) REFERENCES research_groups(id) ON DELETE CASCADE,
+    UNIQUE(user_id, group_id)
+);
+
+-- Meetings table
+CREATE TABLE IF NOT EXISTS meetings (
+    id SERIAL PRIMARY KEY,
+    title TEXT NOT NULL,
+    description TEXT,
+    meeting_time TIMESTAMP(0) NOT NULL,
+    created_by INTEGER NOT NULL,
+    group_id INTEGER,
+    tags TEXT,
+    summary TEXT,
+    created_at TIMESTAMP(0) DEFAULT (CURRENT_TIMESTAMP AT TIME ZONE 'UTC')
+);
+
+-- Meeting responses table
+CREATE TABLE IF NOT EXISTS meeting_responses (
+    id SERIAL PRIMARY KEY,
+    meeting_id INTEGER NOT NULL,
+    user_id INTEGER NOT NULL,
+    response TEXT CHECK(response IN ('join', 'wont_join')),
+    created_at TIMESTAMP(0) DEFAULT (CURRENT_TIMESTAMP AT TIME ZONE 'UTC'),
+    FOREIGN KEY (meeting_id) REFERENCES meetings(id) ON DELETE CASCADE,
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
+    UNIQUE(meeting_id, user_id)
+);
+
+-- Content table
+CREATE TABLE IF NOT EXISTS content (
+    id SERIAL PRIMARY KEY,
+    title TEXT NOT NULL,
+    description TEXT,
+    filename TEXT NOT NULL,
+    file_path TEXT NOT NULL,
+    file_size BIGINT,
+    uploaded_by INTEGER NOT NULL,
+    group_id INTEGER,
+    meeting_id INTEGER,
+    research_plan_id INTEGER,  -- Linked to research_plans
+    access_level TEXT DEFAULT 'group',
+    share_link TEXT UNIQUE,
+    created_at TIMESTAMP(0) DEFAULT (CURRENT_TIMESTAMP AT TIME ZONE 'UTC')
+);
+
+-- Inventory table
+CREATE TABLE IF NOT EXISTS inventory (
+    id SERIAL PRIMARY KEY,
+    name TEXT NOT NULL,
+    description TEXT,
+    quantity INTEGER DEFAULT 0,
+    location TEXT,
+    created_at TIMESTAMP(0) DEFAULT (CURRENT_TIMESTAMP AT TIME ZONE 'UTC'),
+    updated_at TIMESTAMP(0) DEFAULT (CURRENT_TIMESTAMP AT TIME ZONE 'UTC')
+);
+
+-- Servers table
+CREATE TABLE IF NOT EXISTS servers (
+    id SERIAL PRIMARY KEY,
+    hostname TEXT NOT NULL,
+    ip_address TEXT NOT NULL,
+    admin_name TEXT,
+    location TEXT,
+    description TEXT,
+    created_at TIMESTAMP(0) DEFAULT (CURRENT_TIMESTAMP AT TIME ZONE 'UTC'),
+    updated_at TIMESTAMP(0) DEFAULT (CURRENT_TIMESTAMP AT TIME ZONE 'UTC')
+);
+
+-- Research Plans table
+CREATE TABLE IF NOT EXISTS research_plans (
+    user_id INTEGER PRIMARY KEY,
+    problem_statement TEXT,
+    research_progress TEXT,  -- New field
+    github_link TEXT,
+    manuscript_link TEXT,
+    updated_at TIMESTAMP(0) DEFAULT (CURRENT_TIMESTAMP AT TIME ZONE 'UTC'),
+    start_date DATE,
+    end_date DATE,
+    comments TEXT,
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+);
+
+-- Research Tasks table
+CREATE TABLE IF NOT EXISTS research_tasks (
+    id SERIAL PRIMARY KEY,
+    user_id INTEGER NOT NULL,
+    task_name TEXT NOT NULL,
+    due_date DATE,
+    start_date DATE,
+    previous_due_date DATE,
+    status TEXT DEFAULT 'pending',
+    created_at TIMESTAMP(0) DEFAULT (CURRENT_TIMESTAMP AT TIME ZONE 'UTC'),
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+);
+
+-- Password reset tokens table
+CREATE TABLE IF NOT EXISTS password_reset_tokens (
+    id SERIAL PRIMARY KEY,
+    user_id INTEGER NOT NULL,
+    token TEXT UNIQUE NOT NULL,
+    created_at TIMESTAMP(0) DEFAULT (CURRENT_TIMESTAMP AT TIME ZONE 'UTC'),
+    expires_at TIMESTAMP(0) NOT NULL,
+    used INTEGER DEFAULT 0,
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+);
+
+-- Email failures table for tracking failed email attempts
+CREATE TABLE IF NOT EXISTS email_failures (
+    id SERIAL PRIMARY KEY,
+    email_type TEXT NOT NULL,
+    recipient TEXT NOT NULL,
+    error_message TEXT,
+    payload TEXT,
+    created_at TIMESTAMP(0) DEFAULT (CURRENT_TIMESTAMP AT TIME ZONE 'UTC'),
+    retry_count INTEGER DEFAULT 0,
+    last_retry_at TIMESTAMP(0)
+);
+
+-- Audit logs table
+CREATE TABLE IF NOT EXISTS audit_logs (
+    id SERIAL PRIMARY KEY,
+    user_id INTEGER,
+    action TEXT NOT NULL,
+    details TEXT,
+    created_at TIMESTAMP(0) DEFAULT (CURRENT_TIMESTAMP AT TIME ZONE 'UTC')
+);
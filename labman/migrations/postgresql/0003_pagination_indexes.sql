@@ -0,0 +1,7 @@
+-- Sort-key indexes for keyset pagination. Unlike SQLite, PostgreSQL does not
+-- append the row id to an index, so it is spelled out: each index orders
+-- ties by id and a page seek on (sort_key, id) is a single index range scan.
+CREATE INDEX IF NOT EXISTS idx_content_created_at ON content(created_at, id);
+CREATE INDEX IF NOT EXISTS idx_users_name ON users(name, id);
+CREATE INDEX IF NOT EXISTS idx_inventory_name ON inventory(name, id);
+CREATE INDEX IF NOT EXISTS idx_servers_hostname ON servers(hostname, id);
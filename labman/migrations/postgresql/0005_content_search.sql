@@ -0,0 +1,10 @@
+-- Full-text index for content search (lib/content.py search_content).
+-- A GIN index over the weighted document expression: title (A), filename
+-- with punctuation turned into spaces (B) and description (C). The
+-- expression must stay identical to _PG_DOCUMENT in lib/content.py, or the
+-- planner can't use the index.
+CREATE INDEX IF NOT EXISTS idx_content_search ON content USING GIN ((
+    setweight(to_tsvector('simple', coalesce(title, '')), 'A') ||
+    setweight(to_tsvector('simple', regexp_replace(coalesce(filename, ''), '[^[:alnum:]]+', ' ', 'g')), 'B') ||
+    setweight(to_tsvector('simple', coalesce(description, '')), 'C')
+));
@@ -0,0 +1,18 @@
+-- Text extracted from uploaded documents (lib/extraction.py), searched by
+-- lib/content.py search_content. Each document's text is stored as a run
+-- of bounded chunks; the GIN expression must stay identical to the one in
+-- search_content, or the planner can't use the index.
+-- content.text_status records the outcome of extraction ('indexed',
+-- 'unsupported' or 'failed'); NULL means not extracted yet, which is what
+-- `labman db index-text` picks up.
+ALTER TABLE content ADD COLUMN IF NOT EXISTS text_status TEXT;
+
+CREATE TABLE IF NOT EXISTS content_chunks (
+    id SERIAL PRIMARY KEY,
+    content_id INTEGER NOT NULL REFERENCES content(id) ON DELETE CASCADE,
+    chunk INTEGER NOT NULL,
+    body TEXT NOT NULL,
+    UNIQUE (content_id, chunk)
+);
+
+CREATE INDEX IF NOT EXISTS idx_content_chunks_search ON content_chunks USING GIN ((to_tsvector('simple', body)));
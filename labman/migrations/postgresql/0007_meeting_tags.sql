@@ -0,0 +1,51 @@
+-- Meeting tags as rows instead of a comma-separated string, so filtering by
+-- tag is an index lookup (lib/meetings.py _tag_filter). meetings.tags is
+-- kept as the display string and written together with these rows.
+-- Tags match case-insensitively, hence the index on lower(tag).
+CREATE TABLE IF NOT EXISTS meeting_tags (
+    meeting_id INTEGER NOT NULL REFERENCES meetings(id) ON DELETE CASCADE,
+    tag TEXT NOT NULL,
+    PRIMARY KEY (meeting_id, tag)
+);
+
+CREATE INDEX IF NOT EXISTS idx_meeting_tags_tag ON meeting_tags(lower(tag), meeting_id);
+
+-- Number of meetings per tag, kept current by the triggers below so the
+-- tag list (get_all_tags) reads a few rows instead of every meeting.
+-- Function bodies are single-quoted (no literals inside) so the migration
+-- runner's statement splitter sees them as one string, and the triggers use
+-- CREATE OR REPLACE TRIGGER (PostgreSQL 14+), which the splitter does not
+-- mistake for an SQLite trigger awaiting BEGIN ... END.
+CREATE TABLE IF NOT EXISTS meeting_tag_counts (
+    tag TEXT PRIMARY KEY,
+    meeting_count INTEGER NOT NULL
+);
+
+CREATE OR REPLACE FUNCTION meeting_tag_counts_insert() RETURNS trigger AS '
+BEGIN
+    INSERT INTO meeting_tag_counts (tag, meeting_count) VALUES (NEW.tag, 1)
+    ON CONFLICT (tag) DO UPDATE SET meeting_count = meeting_tag_counts.meeting_count + 1;
+    RETURN NEW;
+END;
+' LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION meeting_tag_counts_delete() RETURNS trigger AS '
+BEGIN
+    UPDATE meeting_tag_counts SET meeting_count = meeting_count - 1 WHERE tag = OLD.tag;
+    DELETE FROM meeting_tag_counts WHERE tag = OLD.tag AND meeting_count <= 0;
+    RETURN OLD;
+END;
+' LANGUAGE plpgsql;
+
+CREATE OR REPLACE TRIGGER meeting_tag_counts_insert AFTER INSERT ON meeting_tags
+    FOR EACH ROW EXECUTE FUNCTION meeting_tag_counts_insert();
+
+CREATE OR REPLACE TRIGGER meeting_tag_counts_delete AFTER DELETE ON meeting_tags
+    FOR EACH ROW EXECUTE FUNCTION meeting_tag_counts_delete();
+
+-- Split the existing comma strings into rows (the triggers fill the counts)
+INSERT INTO meeting_tags (meeting_id, tag)
+SELECT DISTINCT m.id, btrim(t.tag)
+FROM meetings m CROSS JOIN LATERAL unnest(string_to_array(m.tags, ',')) AS t(tag)
+WHERE btrim(t.tag) <> ''
+ON CONFLICT DO NOTHING;
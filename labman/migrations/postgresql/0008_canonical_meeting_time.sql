@@ -0,0 +1,3 @@
+-- Counterpart of the SQLite migration that rewrites meeting_time into one
+-- canonical form. meeting_time is a TIMESTAMP column here, so values are
+-- already stored canonically; this keeps the version numbers aligned.
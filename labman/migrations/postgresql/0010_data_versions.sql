@@ -0,0 +1,29 @@
+-- Data-version counters for the per-worker caches in lib/cache.py. The
+-- triggers below bump a counter on every write to the tables its cached
+-- data is built from, so cached values are invalidated whichever code path
+-- or host made the write. Statement-level triggers bump once per statement;
+-- the counter to bump is the trigger argument.
+CREATE TABLE IF NOT EXISTS data_versions (
+    name TEXT PRIMARY KEY,
+    version INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE OR REPLACE FUNCTION bump_data_version() RETURNS trigger AS '
+BEGIN
+    UPDATE data_versions SET version = version + 1 WHERE name = TG_ARGV[0];
+    RETURN NULL;
+END;
+' LANGUAGE plpgsql;
+
+-- 'groups': groups, memberships and the member details shown with them
+-- (the research tree)
+INSERT INTO data_versions (name, version) VALUES ('groups', 0) ON CONFLICT DO NOTHING;
+
+CREATE OR REPLACE TRIGGER research_groups_version AFTER INSERT OR UPDATE OR DELETE ON research_groups
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_data_version('groups');
+
+CREATE OR REPLACE TRIGGER user_groups_version AFTER INSERT OR UPDATE OR DELETE ON user_groups
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_data_version('groups');
+
+CREATE OR REPLACE TRIGGER users_groups_version AFTER UPDATE OF name, email, is_admin OR DELETE ON users
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_data_version('groups');
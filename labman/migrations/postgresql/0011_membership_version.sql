@@ -0,0 +1,7 @@
+-- 'memberships': who belongs to which group (the membership index in
+-- lib/groups.py). Kept apart from 'groups' so renaming a group or a user
+-- does not rebuild it.
+INSERT INTO data_versions (name, version) VALUES ('memberships', 0) ON CONFLICT DO NOTHING;
+
+CREATE OR REPLACE TRIGGER user_groups_membership AFTER INSERT OR UPDATE OF user_id, group_id OR DELETE ON user_groups
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_data_version('memberships');
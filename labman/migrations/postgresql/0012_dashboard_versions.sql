@@ -0,0 +1,20 @@
+-- Data versions for the dashboard fragments in lib/dashboard.py:
+-- 'meetings' moves with any meeting write, 'research' with research plans,
+-- tasks and the content fields the plan's document list shows.
+INSERT INTO data_versions (name, version) VALUES ('meetings', 0) ON CONFLICT DO NOTHING;
+INSERT INTO data_versions (name, version) VALUES ('research', 0) ON CONFLICT DO NOTHING;
+
+CREATE OR REPLACE TRIGGER meetings_version AFTER INSERT OR UPDATE OR DELETE ON meetings
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_data_version('meetings');
+
+CREATE OR REPLACE TRIGGER research_plans_version AFTER INSERT OR UPDATE OR DELETE ON research_plans
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_data_version('research');
+
+CREATE OR REPLACE TRIGGER research_tasks_version AFTER INSERT OR UPDATE OR DELETE ON research_tasks
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_data_version('research');
+
+CREATE OR REPLACE TRIGGER content_research_version AFTER INSERT OR UPDATE OF title, filename, research_plan_id OR DELETE ON content
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_data_version('research');
+
+-- A user's tasks, in the order the research plan lists them
+CREATE INDEX IF NOT EXISTS idx_research_tasks_user_due ON research_tasks(user_id, due_date, created_at);
@@ -0,0 +1,30 @@
+-- Per-plan data versions for the research timelines in lib/research.py:
+-- 'research:<user_id>' moves with any write to that user's plan, tasks or
+-- the content fields the plan's document list shows. Rows are created on
+-- the first write; a missing row reads as version 0. The trigger argument
+-- names the column holding the plan's user id.
+CREATE OR REPLACE FUNCTION bump_research_plan_version() RETURNS trigger AS '
+DECLARE
+    plan_ids text[] := ARRAY[]::text[];
+BEGIN
+    IF TG_OP <> ''DELETE'' THEN
+        plan_ids := plan_ids || (to_jsonb(NEW) ->> TG_ARGV[0]);
+    END IF;
+    IF TG_OP <> ''INSERT'' THEN
+        plan_ids := plan_ids || (to_jsonb(OLD) ->> TG_ARGV[0]);
+    END IF;
+    INSERT INTO data_versions (name, version)
+        SELECT DISTINCT ''research:'' || plan_id, 1 FROM unnest(plan_ids) AS plan_id WHERE plan_id IS NOT NULL
+        ON CONFLICT (name) DO UPDATE SET version = data_versions.version + 1;
+    RETURN NULL;
+END;
+' LANGUAGE plpgsql;
+
+CREATE OR REPLACE TRIGGER research_plans_plan_version AFTER INSERT OR UPDATE OR DELETE ON research_plans
+    FOR EACH ROW EXECUTE FUNCTION bump_research_plan_version('user_id');
+
+CREATE OR REPLACE TRIGGER research_tasks_plan_version AFTER INSERT OR UPDATE OR DELETE ON research_tasks
+    FOR EACH ROW EXECUTE FUNCTION bump_research_plan_version('user_id');
+
+CREATE OR REPLACE TRIGGER content_plan_version AFTER INSERT OR UPDATE OF title, filename, research_plan_id OR DELETE ON content
+    FOR EACH ROW EXECUTE FUNCTION bump_research_plan_version('research_plan_id');
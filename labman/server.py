@@ -1,8 +1,9 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, session, send_file, jsonify, abort
+from flask import Flask, render_template, request, redirect, url_for, flash, session, send_file, jsonify, abort, Response, stream_with_context
 from functools import wraps
 import os
 from werkzeug.middleware.proxy_fix import ProxyFix
-from labman.lib.data import init_db, get_db
+from labman.lib.data import ensure_db, get_db, close_db, transaction, Page
+from labman.lib.instrumentation import start_request, finish_request
 # ... imports ...
 from datetime import datetime, timedelta
 from dotenv import load_dotenv
@@ -12,23 +13,31 @@ load_dotenv()
 # Import all required modules
 from labman.lib.auth import login_user, logout_user, require_login, require_admin, get_current_user
 from labman.lib.audit import get_audit_logs
-from labman.lib.users import create_user, get_all_users, update_user, delete_user, get_user_by_id, update_user_password, create_password_reset_token, verify_reset_token, update_user_notifications, get_latest_activation_token, resend_activation_email
+from labman.lib.users import create_user, get_all_users, get_user_directory, update_user, delete_user, get_user_by_id, update_user_password, create_password_reset_token, verify_reset_token, update_user_notifications, resend_activation_email
 from labman.lib.users import update_user_profile, verify_email_change
-from labman.lib.groups import create_group, get_all_groups, get_all_groups_with_counts, add_user_to_group, remove_user_from_group, get_user_groups, get_group_members, get_group_by_id, update_group, delete_group
-from labman.lib.meetings import create_meeting, get_all_meetings, update_meeting, delete_meeting, get_meeting_by_id, get_meetings_this_week, get_meetings_by_month, record_meeting_response, get_meeting_responses, get_meetings_by_tags, format_meeting_datetime, get_all_tags, generate_calendar_links
-from labman.lib.content import upload_content, get_content, delete_content, get_content_by_id, check_content_access, get_content_by_share_link, get_content_by_group, update_content
-from labman.lib.inventory import add_inventory_item, get_all_inventory, update_inventory_item, delete_inventory_item
-from labman.lib.servers import add_server, get_all_servers, update_server, delete_server, get_server_by_id
-from labman.lib.research import get_research_plan, update_research_problem, add_research_task, update_research_task_status, delete_research_task, get_task_by_id, update_research_links, update_task_due_date, update_task_start_date
+from labman.lib.groups import create_group, get_all_groups, get_all_groups_with_counts, add_user_to_group, remove_user_from_group, get_user_groups, get_group_members, get_group_by_id, update_group, delete_group, get_group_hierarchy, get_group_member_ids
+from labman.lib.meetings import create_meeting, get_all_meetings, get_meetings_page, update_meeting, delete_meeting, get_meeting_by_id, get_meetings_this_week, get_meetings_by_month, record_meeting_response, get_meeting_responses, get_all_tags, generate_calendar_links, normalize_meeting_time
+from labman.lib.datetimes import format_meeting_datetime, format_meeting_times
+from labman.lib.content import upload_content, get_content, delete_content, get_content_by_id, check_content_access, get_content_by_share_link, get_content_page, update_content, search_content
+from labman.lib.inventory import add_inventory_item, get_inventory_page, update_inventory_item, delete_inventory_item
+from labman.lib.servers import add_server, get_servers_page, update_server, delete_server, get_server_by_id
+from labman.lib.dashboard import load_dashboard
+from labman.lib.uploads import StreamingRequest, UPLOAD_MAX_MB
+from labman.lib.research import get_research_timeline, get_research_portfolio, update_research_problem, add_research_task, update_research_task_status, delete_research_task, get_task_by_id, update_research_links, update_task_due_date, update_task_start_date
 
 app = Flask(__name__)
+
+class LabRequest(StreamingRequest):
+    upload_endpoints = ('upload_content_route', 'upload_research_document_route')
+
+app.request_class = LabRequest
 # Fix for gunicorn / proxy support
 # Only enable ProxyFix if explicitly enabled or if likely in production behind a proxy
 if os.getenv('PROXY_ENABLED', 'False').lower() == 'true':
     app.wsgi_app = ProxyFix(app.wsgi_app, x_for=1, x_proto=1, x_host=1, x_prefix=1)
 app.secret_key = os.getenv('FLASK_SECRET_KEY')
 app.config['UPLOAD_FOLDER'] = os.path.join(os.getcwd(), 'data', 'uploads')
-app.config['MAX_CONTENT_LENGTH'] = 100 * 1024 * 1024  # 100MB max file size
+app.config['MAX_CONTENT_LENGTH'] = (UPLOAD_MAX_MB + 1) * 1024 * 1024  # the largest file plus the form fields
 
 # Session Security Configuration
 # app.config['SESSION_COOKIE_HTTPONLY'] = True
@@ -84,8 +93,16 @@ if os.getenv('TALISMAN_ENABLED', 'False').lower() == 'true':
         referrer_policy='strict-origin-when-cross-origin',
     )
 
-with app.app_context():
-    init_db()
+# Schema setup runs once from `labman db migrate` / `labman serve`; workers
+# only verify the schema version on their first request
+app.before_request(ensure_db)
+
+# Hand each request's connection back to the worker's pool
+app.teardown_appcontext(close_db)
+
+# Count and time each request's SQL, and flag repeated (N+1) statements
+app.before_request(start_request)
+app.after_request(finish_request)
 
 # Security: Check allowed hosts
 @app.before_request
@@ -98,26 +115,16 @@ def check_allowed_hosts():
     if host not in allowed.split(','):
         abort(403)
 
+# Uploads over the size limit or the uploader's quota are cut off mid-stream
+@app.errorhandler(413)
+def upload_too_large(e):
+    flash(e.description, 'error')
+    return redirect(request.referrer or url_for('content'))
+
 @app.context_processor
 def inject_lab_info():
     return dict(lab_name=os.getenv('LAB_NAME', 'Lab Manager'), min=min, max=max)
 
-@app.template_filter('date_diff')
-def date_diff(d1, d2):
-    """Return difference in days between two date strings (YYYY-MM-DD or YYYY-MM-DD HH:MM:SS)"""
-    if not d1 or not d2:
-        return 0
-    try:
-        # Handle timestamps
-        if ' ' in str(d1): d1 = str(d1).split(' ')[0]
-        if ' ' in str(d2): d2 = str(d2).split(' ')[0]
-        
-        date1 = datetime.strptime(str(d1), '%Y-%m-%d')
-        date2 = datetime.strptime(str(d2), '%Y-%m-%d')
-        return (date1 - date2).days
-    except:
-        return 0
-
 @app.route('/')
 def index():
     if 'user_id' in session:
@@ -167,37 +174,16 @@ def logout():
 @require_login
 def dashboard():
     user = get_current_user()
-    recent_meetings = get_meetings_this_week()[:3]
-    for meeting in recent_meetings:
-        meeting['meeting_time'] = format_meeting_datetime(meeting['meeting_time'])
-    user_groups = [g for g in get_user_groups(user['id'])]
-    
-    # Get research plan
-    research_plan = get_research_plan(user['id'])
-    
-    today = datetime.now().date()
-    current_date = today.strftime('%Y-%m-%d')
-    timeline_start = (today - timedelta(days=7)).strftime('%Y-%m-%d')
-    timeline_end = (today + timedelta(days=14)).strftime('%Y-%m-%d')
-    
-    return render_template('dashboard.html', user=user, meetings=recent_meetings, groups=user_groups, research_plan=research_plan, timeline_start=timeline_start, timeline_end=timeline_end, current_date=current_date)
+    sections = load_dashboard(user['id'])
+    return render_template('dashboard.html', user=user, sections=sections)
 
 # User Management
 @app.route('/users')
 @require_login
 def users():
-    all_users = get_all_users()
-    
-    # Add status and token info
-    for user in all_users:
-        if user['password_hash'] is None:
-            user['status'] = 'pending'
-            token = get_latest_activation_token(user['id'])
-            user['token_info'] = token
-        else:
-            user['status'] = 'active'
-            
-    return render_template('users.html', users=all_users)
+    search_term = request.args.get('q', '').strip()
+    page = get_user_directory(request.args.get('cursor'), search=search_term)
+    return render_template('users.html', users=page.items, page=page, search_term=search_term)
 # ... users/create route ...
 
 @app.route('/members/<int:user_id>/research')
@@ -210,11 +196,8 @@ def member_research(user_id):
         flash('User not found', 'error')
         return redirect(url_for('research'))
     
-    plan = get_research_plan(user_id)
-    
     today = datetime.now().date()
-    timeline_start = (today - timedelta(days=7)).strftime('%Y-%m-%d')
-    timeline_end = (today + timedelta(days=14)).strftime('%Y-%m-%d')
+    plan = get_research_timeline(user_id, today - timedelta(days=7), today + timedelta(days=14))
     
     # Check if current user can edit comments (admin or group lead)
     current_user = get_current_user()
@@ -230,8 +213,7 @@ def member_research(user_id):
     #             can_edit_comments = True
     #             break
     
-    return render_template('member_research.html', target_user=target_user, plan=plan, 
-                         timeline_start=timeline_start, timeline_end=timeline_end,
+    return render_template('member_research.html', target_user=target_user, plan=plan,
                          can_edit_comments=can_edit_comments)
 @app.route('/users/create', methods=['GET', 'POST'])
 @require_admin
@@ -325,10 +307,13 @@ def activate_account(token):
             flash('Passwords do not match', 'error')
             return render_template('activate_account.html', token=token)
         
-        if update_user_password(user_id, new_password):
-            from labman.lib.data import execute_db
-            execute_db('UPDATE password_reset_tokens SET used = 1 WHERE user_id = ? AND token = ?', 
-                      (user_id, token))
+        from labman.lib.data import execute_db
+        with transaction():
+            password_updated = update_user_password(user_id, new_password)
+            if password_updated:
+                execute_db('UPDATE password_reset_tokens SET used = 1 WHERE user_id = ? AND token = ?', 
+                          (user_id, token))
+        if password_updated:
             flash('Account activated! Please login with your password.', 'success')
             return redirect(url_for('login'))
         else:
@@ -498,10 +483,13 @@ def reset_password(token):
             flash('Passwords do not match', 'error')
             return render_template('reset_password.html', token=token)
         
-        if update_user_password(user_id, new_password):
-            from labman.lib.data import execute_db
-            execute_db('UPDATE password_reset_tokens SET used = 1 WHERE user_id = ? AND token = ?', 
-                      (user_id, token))
+        from labman.lib.data import execute_db
+        with transaction():
+            password_updated = update_user_password(user_id, new_password)
+            if password_updated:
+                execute_db('UPDATE password_reset_tokens SET used = 1 WHERE user_id = ? AND token = ?', 
+                          (user_id, token))
+        if password_updated:
             flash('Password reset successfully! Please login with your new password.', 'success')
             return redirect(url_for('login'))
         else:
@@ -579,8 +567,10 @@ def group_detail(group_id):
         return redirect(url_for('groups'))
     
     members = get_group_members(group_id)
-    all_users = get_all_users()
-    return render_template('group_detail.html', group=group, members=members, all_users=all_users)
+    member_ids = get_group_member_ids(group_id)
+    all_users = [u for u in get_all_users() if u['id'] not in member_ids]
+    hierarchy = get_group_hierarchy(group_id)
+    return render_template('group_detail.html', group=group, members=members, all_users=all_users, hierarchy=hierarchy)
 
 @app.route('/groups/<int:group_id>/add_member', methods=['POST'])
 @require_login
@@ -641,29 +631,35 @@ def research():
     tree = get_research_tree()
     return render_template('research.html', tree=tree)
 
+@app.route('/research/timeline')
+@require_login
+def research_timeline():
+    from labman.lib.datetimes import parse_date
+    start = parse_date(request.args.get('start')) or datetime.now().date() - timedelta(days=7)
+    end = start + timedelta(days=21)
+    group_id = request.args.get('group_id', type=int)
+    page = get_research_portfolio(start, end, request.args.get('cursor'), group_id=group_id)
+    return render_template('research_timeline.html', members=page.items, page=page, groups=get_all_groups(),
+                           group_id=group_id, start=start.isoformat(), end=end.isoformat(),
+                           prev_start=(start - timedelta(days=14)).isoformat(),
+                           next_start=(start + timedelta(days=14)).isoformat())
+
 # Meeting Management
 @app.route('/meetings')
 @require_login
 def meetings():
     tag_filter = request.args.get('tag')
-    if tag_filter:
-        all_meetings = get_meetings_by_tags([tag_filter])
-    else:
-        all_meetings = get_all_meetings()
-
-    this_week = get_meetings_this_week()
+    page = get_meetings_page(request.args.get('cursor'), tags=[tag_filter] if tag_filter else None)
 
-    for meeting in all_meetings:
-        meeting['meeting_time'] = format_meeting_datetime(meeting['meeting_time'])
-    for meeting in this_week:
-        meeting['meeting_time'] = format_meeting_datetime(meeting['meeting_time'])
+    this_week = format_meeting_times(get_meetings_this_week())
+    format_meeting_times(page.items)
     
     # Get available tags for filter
     default_tags = [t.strip() for t in os.getenv('DEFAULT_MEETING_TAGS', '').split(',') if t.strip()]
     db_tags = get_all_tags()
     available_tags = sorted(list(set(default_tags + db_tags)))
     
-    return render_template('meetings.html', meetings=all_meetings, this_week=this_week, available_tags=available_tags)
+    return render_template('meetings.html', meetings=page.items, page=page, this_week=this_week, available_tags=available_tags)
 
 @app.route('/meetings/calendar/<int:year>/<int:month>')
 @require_login
@@ -726,9 +722,12 @@ def edit_meeting(meeting_id):
         tags = [t.strip() for t in tags_str.split(',') if t.strip()]
         summary = request.form.get('summary', '')
         
-        # Check if time changed
+        # Check if time changed (stored times are canonical, the form's are not)
         old_time = meeting['meeting_time']
-        time_changed = (new_time != old_time)
+        try:
+            time_changed = normalize_meeting_time(new_time) != old_time
+        except (TypeError, ValueError):
+            time_changed = True
         
         if update_meeting(meeting_id, title, description, new_time, group_id, tags, summary, send_notification=time_changed):
             flash('Meeting updated successfully!', 'success')
@@ -770,7 +769,7 @@ def delete_meeting_route(meeting_id):
 @app.route('/meetings/<int:meeting_id>')
 @require_login
 def meeting_detail(meeting_id):
-    from labman.lib.groups import get_group_members
+    from labman.lib.groups import is_group_member
     
     meeting = get_meeting_by_id(meeting_id)
     if not meeting:
@@ -790,8 +789,7 @@ def meeting_detail(meeting_id):
     # Check if user is a participant (can edit summary)
     is_participant = False
     if meeting['group_id']:
-        members = get_group_members(meeting['group_id'])
-        is_participant = any(m['id'] == user['id'] for m in members)
+        is_participant = is_group_member(user['id'], meeting['group_id'])
     
     contents = get_content(meeting_id=meeting_id)
     responses = get_meeting_responses(meeting_id)
@@ -813,7 +811,7 @@ def respond_to_meeting(meeting_id):
 @require_login
 def update_meeting_summary_route(meeting_id):
     from labman.lib.meetings import update_meeting_summary
-    from labman.lib.groups import get_group_members
+    from labman.lib.groups import is_group_member
     
     meeting = get_meeting_by_id(meeting_id)
     if not meeting:
@@ -825,8 +823,7 @@ def update_meeting_summary_route(meeting_id):
     # Check if user is a participant (member of the meeting's group)
     is_participant = False
     if meeting['group_id']:
-        members = get_group_members(meeting['group_id'])
-        is_participant = any(m['id'] == user['id'] for m in members)
+        is_participant = is_group_member(user['id'], meeting['group_id'])
     
     if not is_participant and not user['is_admin']:
         flash('Only meeting participants can edit the summary', 'error')
@@ -869,14 +866,17 @@ def download_meeting_ics(meeting_id):
 def content():
     user = get_current_user()
     group_filter = request.args.get('group_id')
+    search_term = request.args.get('q', '').strip()
     
-    if group_filter:
-        all_content = get_content_by_group(int(group_filter))
+    if search_term:
+        # Ranked full-text results: the best matches, without paging
+        results = search_content(search_term, group_id=int(group_filter) if group_filter else None)
+        page = Page(results, None, None)
     else:
-        all_content = get_content(user_id=None)
+        page = get_content_page(request.args.get('cursor'), group_id=int(group_filter) if group_filter else None)
     
     user_groups = get_user_groups(user['id'])
-    return render_template('content.html', contents=all_content, groups=user_groups)
+    return render_template('content.html', contents=page.items, page=page, groups=user_groups, search_term=search_term)
 
 @app.route('/content/upload', methods=['GET', 'POST'])
 @require_login
@@ -998,9 +998,10 @@ def shared_content(share_link):
 @app.route('/inventory')
 @require_login
 def inventory():
-    all_inventory = get_all_inventory()
-    all_servers = get_all_servers()
-    return render_template('inventory.html', inventory=all_inventory, servers=all_servers)
+    inventory_page = get_inventory_page(request.args.get('cursor'))
+    server_page = get_servers_page(request.args.get('server_cursor'))
+    return render_template('inventory.html', inventory=inventory_page.items, servers=server_page.items,
+                           inventory_page=inventory_page, server_page=server_page)
 
 @app.route('/inventory/add', methods=['GET', 'POST'])
 @require_login
@@ -1218,6 +1219,43 @@ def history_route():
         logs = get_audit_logs(limit=100, user_id=user['id'], action=filter_action)
         return render_template('audit_history.html', logs=logs, filter_action=filter_action)
 
+@app.route('/history/export')
+@require_admin
+def export_history_route():
+    """Stream the (filtered) audit log as CSV without loading it all into memory"""
+    import csv
+    import io
+    
+    filter_user_id = request.args.get('user_id')
+    filter_action = request.args.get('action')
+    
+    def cell(value):
+        # Keep spreadsheets from running user-entered text as a formula
+        if isinstance(value, str) and value[:1] in ('=', '+', '-', '@', '\t', '\r'):
+            return "'" + value
+        return value
+    
+    def generate():
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(['created_at', 'user_id', 'user_name', 'action', 'details'])
+        try:
+            for log in get_audit_logs(limit=None, user_id=filter_user_id, action=filter_action, stream=True):
+                writer.writerow([cell(log['created_at']), log['user_id'], cell(log['user_name']),
+                                 cell(log['action']), cell(log['details'])])
+                if buffer.tell() > 64 * 1024:
+                    yield buffer.getvalue()
+                    buffer.seek(0)
+                    buffer.truncate()
+        except Exception:
+            # Headers are already sent, so say so in the file rather than cut it off silently
+            writer.writerow(['', '', '', 'error', 'Export incomplete: the audit log could not be read'])
+        yield buffer.getvalue()
+    
+    response = Response(stream_with_context(generate()), mimetype='text/csv')
+    response.headers['Content-Disposition'] = 'attachment; filename=activity_history.csv'
+    return response
+
 @app.route('/groups/<int:group_id>/set-lead/<int:user_id>', methods=['POST'])
 @require_admin
 def set_group_lead_route(group_id, user_id):
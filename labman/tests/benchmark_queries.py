@@ -0,0 +1,287 @@
+"""
+Query benchmark on a large synthetic dataset.
+
+Builds a throwaway database with tens of thousands of users, meetings,
+content items and audit entries, then times every read query in
+lib/meetings.py, lib/content.py, lib/groups.py, lib/audit.py and lib/users.py
+and shows whether its plan scans a large table. test_query_plans.py runs the
+same cases against a smaller copy of the dataset.
+
+Usage:
+    python -m labman.tests.benchmark_queries [--scale 1.0] [--repeat 5]
+"""
+import os
+import re
+import sys
+import time
+import random
+import secrets
+import argparse
+import tempfile
+from datetime import datetime, timedelta
+from flask import Flask
+from labman.lib import data
+from labman.lib.meetings import (get_all_meetings, get_meetings_page, get_meetings_this_week, get_meetings_by_month,
+                                 get_meetings_by_tags, get_meeting_by_id, get_meetings_by_group, get_all_tags,
+                                 get_meeting_responses)
+from labman.lib.content import (get_content, get_content_page, get_content_by_id, get_content_by_share_link,
+                                search_content, get_content_by_group)
+from labman.lib.groups import (get_all_groups, get_all_groups_with_counts, get_group_by_id, get_group_by_name,
+                               get_user_groups, get_group_members, get_subgroups, get_group_hierarchy,
+                               get_group_descendants, get_subtree_members, get_research_tree,
+                               get_membership_index, rebuild_group_closure)
+from labman.lib.audit import get_audit_logs
+from labman.lib.users import (get_all_users, get_user_directory, get_user_by_id, get_user_by_email,
+                              verify_reset_token, get_latest_activation_token)
+
+# Tables that grow with lab activity; a full scan of these is a regression
+LARGE_TABLES = {'users', 'user_groups', 'meetings', 'meeting_tags', 'meeting_responses', 'content', 'audit_logs',
+                'password_reset_tokens'}
+
+TAGS = ['journal-club', 'weekly', 'review', 'demo', 'planning', 'seminar', 'retreat', 'hackathon']
+ACTIONS = ['logged in', 'created meeting', 'uploaded content', 'updated user', 'added user to group',
+           'deleted content', 'updated research plan']
+
+# (name, callable taking the sample ids returned by generate_dataset)
+QUERY_CASES = [
+    ('meetings.get_all_meetings', lambda s: get_all_meetings()),
+    ('meetings.get_all_meetings_limit', lambda s: get_all_meetings(limit=5)),
+    ('meetings.get_meetings_page', lambda s: get_meetings_page()),
+    ('meetings.get_meetings_page_cursor', lambda s: get_meetings_page(s['meeting_cursor'])),
+    ('meetings.get_meetings_page_tag', lambda s: get_meetings_page(tags=['demo'])),
+    ('meetings.get_meetings_this_week', lambda s: get_meetings_this_week()),
+    ('meetings.get_meetings_by_month', lambda s: get_meetings_by_month(s['year'], s['month'])),
+    ('meetings.get_meetings_by_tags', lambda s: get_meetings_by_tags(['demo', 'review'])),
+    ('meetings.get_meeting_by_id', lambda s: get_meeting_by_id(s['meeting_id'])),
+    ('meetings.get_meetings_by_group', lambda s: get_meetings_by_group(s['group_id'])),
+    ('meetings.get_all_tags', lambda s: get_all_tags()),
+    ('meetings.get_meeting_responses', lambda s: get_meeting_responses(s['meeting_id'])),
+    ('content.get_content', lambda s: get_content()),
+    ('content.get_content_by_meeting', lambda s: get_content(meeting_id=s['meeting_id'])),
+    ('content.get_content_by_plan', lambda s: get_content(research_plan_id=s['user_id'])),
+    ('content.get_content_by_uploader', lambda s: get_content(user_id=s['user_id'])),
+    ('content.get_content_page', lambda s: get_content_page()),
+    ('content.get_content_page_group', lambda s: get_content_page(group_id=s['group_id'])),
+    ('content.get_content_by_id', lambda s: get_content_by_id(s['content_id'])),
+    ('content.get_content_by_share_link', lambda s: get_content_by_share_link(s['share_link'])),
+    ('content.search_content', lambda s: search_content('report')),
+    ('content.get_content_by_group', lambda s: get_content_by_group(s['group_id'])),
+    ('groups.get_all_groups', lambda s: get_all_groups()),
+    ('groups.get_all_groups_with_counts', lambda s: get_all_groups_with_counts()),
+    ('groups.get_group_by_id', lambda s: get_group_by_id(s['group_id'])),
+    ('groups.get_group_by_name', lambda s: get_group_by_name('Group 3')),
+    ('groups.get_user_groups', lambda s: get_user_groups(s['user_id'])),
+    ('groups.get_group_members', lambda s: get_group_members(s['group_id'])),
+    ('groups.get_subgroups', lambda s: get_subgroups(s['group_id'])),
+    ('groups.get_group_hierarchy', lambda s: get_group_hierarchy(s['leaf_group_id'])),
+    ('groups.get_group_descendants', lambda s: get_group_descendants(s['root_group_id'])),
+    ('groups.get_subtree_members', lambda s: get_subtree_members(s['root_group_id'])),
+    ('groups.get_research_tree', lambda s: get_research_tree()),
+    ('groups.get_membership_index', lambda s: get_membership_index()),
+    ('audit.get_audit_logs', lambda s: get_audit_logs()),
+    ('audit.get_audit_logs_by_user', lambda s: get_audit_logs(limit=100, user_id=s['user_id'])),
+    ('audit.get_audit_logs_by_action', lambda s: get_audit_logs(limit=200, action='deleted content')),
+    ('audit.get_audit_logs_export', lambda s: list(get_audit_logs(limit=None, stream=True))),
+    ('users.get_all_users', lambda s: get_all_users()),
+    ('users.get_user_directory', lambda s: get_user_directory()),
+    ('users.get_user_directory:search', lambda s: get_user_directory(search='user 0012')),
+    ('users.get_user_by_id', lambda s: get_user_by_id(s['user_id'])),
+    ('users.get_user_by_email', lambda s: get_user_by_email(s['email'])),
+    ('users.verify_reset_token', lambda s: verify_reset_token(s['token'])),
+    ('users.get_latest_activation_token', lambda s: get_latest_activation_token(s['pending_user_id'])),
+]
+
+
+def generate_dataset(db, scale=1.0, seed=42):
+    """
+    Fill a migrated database with a reproducible synthetic lab.
+
+    At scale 1.0 this is 5,000 users, 20,000 meetings (with ~100,000
+    responses), 20,000 content items and 100,000 audit entries.
+
+    Returns:
+        Dict: Sample ids and values for QUERY_CASES
+    """
+    rng = random.Random(seed)
+    n_users = max(50, int(5000 * scale))
+    n_groups = 40
+    n_meetings = max(200, int(20000 * scale))
+    n_content = max(200, int(20000 * scale))
+    n_audit = max(1000, int(100000 * scale))
+    start = datetime(2020, 1, 1)
+
+    def stamp(days):
+        return (start + timedelta(days=days, minutes=rng.randrange(0, 24 * 60, 15))).strftime('%Y-%m-%d %H:%M:%S')
+
+    db.executemany(
+        'INSERT INTO users (name, email, password_hash, is_admin, created_at) VALUES (?, ?, ?, ?, ?)',
+        [(f'User {i:05d}', f'user{i}@example.com', None if i % 10 == 0 else 'hash', int(i % 100 == 0), stamp(i % 1500))
+         for i in range(n_users)]
+    )
+    user_ids = [row[0] for row in db.execute('SELECT id FROM users ORDER BY id')]
+
+    for i in range(n_groups):
+        parent = None if i < 4 else db.execute('SELECT id FROM research_groups WHERE name = ?',
+                                                [f'Group {i // 4 - 1}']).fetchone()[0]
+        db.execute('INSERT INTO research_groups (name, description, parent_id, lead_id) VALUES (?, ?, ?, ?)',
+                   (f'Group {i}', f'Synthetic group {i}', parent, rng.choice(user_ids)))
+    group_ids = [row[0] for row in db.execute('SELECT id FROM research_groups ORDER BY id')]
+    rebuild_group_closure()
+
+    db.executemany(
+        'INSERT OR IGNORE INTO user_groups (user_id, group_id) VALUES (?, ?)',
+        [(user_id, rng.choice(group_ids)) for user_id in user_ids for _ in range(3)]
+    )
+
+    meeting_tags = [rng.sample(TAGS, rng.randint(0, 3)) for _ in range(n_meetings)]
+    db.executemany(
+        'INSERT INTO meetings (title, description, meeting_time, created_by, group_id, tags, created_at) VALUES (?, ?, ?, ?, ?, ?, ?)',
+        [(f'Meeting {i}', 'Synthetic meeting', stamp(i * 2190 // n_meetings), rng.choice(user_ids),
+          rng.choice(group_ids), ','.join(meeting_tags[i]) or None, stamp(i % 2190))
+         for i in range(n_meetings)]
+    )
+    meeting_ids = [row[0] for row in db.execute('SELECT id FROM meetings ORDER BY id')]
+    db.executemany(
+        'INSERT INTO meeting_tags (meeting_id, tag) VALUES (?, ?)',
+        [(meeting_id, tag) for meeting_id, tags in zip(meeting_ids, meeting_tags) for tag in tags]
+    )
+
+    db.executemany(
+        'INSERT OR IGNORE INTO meeting_responses (meeting_id, user_id, response) VALUES (?, ?, ?)',
+        [(meeting_id, rng.choice(user_ids), rng.choice(['join', 'wont_join']))
+         for meeting_id in meeting_ids for _ in range(5)]
+    )
+
+    db.executemany(
+        '''INSERT INTO content (title, description, filename, file_path, file_size, uploaded_by, group_id,
+           meeting_id, research_plan_id, access_level, share_link, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''',
+        [(f'{rng.choice(["Report", "Slides", "Dataset", "Notes"])} {i}', 'Synthetic upload', f'file{i}.pdf',
+          f'/tmp/file{i}.pdf', 1024, rng.choice(user_ids), rng.choice(group_ids),
+          rng.choice(meeting_ids) if i % 2 else None, rng.choice(user_ids) if i % 5 == 0 else None,
+          'link' if i % 20 == 0 else 'group', secrets.token_urlsafe(16) if i % 20 == 0 else None, stamp(i % 2190))
+         for i in range(n_content)]
+    )
+
+    db.executemany(
+        'INSERT INTO audit_logs (user_id, action, details, created_at) VALUES (?, ?, ?, ?)',
+        [(rng.choice(user_ids), rng.choice(ACTIONS), f'entry {i}', stamp(i * 2190 // n_audit)) for i in range(n_audit)]
+    )
+
+    pending = [user_id for i, user_id in enumerate(user_ids) if i % 10 == 0]
+    db.executemany(
+        'INSERT INTO password_reset_tokens (user_id, token, expires_at, used, created_at) VALUES (?, ?, ?, ?, ?)',
+        [(user_id, secrets.token_urlsafe(24), '2099-01-01 00:00:00', 0, stamp(2000)) for user_id in pending]
+    )
+    db.commit()
+
+    middle = db.execute('SELECT meeting_time, id FROM meetings ORDER BY meeting_time, id LIMIT 1 OFFSET ?',
+                        [n_meetings // 2]).fetchone()
+    share = db.execute("SELECT share_link FROM content WHERE share_link IS NOT NULL LIMIT 1").fetchone()
+    token = db.execute('SELECT token FROM password_reset_tokens LIMIT 1').fetchone()
+    return {
+        'user_id': user_ids[len(user_ids) // 2],
+        'pending_user_id': pending[len(pending) // 2],
+        'email': f'user{len(user_ids) // 2}@example.com',
+        'group_id': group_ids[1],
+        'leaf_group_id': group_ids[-1],
+        'root_group_id': group_ids[0],
+        'meeting_id': meeting_ids[len(meeting_ids) // 2],
+        'meeting_cursor': data.encode_cursor('next', middle[0], middle[1]),
+        'content_id': n_content // 2,
+        'share_link': share[0],
+        'token': token[0],
+        'year': 2022,
+        'month': 6,
+    }
+
+
+def create_app(database):
+    """Bare Flask app whose requests use the given database file"""
+    data.DATABASE = database
+    app = Flask(__name__)
+    app.teardown_appcontext(data.close_db)
+    return app
+
+
+def capture_statements(run, samples):
+    """Run a query case and return the (sql, args) of every statement it executed"""
+    statements = []
+    original = data.record_query
+    data.record_query = lambda sql, seconds, args=(), db=None: statements.append((sql, args))
+    try:
+        result = run(samples)
+        if result is not None and not isinstance(result, (list, dict, int, str)):
+            list(result)  # drain generators so streamed statements run too
+    finally:
+        data.record_query = original
+    return statements
+
+
+def explain(sql, args=()):
+    """EXPLAIN QUERY PLAN details for one statement"""
+    return [row[3] for row in data.get_db().execute('EXPLAIN QUERY PLAN ' + sql, args)]
+
+
+_TABLE_REF = re.compile(r'\b(?:FROM|JOIN)\s+(\w+)(?:\s+(?:AS\s+)?(?!(?:LEFT|RIGHT|INNER|OUTER|CROSS|JOIN|ON|WHERE|'
+                        r'ORDER|GROUP|LIMIT|USING|UNION)\b)(\w+))?', re.IGNORECASE)
+
+
+def large_table_scans(sql, plan):
+    """
+    Find plan steps that walk a whole large table.
+
+    A step counts as a full scan when it is ``SCAN <table>`` of a table in
+    LARGE_TABLES, unless it walks an index and the statement has a LIMIT
+    (an ordered index walk that stops early, as keyset pages do).
+    """
+    aliases = {}
+    for table, alias in _TABLE_REF.findall(sql):
+        aliases[table.lower()] = table.lower()
+        if alias:
+            aliases[alias.lower()] = table.lower()
+
+    has_limit = re.search(r'\bLIMIT\b', sql, re.IGNORECASE) is not None
+    scans = []
+    for step in plan:
+        match = re.match(r'SCAN (\w+)', step)
+        if not match or aliases.get(match.group(1).lower(), match.group(1).lower()) not in LARGE_TABLES:
+            continue
+        if 'USING' in step and has_limit:
+            continue
+        scans.append(step)
+    return scans
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Time lib queries on a large synthetic dataset')
+    parser.add_argument('--scale', type=float, default=1.0, help='Dataset size multiplier')
+    parser.add_argument('--repeat', type=int, default=5, help='Timed runs per query (median is reported)')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app = create_app(os.path.join(tmp, 'benchmark.db'))
+        with app.app_context():
+            print(f"Generating dataset (scale {args.scale})...")
+            db = data.get_db()
+            data.migrate(db)
+            started = time.perf_counter()
+            samples = generate_dataset(db, args.scale)
+            print(f"  done in {time.perf_counter() - started:.1f}s\n")
+
+        print(f"{'query':45} {'median ms':>10}  full scans")
+        for name, run in QUERY_CASES:
+            with app.test_request_context():
+                scans = [scan for sql, params in capture_statements(run, samples)
+                         for scan in large_table_scans(sql, explain(sql, params))]
+                timings = []
+                for _ in range(args.repeat):
+                    started = time.perf_counter()
+                    capture_statements(run, samples)
+                    timings.append((time.perf_counter() - started) * 1000)
+            timings.sort()
+            print(f"{name:45} {timings[len(timings) // 2]:10.2f}  {'; '.join(scans) or '-'}")
+        data.get_pool().close_all()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
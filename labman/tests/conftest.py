@@ -0,0 +1,23 @@
+"""Shared fixtures for tests that need a database"""
+import pytest
+from flask import Flask
+from labman.lib import data, instrumentation
+
+
+@pytest.fixture
+def db_path(tmp_path, monkeypatch):
+    """Point the data layer at a fresh temporary database file"""
+    path = str(tmp_path / 'test.db')
+    monkeypatch.setattr(data, 'DATABASE', path)
+    monkeypatch.setattr(instrumentation, 'SQL_SLOW_LOG', str(tmp_path / 'slow_queries.log'))
+    yield path
+    data.get_pool().close_all()
+
+
+@pytest.fixture
+def app(db_path):
+    """Minimal Flask app wired to the data layer like labman.server"""
+    app = Flask(__name__)
+    app.secret_key = 'test'
+    app.teardown_appcontext(data.close_db)
+    return app
@@ -10,6 +10,7 @@ from labman.lib.inventory import add_inventory_item, get_all_inventory, delete_i
 from labman.lib.servers import add_server, get_all_servers, delete_server
 from labman.lib.research import add_research_task, update_research_problem
 from labman.lib.helpers import get_lab_group
+from labman.lib.data import init_db
 
 class MockFile:
     def __init__(self, filename, content=b"mock content"):
@@ -21,7 +22,9 @@ class MockFile:
 
 def populate():
     print("Populating test data...")
-    with app.app_context():
+    with app.test_request_context():
+        init_db()
+        
         # Get default lab group
         lab_group = get_lab_group()
         lab_group_id = lab_group['id'] if lab_group else None
@@ -134,19 +137,23 @@ def populate():
             # 8. Add Content
             print("\nUploading content...")
             mock_file = MockFile("research_plan_qc.pdf", b"Optimizing Shor's Algorithm content")
-            upload_content(mock_file, "Shors Optimization Plan", "Detailed roadmap for the research project.", alice['id'], research_plan_id=alice['id'])
+            if not upload_content(mock_file, "Shors Optimization Plan", "Detailed roadmap for the research project.", alice['id'], research_plan_id=alice['id']):
+                print("  Failed to upload research_plan_qc.pdf")
             
             # Link content to meeting
             meeting = get_all_meetings(limit=1)[0]
             mock_meeting_notes = MockFile("sync_notes_jan_28.txt", b"Notes from today's sync.")
-            upload_content(mock_meeting_notes, "Sync Notes", "Action items from the sync.", alice['id'], meeting_id=meeting['id'])
+            if not upload_content(mock_meeting_notes, "Sync Notes", "Action items from the sync.", alice['id'], meeting_id=meeting['id']):
+                print("  Failed to upload sync_notes_jan_28.txt")
             print("  Created research plan, tasks, and uploaded content.")
 
     print("\nData population complete!")
 
 def clear():
     print("Clearing test data...")
-    with app.app_context():
+    with app.test_request_context():
+        init_db()
+        
         # 1. Clear Users
         print("\nRemoving test users...")
         test_emails = [
@@ -0,0 +1,27 @@
+"""Tests for the audit log"""
+import pytest
+from labman.lib import audit, data
+from labman.lib.audit import get_audit_logs
+
+
+@pytest.fixture
+def db(app):
+    with app.app_context():
+        data.init_db()
+        yield data.get_db()
+
+
+def test_streamed_logs(db):
+    data.execute_db("INSERT INTO audit_logs (user_id, action, details) VALUES (1, 'uploaded content', 'Title: Notes')")
+    assert [log['details'] for log in get_audit_logs(limit=None, stream=True)] == ['Title: Notes']
+
+
+def test_streaming_error_reaches_consumer(db, monkeypatch):
+    def broken(query, params):
+        yield {'details': 'first'}
+        raise RuntimeError('disk I/O error')
+    monkeypatch.setattr(audit, 'stream_db', broken)
+    logs = get_audit_logs(limit=None, stream=True)
+    assert next(logs)['details'] == 'first'
+    with pytest.raises(RuntimeError):
+        next(logs)
@@ -0,0 +1,89 @@
+"""Tests for the per-request and cached user principal"""
+import pytest
+from labman.lib import auth, data
+from labman.lib.auth import require_login, require_admin, get_current_user, check_user_group_access
+from labman.lib.users import update_user, update_user_password, delete_user
+
+
+@pytest.fixture
+def lookups(app, monkeypatch):
+    """Count the user lookups made through the principal cache"""
+    with app.app_context():
+        data.init_db()
+    auth._principals.clear()
+    calls = []
+    load = auth._load_principal
+
+    def counted(user_id):
+        calls.append(user_id)
+        return load(user_id)
+    monkeypatch.setattr(auth, '_load_principal', counted)
+    app.add_url_rule('/login', 'login', lambda: 'login')
+    app.add_url_rule('/dashboard', 'dashboard', lambda: 'dashboard')
+    yield calls
+    auth._principals.clear()
+
+
+def login(app, user_id=1):
+    ctx = app.test_request_context()
+    ctx.push()
+    from flask import session
+    session['user_id'] = user_id
+    return ctx
+
+
+class TestPrincipal:
+    def test_one_lookup_per_request(self, app, lookups):
+        @require_admin
+        def view():
+            assert get_current_user()['id'] == 1
+            assert check_user_group_access(1, 1)
+            return 'ok'
+
+        ctx = login(app)
+        assert view() == 'ok'
+        ctx.pop()
+        assert lookups == [1]
+
+        # Later requests reuse the cached principal
+        ctx = login(app)
+        assert view() == 'ok'
+        ctx.pop()
+        assert lookups == [1]
+
+    def test_results_are_copies(self, app, lookups):
+        ctx = login(app)
+        get_current_user()['name'] = 'Changed'
+        assert get_current_user()['name'] != 'Changed'
+        ctx.pop()
+
+    def test_user_writes_invalidate(self, app, lookups):
+        ctx = login(app)
+        user = get_current_user()
+        assert update_user(1, 'Renamed', user['email'], False)
+        assert get_current_user()['name'] == 'Renamed'
+        assert get_current_user()['is_admin'] == 0
+        assert update_user_password(1, 'newpass123')
+        get_current_user()
+        assert len(lookups) == 3
+        ctx.pop()
+
+    def test_deleted_user_is_logged_out(self, app, lookups):
+        @require_login
+        def view():
+            return 'ok'
+
+        ctx = login(app)
+        assert view() == 'ok'
+        assert delete_user(1)
+        response = view()
+        assert response.status_code == 302 and response.location.endswith('/login')
+        ctx.pop()
+
+    def test_ttl_zero_disables_cache(self, app, lookups, monkeypatch):
+        monkeypatch.setattr(auth._principals, 'ttl', 0)
+        for _ in range(2):
+            ctx = login(app)
+            get_current_user()
+            ctx.pop()
+        assert lookups == [1, 1]
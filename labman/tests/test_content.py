@@ -0,0 +1,290 @@
+"""Tests for content search and uploads"""
+import os
+from contextlib import contextmanager
+import pytest
+from labman.lib import data
+from labman.lib.data import execute_db, query_db, get_db
+from labman.lib.content import search_content
+
+
+def add_content(title, description='', filename='file.pdf', uploaded_by=1, group_id=None):
+    cursor = execute_db(
+        'INSERT INTO content (title, description, filename, file_path, uploaded_by, group_id) VALUES (?, ?, ?, ?, ?, ?)',
+        (title, description, filename, '/tmp/' + filename, uploaded_by, group_id)
+    )
+    return cursor.lastrowid
+
+
+@pytest.fixture
+def db(app):
+    with app.app_context():
+        data.init_db()
+        yield get_db()
+
+
+def titles(results):
+    return [item['title'] for item in results]
+
+
+class TestContentSearch:
+    def test_index_follows_inserts_updates_and_deletes(self, db):
+        content_id = add_content('Spectroscopy notes')
+        assert titles(search_content('spectroscopy')) == ['Spectroscopy notes']
+
+        execute_db('UPDATE content SET title = ? WHERE id = ?', ('Microscopy notes', content_id))
+        assert search_content('spectroscopy') == []
+        assert titles(search_content('microscopy')) == ['Microscopy notes']
+
+        execute_db('DELETE FROM content WHERE id = ?', (content_id,))
+        assert search_content('microscopy') == []
+
+    def test_prefix_and_filename_tokens(self, db):
+        add_content('Quarterly summary', filename='report_v2.pdf')
+        assert titles(search_content('quart')) == ['Quarterly summary']
+        assert titles(search_content('v2')) == ['Quarterly summary']
+        assert titles(search_content('REPORT pdf')) == ['Quarterly summary']
+        assert search_content('report summary missing') == []  # every word must match
+
+    def test_title_matches_rank_first(self, db):
+        add_content('Lab meeting', description='We discussed the telescope schedule')
+        add_content('Telescope schedule')
+        add_content('Other', filename='telescope.pdf')
+        assert titles(search_content('telescope')) == ['Telescope schedule', 'Other', 'Lab meeting']
+
+    def test_search_syntax_is_literal(self, db):
+        add_content('Gradient descent')
+        for term in ['"gradient', 'gradient OR', 'NEAR(gradient', '-gradient', 'gradient*', 'title:gradient']:
+            results = search_content(term)
+            assert titles(results) in (['Gradient descent'], []), term
+        assert search_content('  ') == [] and search_content('%_') == []
+
+    def test_filters_and_limit(self, db):
+        for i in range(5):
+            add_content(f'Poster {i}', uploaded_by=1 + i % 2, group_id=1)
+        assert len(search_content('poster', limit=2)) == 2
+        assert len(search_content('poster', user_id=2)) == 2
+        assert search_content('poster', group_id=99) == []
+        assert len(search_content('poster', user_id=1, group_id=1)) == 3
+
+    def test_migration_indexes_existing_content(self, app):
+        from labman.lib.migrations import migrate
+        with app.app_context():
+            migrate(get_db(), target=4)
+            execute_db("INSERT INTO content (title, filename, file_path, uploaded_by) VALUES ('Old upload', 'a.pdf', '/tmp/a.pdf', 1)")
+            data.init_db()
+            assert titles(search_content('old')) == ['Old upload']
+
+
+def write_pdf(path, lines):
+    """Write a minimal one-page PDF showing the given lines of text"""
+    text = ' '.join(f'({line}) Tj T*' for line in lines)
+    stream = f'BT /F1 12 Tf 14 TL 72 720 Td {text} ET'.encode()
+    objects = [
+        b'<< /Type /Catalog /Pages 2 0 R >>',
+        b'<< /Type /Pages /Kids [3 0 R] /Count 1 >>',
+        b'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents 4 0 R '
+        b'/Resources << /Font << /F1 5 0 R >> >> >>',
+        b'<< /Length %d >>\nstream\n' % len(stream) + stream + b'\nendstream',
+        b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>',
+    ]
+    out = bytearray(b'%PDF-1.4\n')
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += b'%d 0 obj\n' % number + body + b'\nendobj\n'
+    xref = len(out)
+    out += b'xref\n0 %d\n0000000000 65535 f \n' % (len(objects) + 1)
+    out += b''.join(b'%010d 00000 n \n' % offset for offset in offsets)
+    out += b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (len(objects) + 1, xref)
+    path.write_bytes(bytes(out))
+
+
+class TestTextExtraction:
+    def test_chunks_are_bounded_and_overlap(self):
+        from labman.lib.extraction import chunk_text
+        words = [f'word{i}' for i in range(2000)]
+        pieces = [' '.join(words[i:i + 7]) + ' ' for i in range(0, len(words), 7)]
+        chunks = list(chunk_text(pieces, size=500, overlap=50))
+        assert len(chunks) > 20 and all(len(chunk) <= 500 for chunk in chunks)
+        for previous, chunk in zip(chunks, chunks[1:]):
+            assert chunk.split()[0] in previous.split()  # whole words carried over
+        assert {w for chunk in chunks for w in chunk.split()} == set(words)
+
+        assert [len(chunk) for chunk in chunk_text(['x' * 1200], size=500, overlap=50)] == [500, 500, 200]
+        assert sum(len(chunk) for chunk in chunk_text(['a b ' * 1000], size=500, overlap=0, max_chars=1000)) <= 1000
+
+    def test_body_text_is_searchable(self, db, tmp_path):
+        from labman.lib.extraction import index_content_text
+        path = tmp_path / 'paper.md'
+        filler = ' '.join(['lorem ipsum dolor'] * 3000)
+        path.write_text(f'# Results\n{filler} we observed superconducting vortices at low temperature {filler}\n')
+        content_id = add_content('Paper draft', filename='paper.md')
+        execute_db('UPDATE content SET file_path = ? WHERE id = ?', (str(path), content_id))
+
+        assert search_content('vortices') == []
+        assert index_content_text(db, content_id) == 'indexed'
+        assert query_db('SELECT COUNT(*) FROM content_chunks WHERE content_id = ?', (content_id,), one=True)[0] > 1
+        assert titles(search_content('"superconducting vortices"')) == ['Paper draft']
+        assert titles(search_content('vort')) == ['Paper draft']
+        assert search_content('"vortices superconducting"') == []
+        assert query_db('SELECT text_status FROM content WHERE id = ?', (content_id,), one=True)[0] == 'indexed'
+
+        assert index_content_text(db, content_id) == 'indexed'  # re-extraction replaces the chunks
+        assert len(search_content('"superconducting vortices"')) == 1
+        execute_db('DELETE FROM content WHERE id = ?', (content_id,))
+        assert query_db('SELECT COUNT(*) FROM content_chunks', one=True)[0] == 0
+
+    def test_metadata_matches_rank_above_body_matches(self, db, tmp_path):
+        from labman.lib.extraction import index_content_text
+        path = tmp_path / 'notes.txt'
+        path.write_text('Notes on the telescope alignment procedure')
+        body_id = add_content('Lab notes', filename='notes.txt')
+        execute_db('UPDATE content SET file_path = ? WHERE id = ?', (str(path), body_id))
+        add_content('Telescope manual')
+        index_content_text(db, body_id)
+        assert titles(search_content('telescope')) == ['Telescope manual', 'Lab notes']
+        assert titles(search_content('telescope', user_id=1)) == ['Telescope manual', 'Lab notes']
+        assert search_content('telescope', group_id=5) == []
+
+    def test_pdf_and_unsupported_files(self, db, tmp_path):
+        pytest.importorskip('pypdf')
+        from labman.lib.extraction import index_content_text
+        write_pdf(tmp_path / 'thesis.pdf', ['Chapter one', 'Quantum dot spectroscopy'])
+        pdf_id = add_content('Thesis', filename='thesis.pdf')
+        image_id = add_content('Figure', filename='figure.png')
+        broken_id = add_content('Broken', filename='missing.txt')
+        execute_db('UPDATE content SET file_path = ? WHERE id = ?', (str(tmp_path / 'thesis.pdf'), pdf_id))
+
+        assert index_content_text(db, pdf_id) == 'indexed'
+        assert titles(search_content('"quantum dot"')) == ['Thesis']
+        assert index_content_text(db, image_id) == 'unsupported'
+        assert index_content_text(db, broken_id) == 'failed'
+
+    def test_upload_queues_extraction(self, app, tmp_path):
+        from io import BytesIO
+        from werkzeug.datastructures import FileStorage
+        from labman.lib.content import upload_content
+        from labman.lib.extraction import get_extractor
+        with app.test_request_context():
+            data.init_db()
+            upload = FileStorage(BytesIO(b'Measured the Hall coefficient twice'), filename='hall.txt')
+            assert upload_content(upload, 'Hall data', '', 1, upload_folder=str(tmp_path))
+            get_extractor().flush()
+            assert titles(search_content('"hall coefficient"')) == ['Hall data']
+
+
+class TestStreamingUploads:
+    @pytest.fixture
+    def upload_app(self, app, tmp_path):
+        from labman.lib.uploads import StreamingRequest
+
+        class UploadRequest(StreamingRequest):
+            upload_endpoints = ('upload',)
+
+        app.request_class = UploadRequest
+        app.add_url_rule('/upload', 'upload', methods=['POST'])
+        app.add_url_rule('/other', 'other', methods=['POST'])
+        app.config['UPLOAD_FOLDER'] = str(tmp_path)
+        with app.app_context():
+            data.init_db()
+        return app
+
+    @contextmanager
+    def post(self, app, payload, filename='data.csv', path='/upload', user_id=1):
+        from io import BytesIO
+        from flask import session
+        with app.test_request_context(path, method='POST', data={'file': (BytesIO(payload), filename)}):
+            if user_id:
+                session['user_id'] = user_id
+            yield
+
+    def test_streamed_upload_is_hashed_and_moved_into_place(self, upload_app, tmp_path):
+        import hashlib
+        from flask import request
+        from labman.lib.content import upload_content
+        from labman.lib.uploads import IncomingFile
+        payload = b'x,y\n' * 100000
+        for expected in ['data.csv', 'data_1.csv']:
+            with self.post(upload_app, payload):
+                file = request.files['file']
+                assert isinstance(file.stream, IncomingFile) and file.stream.size == len(payload)
+                assert upload_content(file, 'Run', '', 1, group_id=1, upload_folder=str(tmp_path))
+                row = query_db('SELECT * FROM content ORDER BY id DESC LIMIT 1', one=True)
+                assert row['filename'] == expected and row['file_size'] == len(payload)
+                assert row['sha256'] == hashlib.sha256(payload).hexdigest()
+                assert open(row['file_path'], 'rb').read() == payload
+        assert sorted(os.listdir(tmp_path / 'group_1')) == ['data.csv', 'data_1.csv']
+        assert os.listdir(tmp_path / '.incoming') == []
+
+    def test_only_logged_in_uploads_to_upload_endpoints_stream(self, upload_app, tmp_path):
+        from flask import request
+        from labman.lib.uploads import IncomingFile
+        for path, user_id in [('/other', 1), ('/upload', None)]:
+            with self.post(upload_app, b'data', path=path, user_id=user_id):
+                assert not isinstance(request.files['file'].stream, IncomingFile)
+        assert not (tmp_path / '.incoming').exists()
+
+    def test_abandoned_partial_uploads_are_swept(self, upload_app, tmp_path):
+        from labman.lib.uploads import IncomingFile
+        incoming = tmp_path / '.incoming'
+        incoming.mkdir()
+        (incoming / 'abandoned.part').write_bytes(b'half')
+        os.utime(incoming / 'abandoned.part', (0, 0))
+        (incoming / 'receiving.part').write_bytes(b'half')
+        upload = IncomingFile(str(tmp_path))
+        assert sorted(os.listdir(incoming)) == sorted(['receiving.part', os.path.basename(upload.path)])
+        upload.close()
+
+    def test_file_objects_without_a_stream(self, upload_app, tmp_path, monkeypatch):
+        import hashlib
+        from labman.lib import uploads
+        from labman.lib.content import upload_content
+
+        class MockFile:
+            """A file object that can only save() itself, like populate_test_data's"""
+            def __init__(self, filename, content):
+                self.filename, self.content = filename, content
+
+            def save(self, path):
+                with open(path, 'wb') as f:
+                    f.write(self.content)
+
+        with upload_app.test_request_context():
+            assert upload_content(MockFile('notes.txt', b'Sync notes'), 'Notes', '', 1, meeting_id=3, upload_folder=str(tmp_path))
+            row = query_db('SELECT * FROM content', one=True)
+            assert (row['file_size'], row['sha256']) == (10, hashlib.sha256(b'Sync notes').hexdigest())
+            assert row['file_path'] == str(tmp_path / 'meeting_3' / 'notes.txt')
+            assert open(row['file_path'], 'rb').read() == b'Sync notes'
+
+            monkeypatch.setattr(uploads, 'UPLOAD_MAX_MB', 0)
+            assert not upload_content(MockFile('big.txt', b'too big'), 'Big', '', 1, upload_folder=str(tmp_path))
+        assert os.listdir(tmp_path / '.incoming') == []
+
+    def test_unused_upload_is_discarded(self, upload_app, tmp_path):
+        from flask import request
+        with self.post(upload_app, b'never stored'):
+            assert request.files['file'].read() == b'never stored'
+            assert len(os.listdir(tmp_path / '.incoming')) == 1
+        assert os.listdir(tmp_path / '.incoming') == []
+
+    def test_quota_is_enforced_mid_stream(self, upload_app, tmp_path, monkeypatch):
+        from io import BytesIO
+        from flask import request
+        from werkzeug.datastructures import FileStorage
+        from werkzeug.exceptions import RequestEntityTooLarge
+        from labman.lib import uploads
+        from labman.lib.content import upload_content
+        monkeypatch.setattr(uploads, 'UPLOAD_QUOTA_MB', 1)
+        with upload_app.app_context():
+            execute_db("INSERT INTO content (title, filename, file_path, file_size, uploaded_by) VALUES ('Old', 'a', '/tmp/a', ?, 1)",
+                       (1024 * 1024 - 10,))
+            assert uploads.upload_limit(1) == (10, 'Upload exceeds your 1 MB storage quota')
+            assert uploads.upload_limit(2)[0] == 1024 * 1024
+        with self.post(upload_app, b'too much data'):
+            with pytest.raises(RequestEntityTooLarge):
+                request.files
+            assert os.listdir(tmp_path / '.incoming') == []
+            assert not upload_content(FileStorage(BytesIO(b'too much data'), filename='b.txt'), 'B', '', 1,
+                                      upload_folder=str(tmp_path))
+            assert upload_content(FileStorage(BytesIO(b'fits'), filename='c.txt'), 'C', '', 1, upload_folder=str(tmp_path))
+        assert os.listdir(tmp_path / '.incoming') == []
@@ -0,0 +1,64 @@
+"""Tests for the cached dashboard sections"""
+from datetime import date
+import pytest
+from labman.lib import dashboard, data
+from labman.lib.dashboard import load_dashboard
+
+TODAY = date(2026, 3, 4)
+
+
+@pytest.fixture
+def renders(app, monkeypatch):
+    """Record which section templates get rendered instead of rendering them"""
+    rendered = []
+
+    def render(name, **context):
+        rendered.append(name)
+        return f'<{name}>'
+    monkeypatch.setattr(dashboard, 'render_template', render)
+    dashboard._fragments.clear()
+    with app.test_request_context():
+        data.init_db()
+        data.execute_db("INSERT INTO users (name, email, password_hash) VALUES ('Bea', 'bea@example.com', 'x')")
+        yield rendered
+    dashboard._fragments.clear()
+
+
+def test_sections_cached_until_their_data_changes(renders):
+    from labman.lib.research import add_research_task
+    from labman.lib.groups import create_group, add_user_to_group
+    sections = load_dashboard(1, TODAY)
+    assert str(sections['research']['html']) == '<dashboard_research.html>'
+    assert sections['groups']['count'] == 1 and sections['meetings']['count'] == 0
+    assert len(renders) == 3
+
+    load_dashboard(1, TODAY)
+    assert len(renders) == 3
+
+    assert add_research_task(1, 'Write paper', '2026-03-10')
+    sections = load_dashboard(1, TODAY)
+    assert renders[3:] == ['dashboard_research.html'] and sections['research']['count'] == 1
+
+    create_group('Optics', '')
+    add_user_to_group(1, data.query_db("SELECT id FROM research_groups WHERE name = 'Optics'", one=True)['id'])
+    assert load_dashboard(1, TODAY)['groups']['count'] == 2
+    assert renders[4:] == ['dashboard_groups.html']
+
+
+def test_sections_per_user_and_day(renders):
+    load_dashboard(1, TODAY)
+    load_dashboard(2, TODAY)
+    # The meetings section is the same for everyone
+    assert renders[3:] == ['dashboard_groups.html', 'dashboard_research.html']
+    data.execute_db("INSERT INTO meetings (title, meeting_time, created_by) VALUES ('Sync', '2026-03-05 10:00:00', 1)")
+    assert load_dashboard(2, TODAY)['meetings']['count'] == 1
+    assert load_dashboard(1, date(2026, 3, 9))['meetings']['count'] == 0
+
+
+def test_warm_dashboard_is_one_query(renders, monkeypatch):
+    load_dashboard(1, TODAY)
+    statements = []
+    record_query = data.record_query
+    monkeypatch.setattr(data, 'record_query', lambda sql, *a: statements.append(sql) or record_query(sql, *a))
+    load_dashboard(1, TODAY)
+    assert len(statements) == 1 and 'data_versions' in statements[0]
@@ -0,0 +1,444 @@
+"""Tests for the database access layer"""
+import os
+import sqlite3
+import pytest
+from labman.lib import data
+from labman.lib.data import ConnectionPool, get_db, get_pool
+
+
+class TestConnectionPool:
+    def test_pragmas_applied(self, db_path):
+        pool = ConnectionPool(db_path)
+        conn = pool.acquire()
+        assert conn.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+        assert conn.execute('PRAGMA synchronous').fetchone()[0] == 1  # NORMAL
+        assert conn.execute('PRAGMA busy_timeout').fetchone()[0] == 5000
+        pool.release(conn)
+        pool.close_all()
+
+    def test_custom_pragmas(self, db_path):
+        pool = ConnectionPool(db_path, pragmas={'cache_size': '-2000', 'foreign_keys': 'ON'})
+        conn = pool.acquire()
+        assert conn.execute('PRAGMA cache_size').fetchone()[0] == -2000
+        assert conn.execute('PRAGMA foreign_keys').fetchone()[0] == 1
+        pool.close_all()
+
+    def test_rejects_unsafe_pragma_value(self, db_path):
+        pool = ConnectionPool(db_path, pragmas={'cache_size': '1; DROP TABLE users'})
+        with pytest.raises(ValueError):
+            pool.acquire()
+
+    def test_connection_reused(self, db_path):
+        pool = ConnectionPool(db_path)
+        conn = pool.acquire()
+        pool.release(conn)
+        assert pool.acquire() is conn
+        pool.close_all()
+
+    def test_release_rolls_back_open_transaction(self, db_path):
+        pool = ConnectionPool(db_path)
+        conn = pool.acquire()
+        conn.execute('CREATE TABLE t (x INTEGER)')
+        conn.commit()
+        conn.execute('INSERT INTO t VALUES (1)')
+        assert conn.in_transaction
+        pool.release(conn)
+        assert not conn.in_transaction
+        assert conn.execute('SELECT COUNT(*) FROM t').fetchone()[0] == 0
+        pool.close_all()
+
+    def test_pool_size_limits_idle_connections(self, db_path):
+        pool = ConnectionPool(db_path, size=1)
+        a, b = pool.acquire(), pool.acquire()
+        pool.release(a)
+        pool.release(b)
+        assert len(pool._idle) == 1
+        with pytest.raises(sqlite3.ProgrammingError):
+            b.execute('SELECT 1')  # surplus connection was closed
+        pool.close_all()
+
+    def test_fork_drops_inherited_connections(self, db_path):
+        pool = ConnectionPool(db_path)
+        conn = pool.acquire()
+        pool.release(conn)
+        pool._pid = os.getpid() + 1  # pretend we are a forked child
+        assert pool.acquire() is not conn
+        pool.close_all()
+
+
+class TestRequestConnection:
+    def test_connection_returned_to_pool_between_requests(self, app):
+        with app.app_context():
+            first = get_db()
+            assert get_db() is first
+        assert first in get_pool()._idle
+        with app.app_context():
+            assert get_db() is first
+
+    def test_pool_follows_database_setting(self, app, tmp_path, monkeypatch):
+        with app.app_context():
+            get_db()
+        old_pool = get_pool()
+        monkeypatch.setattr(data, 'DATABASE', str(tmp_path / 'other.db'))
+        assert get_pool() is not old_pool
+
+
+class TestMigrations:
+    def test_fresh_database_gets_full_schema(self, db_path):
+        from labman.lib.migrations import migrate, get_schema_version, latest_version
+        conn = ConnectionPool(db_path).acquire()
+        applied = migrate(conn)
+        assert [v for v, _ in applied] == list(range(1, latest_version() + 1))
+        assert get_schema_version(conn) == latest_version()
+
+        tables = {r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        assert {'users', 'meetings', 'content', 'audit_logs', 'schema_version'} <= tables
+        indexes = {r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+        assert 'idx_meetings_meeting_time' in indexes
+        assert 'idx_audit_logs_user_action' in indexes
+
+    def test_migrate_is_idempotent(self, db_path):
+        from labman.lib.migrations import migrate
+        conn = ConnectionPool(db_path).acquire()
+        migrate(conn)
+        assert migrate(conn) == []
+
+    def test_target_version(self, db_path):
+        from labman.lib.migrations import migrate, get_schema_version
+        conn = ConnectionPool(db_path).acquire()
+        migrate(conn, target=1)
+        assert get_schema_version(conn) == 1
+        migrate(conn)
+        assert get_schema_version(conn) > 1
+
+    def test_upgrades_database_created_before_migrations(self, db_path):
+        from labman.lib.migrations import migrate, get_schema_version, latest_version
+        conn = sqlite3.connect(db_path)
+        conn.execute('CREATE TABLE users (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT NOT NULL, '
+                     'email TEXT UNIQUE NOT NULL, password_hash TEXT, is_admin BOOLEAN DEFAULT 0, '
+                     'email_notifications BOOLEAN DEFAULT 1, created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)')
+        conn.execute("INSERT INTO users (name, email) VALUES ('Ada', 'ada@example.com')")
+        conn.commit()
+        migrate(conn)
+        assert get_schema_version(conn) == latest_version()
+        assert conn.execute('SELECT name FROM users').fetchone()[0] == 'Ada'
+
+    def test_failed_migration_rolls_back(self, db_path, tmp_path):
+        from labman.lib.migrations import migrate, get_schema_version
+        migrations = tmp_path / 'migrations'
+        migrations.mkdir()
+        (migrations / '0001_ok.sql').write_text('CREATE TABLE a (x INTEGER);')
+        (migrations / '0002_broken.sql').write_text('CREATE TABLE b (x INTEGER);\nINSERT INTO missing VALUES (1);')
+        conn = sqlite3.connect(db_path)
+        with pytest.raises(sqlite3.OperationalError):
+            migrate(conn, directory=str(migrations))
+        assert get_schema_version(conn) == 1
+        tables = {r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        assert 'a' in tables and 'b' not in tables
+
+    def test_migrate_command_fails_on_broken_migration(self, db_path, tmp_path, monkeypatch):
+        from click.testing import CliRunner
+        from labman.cli import migrate
+        from labman.lib.data import get_pool
+        migrations = tmp_path / 'migrations'
+        migrations.mkdir()
+        (migrations / '0001_broken.sql').write_text('INSERT INTO missing VALUES (1);')
+        monkeypatch.setattr(get_pool(), 'migrations_dir', str(migrations))
+        result = CliRunner().invoke(migrate, [])
+        assert result.exit_code == 1
+        assert 'Migration failed' in result.output
+
+    def test_split_statements_keeps_trigger_bodies(self):
+        from labman.lib.migrations import split_statements
+        sql = """
+            -- comment
+            CREATE TABLE t (x TEXT);
+            CREATE TRIGGER tr AFTER INSERT ON t BEGIN
+                UPDATE t SET x = 'a;b' WHERE rowid = new.rowid;
+            END;
+            -- trailing comment
+        """
+        statements = split_statements(sql)
+        assert len(statements) == 2
+        assert statements[1].endswith('END;')
+
+    def test_split_statements_rejects_incomplete_script(self):
+        from labman.lib.migrations import split_statements
+        with pytest.raises(ValueError):
+            split_statements('CREATE TABLE t (x TEXT)')
+
+
+class TestSchemaSetup:
+    def trace(self, db):
+        statements = []
+        db.set_trace_callback(statements.append)
+        return statements
+
+    def test_reading_version_runs_no_ddl(self, db_path):
+        from labman.lib.migrations import get_schema_version
+        conn = ConnectionPool(db_path).acquire()
+        assert get_schema_version(conn) == 0
+        assert conn.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()[0] == 0
+
+    def test_ensure_db_sets_up_new_database_once(self, app, monkeypatch):
+        with app.app_context():
+            data.ensure_db()
+            assert data.query_db('SELECT COUNT(*) FROM users WHERE is_admin = 1', one=True)[0] == 1
+
+            calls = []
+            monkeypatch.setattr(data, 'init_db', lambda: calls.append(1))
+            data.ensure_db()
+            assert calls == []
+
+    def test_current_schema_skips_ddl_in_new_process(self, app, monkeypatch):
+        with app.app_context():
+            data.init_db()
+        # A freshly started worker has an empty cache
+        monkeypatch.setattr(data, '_schema_ready', set())
+        with app.app_context():
+            statements = self.trace(get_db())
+            data.ensure_db()
+            assert statements and all(s.lstrip().upper().startswith('SELECT') for s in statements)
+            get_db().set_trace_callback(None)
+
+    def test_bootstrap_is_idempotent(self, app):
+        with app.app_context():
+            data.init_db()
+            data.bootstrap_defaults(get_db())
+            assert data.query_db('SELECT COUNT(*) FROM users WHERE is_admin = 1', one=True)[0] == 1
+
+    def test_server_import_does_not_touch_database(self, tmp_path):
+        import subprocess
+        import sys
+        env = dict(os.environ, LAB_NAME='Import Check', FLASK_SECRET_KEY='test',
+                   PYTHONPATH=os.path.dirname(os.path.dirname(os.path.dirname(data.__file__))))
+        subprocess.run([sys.executable, '-c', 'import labman.server'], cwd=tmp_path, env=env, check=True)
+        assert not (tmp_path / 'data' / 'import_check.db').exists()
+
+
+class TestTransactions:
+    @pytest.fixture
+    def conn(self, app):
+        from labman.lib.data import execute_db
+        with app.app_context():
+            execute_db('CREATE TABLE t (x INTEGER)')
+            yield get_db()
+
+    def _count(self, db_path):
+        other = sqlite3.connect(db_path)
+        try:
+            return other.execute('SELECT COUNT(*) FROM t').fetchone()[0]
+        finally:
+            other.close()
+
+    def test_commits_once_at_end(self, conn, db_path):
+        from labman.lib.data import execute_db, transaction
+        with transaction():
+            execute_db('INSERT INTO t VALUES (1)')
+            execute_db('INSERT INTO t VALUES (2)')
+            assert self._count(db_path) == 0  # nothing visible before commit
+        assert self._count(db_path) == 2
+
+    def test_rolls_back_on_error(self, conn, db_path):
+        from labman.lib.data import execute_db, transaction
+        with pytest.raises(RuntimeError):
+            with transaction():
+                execute_db('INSERT INTO t VALUES (1)')
+                raise RuntimeError("boom")
+        assert self._count(db_path) == 0
+        assert conn.transaction_depth == 0
+
+    def test_nested_failure_only_undoes_inner_block(self, conn, db_path):
+        from labman.lib.data import execute_db, transaction
+        with transaction():
+            execute_db('INSERT INTO t VALUES (1)')
+            with pytest.raises(RuntimeError):
+                with transaction():
+                    execute_db('INSERT INTO t VALUES (2)')
+                    raise RuntimeError("inner")
+            execute_db('INSERT INTO t VALUES (3)')
+        rows = [r[0] for r in conn.execute('SELECT x FROM t ORDER BY x')]
+        assert rows == [1, 3]
+
+    def test_execute_db_autocommits_outside_transaction(self, conn, db_path):
+        from labman.lib.data import execute_db
+        execute_db('INSERT INTO t VALUES (1)')
+        assert self._count(db_path) == 1
+
+
+class TestUnitOfWork:
+    def test_create_user_commits_once(self, app, monkeypatch):
+        from labman.lib import data, email_service
+        from labman.lib.users import create_user
+        monkeypatch.setattr(email_service, 'send_activation_email', lambda *args: True)
+        commits = []
+        monkeypatch.setattr(data.PooledConnection, 'commit',
+                            lambda self: (commits.append(1), sqlite3.Connection.commit(self))[1])
+
+        with app.test_request_context():
+            data.init_db()
+            commits.clear()
+            assert create_user('Ada Lovelace', 'ada@example.com', None)
+            assert len(commits) == 1
+            user = data.query_db('SELECT id FROM users WHERE email = ?', ['ada@example.com'], one=True)
+            assert data.query_db('SELECT COUNT(*) FROM user_groups WHERE user_id = ?', [user['id']], one=True)[0] == 1
+            assert data.query_db('SELECT COUNT(*) FROM password_reset_tokens WHERE user_id = ?', [user['id']], one=True)[0] == 1
+            assert data.query_db("SELECT COUNT(*) FROM audit_logs WHERE action = 'created user'", one=True)[0] == 1
+
+
+class TestWritePath:
+    @pytest.fixture
+    def table(self, app, monkeypatch):
+        from labman.lib.data import execute_db, write_stats
+        monkeypatch.setitem(data.DB_PRAGMAS, 'busy_timeout', '10')
+        monkeypatch.setattr(data, 'DB_RETRY_DELAY_MS', 5)
+        with app.app_context():
+            execute_db('CREATE TABLE t (x INTEGER UNIQUE)')
+            write_stats.reset()
+            yield
+
+    def _hold_write_lock(self, db_path, seconds):
+        """Hold SQLite's write lock from another connection for a while"""
+        import threading
+        other = sqlite3.connect(db_path, check_same_thread=False)
+        other.execute('BEGIN IMMEDIATE')
+        timer = threading.Timer(seconds, other.rollback)
+        timer.start()
+        return timer
+
+    def test_retries_while_another_writer_holds_lock(self, table, db_path):
+        from labman.lib.data import execute_db, get_write_stats
+        timer = self._hold_write_lock(db_path, 0.1)
+        execute_db('INSERT INTO t VALUES (1)')
+        timer.join()
+        stats = get_write_stats()
+        assert stats['retries'] > 0
+        assert stats['failures'] == 0
+        assert stats['lock_wait_max_ms'] > 0
+
+    def test_gives_up_after_max_retries(self, table, db_path, monkeypatch):
+        from labman.lib.data import execute_db, get_write_stats
+        monkeypatch.setattr(data, 'DB_WRITE_RETRIES', 1)
+        timer = self._hold_write_lock(db_path, 1.0)
+        with pytest.raises(sqlite3.OperationalError):
+            execute_db('INSERT INTO t VALUES (1)')
+        timer.cancel()
+        assert get_write_stats()['failures'] == 1
+
+    def test_writer_thread_group_commits(self, table, db_path, monkeypatch):
+        from labman.lib.data import execute_db, WriteQueue
+        writer = WriteQueue()
+        monkeypatch.setattr(data, 'DB_WRITER_THREAD', True)
+        monkeypatch.setattr(data, '_writer', writer)
+
+        commits = []
+        monkeypatch.setattr(data.PooledConnection, 'commit',
+                            lambda self: (commits.append(1), sqlite3.Connection.commit(self))[1])
+
+        # Hold the worker lock so everything queues up behind the first batch
+        with data._write_lock:
+            futures = [writer.submit('INSERT INTO t VALUES (?)', (i,)) for i in range(50)]
+            futures.append(writer.submit('INSERT INTO t VALUES (?)', (0,)))  # duplicate
+        writer.flush()
+
+        assert [f.result().rowcount for f in futures[:50]] == [1] * 50
+        with pytest.raises(sqlite3.IntegrityError):
+            futures[-1].result()
+        assert len(commits) <= 2
+        assert execute_db('INSERT INTO t VALUES (?)', (100,)).lastrowid > 0
+        assert execute_db('INSERT INTO t VALUES (?)', (101,), wait=False) is None
+        writer.stop()
+        assert data.query_db('SELECT COUNT(*) FROM t', one=True)[0] == 52
+
+
+class TestStreaming:
+    def test_stream_db_yields_dicts_in_batches(self, app):
+        from labman.lib.data import execute_db, stream_db
+        with app.app_context():
+            execute_db('CREATE TABLE t (x INTEGER, y TEXT)')
+            get_db().executemany('INSERT INTO t VALUES (?, ?)', [(i, str(i)) for i in range(1000)])
+            get_db().commit()
+
+            rows = stream_db('SELECT x, y FROM t ORDER BY x', arraysize=100)
+            assert next(rows) == {'x': 0, 'y': '0'}
+            assert sum(1 for _ in rows) == 999
+
+    def test_list_functions_stream(self, app):
+        from labman.lib.audit import log_action, get_audit_logs
+        with app.test_request_context():
+            data.init_db()
+            for i in range(5):
+                log_action(None, 'test', f'entry {i}')
+            logs = get_audit_logs(limit=None, action='test', stream=True)
+            assert not isinstance(logs, list)
+            assert [log['details'] for log in logs] == [log['details'] for log in get_audit_logs(action='test')]
+
+
+class TestPagination:
+    @pytest.fixture
+    def items(self, app):
+        """Table with duplicate sort keys so ties must be broken by id"""
+        with app.app_context():
+            db = get_db()
+            db.execute('CREATE TABLE t (id INTEGER PRIMARY KEY, name TEXT)')
+            db.executemany('INSERT INTO t (name) VALUES (?)', [(f'n{i // 3:02d}',) for i in range(25)])
+            db.commit()
+            yield
+
+    def walk(self, descending):
+        from labman.lib.data import paginate
+        pages, cursor = [], None
+        while True:
+            page = paginate('SELECT * FROM t WHERE 1=1', sort_column='name', descending=descending,
+                            cursor=cursor, page_size=10)
+            pages.append(page)
+            if not page.next_cursor:
+                return pages
+            cursor = page.next_cursor
+
+    @pytest.mark.parametrize('descending', [False, True])
+    def test_pages_cover_table_in_order(self, items, descending):
+        pages = self.walk(descending)
+        assert [len(p.items) for p in pages] == [10, 10, 5]
+        assert pages[0].prev_cursor is None
+        rows = [(r['name'], r['id']) for p in pages for r in p.items]
+        assert rows == sorted((tuple(r) for r in data.query_db('SELECT name, id FROM t')), reverse=descending)
+
+    def test_prev_cursor_returns_previous_page(self, items):
+        from labman.lib.data import paginate
+        pages = self.walk(False)
+        back = paginate('SELECT * FROM t WHERE 1=1', sort_column='name', cursor=pages[2].prev_cursor, page_size=10)
+        assert back.items == pages[1].items
+        assert back.next_cursor and back.prev_cursor
+
+    def test_prev_from_short_second_page_returns_full_first_page(self, items):
+        from labman.lib.data import paginate
+        second = paginate('SELECT * FROM t WHERE 1=1', sort_column='name', page_size=20)
+        first_id = data.query_db('SELECT MIN(id) FROM t', one=True)[0]
+        back = paginate('SELECT * FROM t WHERE 1=1', sort_column='name', page_size=20,
+                        cursor=data.encode_cursor('prev', 'n00', first_id + 2))
+        assert back.items == second.items
+        assert back.prev_cursor is None
+
+    def test_invalid_cursor_starts_from_first_page(self, items):
+        from labman.lib.data import paginate
+        first = paginate('SELECT * FROM t WHERE 1=1', sort_column='name', page_size=10)
+        assert paginate('SELECT * FROM t WHERE 1=1', sort_column='name', page_size=10, cursor='garbage!').items == first.items
+        for crafted in ['WyJuZXh0IixbMV0sMV0', data.encode_cursor('next', {'a': 1}, 1), data.encode_cursor('next', True, 1),
+                        data.encode_cursor('next', 'n05', True)]:
+            assert data.decode_cursor(crafted) is None
+            assert paginate('SELECT * FROM t WHERE 1=1', sort_column='name', page_size=10, cursor=crafted).items == first.items
+        assert data.decode_cursor(data.encode_cursor('next', 1.5, 1)) == ('next', 1.5, 1)
+
+    def test_page_seek_uses_index(self, app):
+        from labman.lib.meetings import get_meetings_page
+        with app.test_request_context():
+            data.init_db()
+            cursor = data.encode_cursor('next', '2024-01-01 10:00', 5)
+            plan = data.query_db('''
+                EXPLAIN QUERY PLAN SELECT m.* FROM meetings m WHERE 1=1
+                AND (m.meeting_time, m.id) < (?, ?) ORDER BY m.meeting_time DESC, m.id DESC LIMIT 51
+            ''', ('2024-01-01 10:00', 5))
+            details = ' '.join(row[3] for row in plan)
+            assert 'USING INDEX' in details and 'TEMP B-TREE' not in details
+            assert get_meetings_page(cursor).items == []
@@ -0,0 +1,44 @@
+"""Tests for the shared date/time helpers"""
+from datetime import date, datetime, timezone
+from labman.lib import datetimes
+from labman.lib.datetimes import (format_meeting_datetime, format_meeting_times, parse_datetime, parse_date, to_utc,
+                                  get_timezone, utc_stamp)
+
+
+def test_formats_every_stored_form():
+    for value in ['2026-01-22 10:00:00', '2026-01-22T10:00', '2026-01-22T10:00:00']:
+        assert format_meeting_datetime(value) == '22 Jan, 2026 (Thu) @ 10:00 AM'
+    assert format_meeting_datetime(datetime(2026, 1, 22, 15, 5)) == '22 Jan, 2026 (Thu) @ 03:05 PM'
+    assert format_meeting_datetime('not a date') == 'not a date'
+    assert format_meeting_datetime(None) is None and parse_datetime(None) is None
+
+
+def test_batch_formats_each_distinct_value_once():
+    datetimes._format_meeting.cache_clear()
+    meetings = [{'meeting_time': '2026-01-22 10:00:00'} for _ in range(50)] + [{'meeting_time': '2026-01-23 10:00:00'}]
+    assert format_meeting_times(meetings) is meetings
+    assert meetings[0]['meeting_time'] == '22 Jan, 2026 (Thu) @ 10:00 AM'
+    assert meetings[-1]['meeting_time'] == '23 Jan, 2026 (Fri) @ 10:00 AM'
+    assert datetimes._format_meeting.cache_info().misses == 2
+
+
+def test_utc_conversion(monkeypatch):
+    monkeypatch.setattr(datetimes, 'TIMEZONE', 'Asia/Kolkata')
+    assert get_timezone() is get_timezone('Asia/Kolkata')
+    assert to_utc('2026-01-30 14:52:00') == datetime(2026, 1, 30, 9, 22, tzinfo=timezone.utc)
+    assert utc_stamp(to_utc('2026-01-30T14:52')) == '20260130T092200Z'
+
+
+def test_calendar_exports_agree():
+    from labman.lib.meetings import generate_calendar_links
+    from labman.lib.ics_generator import generate_ics_file
+    meeting = {'id': 1, 'title': 'Sync', 'description': '', 'meeting_time': '2026-01-30 14:52:00'}
+    start = utc_stamp(to_utc(meeting['meeting_time']))
+    assert f'dates={start}/' in generate_calendar_links(meeting)['google']
+    assert f'DTSTART:{start}' in generate_ics_file(meeting)
+
+
+def test_parse_date():
+    assert parse_date('2026-01-30') == parse_date('2026-01-30 14:52:00') == date(2026, 1, 30)
+    assert parse_date(datetime(2026, 1, 30, 9)) == date(2026, 1, 30)
+    assert parse_date('') is None and parse_date('soon') is None and parse_date(None) is None
@@ -0,0 +1,169 @@
+"""Tests for the research group hierarchy"""
+import pytest
+from labman.lib import data
+from labman.lib.data import query_db
+from labman.lib.groups import (create_group, update_group, delete_group, get_group_by_name, get_group_hierarchy,
+                               get_group_descendants, get_subtree_members, add_user_to_group, is_descendant,
+                               rebuild_group_closure)
+
+
+@pytest.fixture
+def ctx(app):
+    with app.test_request_context():
+        data.init_db()
+        yield
+
+
+def gid(name):
+    return get_group_by_name(name)['id']
+
+
+def closure():
+    return sorted(tuple(r) for r in query_db('SELECT ancestor_id, descendant_id, depth FROM group_closure'))
+
+
+def assert_consistent():
+    """The incrementally maintained closure equals one rebuilt from the parent links"""
+    maintained = closure()
+    rebuild_group_closure()
+    assert closure() == maintained
+
+
+@pytest.fixture
+def tree(ctx):
+    #  Physics -> Optics -> Lasers
+    #          -> Condensed
+    create_group('Physics', '')
+    create_group('Optics', '', gid('Physics'))
+    create_group('Lasers', '', gid('Optics'))
+    create_group('Condensed', '', gid('Physics'))
+    create_group('Chemistry', '')
+
+
+def names(groups):
+    return [g['name'] for g in groups]
+
+
+class TestGroupHierarchy:
+    def test_ancestors_and_descendants(self, tree):
+        assert names(get_group_hierarchy(gid('Lasers'))) == ['Physics', 'Optics', 'Lasers']
+        assert get_group_hierarchy(gid('Lasers'))[-1]['parent_name'] == 'Optics'
+        assert names(get_group_descendants(gid('Physics'))) == ['Condensed', 'Optics', 'Lasers']
+        assert [g['depth'] for g in get_group_descendants(gid('Physics'))] == [1, 1, 2]
+        assert is_descendant(gid('Lasers'), gid('Physics')) and not is_descendant(gid('Physics'), gid('Lasers'))
+        assert_consistent()
+
+    def test_inherited_membership(self, tree):
+        add_user_to_group(1, gid('Lasers'))
+        add_user_to_group(1, gid('Optics'))
+        assert [m['id'] for m in get_subtree_members(gid('Physics'))] == [1]
+        assert get_subtree_members(gid('Chemistry')) == []
+
+    def test_moving_a_subtree(self, tree):
+        assert update_group(gid('Optics'), 'Optics', '', gid('Chemistry'))
+        assert names(get_group_hierarchy(gid('Lasers'))) == ['Chemistry', 'Optics', 'Lasers']
+        assert names(get_group_descendants(gid('Physics'))) == ['Condensed']
+        assert_consistent()
+
+        assert update_group(gid('Optics'), 'Optics', '', None)
+        assert names(get_group_hierarchy(gid('Lasers'))) == ['Optics', 'Lasers']
+        assert_consistent()
+
+    def test_cycles_are_rejected(self, tree):
+        assert not update_group(gid('Physics'), 'Physics', '', gid('Lasers'))
+        assert not update_group(gid('Optics'), 'Optics', '', gid('Optics'))
+        assert get_group_by_name('Physics')['parent_id'] is None
+        assert_consistent()
+
+    def test_cycle_check_runs_in_the_move_transaction(self, tree, monkeypatch):
+        from labman.lib import groups
+        depths = []
+        check = groups.is_descendant
+        monkeypatch.setattr(groups, 'is_descendant', lambda *a: depths.append(data.get_db().transaction_depth) or check(*a))
+        assert update_group(gid('Optics'), 'Optics', '', gid('Chemistry'))
+        assert depths and all(depths)
+
+    def test_delete_moves_subgroups_up(self, tree):
+        assert delete_group(gid('Optics'))
+        assert get_group_by_name('Lasers')['parent_id'] == gid('Physics')
+        assert names(get_group_hierarchy(gid('Lasers'))) == ['Physics', 'Lasers']
+        assert_consistent()
+
+    def test_migration_builds_closure(self, app):
+        from labman.lib.migrations import migrate
+        with app.app_context():
+            migrate(data.get_db(), target=8)
+            data.execute_db("INSERT INTO research_groups (id, name) VALUES (10, 'Root')")
+            data.execute_db("INSERT INTO research_groups (id, name, parent_id) VALUES (11, 'Child', 10)")
+            data.execute_db("INSERT INTO research_groups (id, name, parent_id) VALUES (12, 'Orphan', 99)")
+            data.init_db()
+            assert names(get_group_hierarchy(12)) == ['Orphan']
+            assert names(get_group_hierarchy(11)) == ['Root', 'Child']
+            assert_consistent()
+
+
+def find(groups, name):
+    return next(g for g in groups if g['name'] == name)
+
+
+class TestResearchTreeCache:
+    def test_tree_is_cached_until_groups_change(self, tree):
+        from labman.lib.groups import get_research_tree
+        first = get_research_tree()
+        assert get_research_tree() is first
+        assert {'Chemistry', 'Physics'} <= {g['name'] for g in first}
+
+        add_user_to_group(1, gid('Lasers'))
+        second = get_research_tree()
+        assert second is not first
+        lasers = find(find(find(second, 'Physics')['subgroups'], 'Optics')['subgroups'], 'Lasers')
+        assert [m['id'] for m in lasers['members']] == [1]
+
+    def test_member_and_outside_writes_invalidate(self, tree):
+        import sqlite3
+        from labman.lib.groups import get_research_tree
+        from labman.lib.users import update_user
+        add_user_to_group(1, gid('Chemistry'))
+        get_research_tree()
+        user = query_db('SELECT * FROM users WHERE id = 1', one=True)
+        update_user(1, 'Renamed', user['email'], user['is_admin'])
+        assert find(get_research_tree(), 'Chemistry')['members'][0]['name'] == 'Renamed'
+
+        # Written by another process: the trigger still bumps the version
+        other = sqlite3.connect(data.DATABASE)
+        other.execute("UPDATE research_groups SET name = 'Chem' WHERE name = 'Chemistry'")
+        other.commit()
+        other.close()
+        assert find(get_research_tree(), 'Chem')
+
+
+class TestMembershipIndex:
+    def test_checks_follow_membership_changes(self, tree):
+        from labman.lib.groups import remove_user_from_group, get_user_group_ids, get_group_member_ids, is_group_member
+        from labman.lib.auth import check_user_group_access
+        from labman.lib.users import create_user
+        from labman.lib.helpers import get_lab_group
+        assert not is_group_member(1, gid('Optics'))
+        add_user_to_group(1, gid('Optics'))
+        assert is_group_member(1, gid('Optics')) and is_group_member('1', str(gid('Optics')))
+        assert get_group_member_ids(gid('Optics')) == {1}
+
+        assert create_user('Bea', 'bea@example.com', 'password1')
+        bea = query_db("SELECT id FROM users WHERE email = 'bea@example.com'", one=True)['id']
+        assert get_user_group_ids(bea) == {get_lab_group()['id']}
+        assert not check_user_group_access(bea, gid('Optics'))
+        add_user_to_group(bea, gid('Optics'))
+        assert check_user_group_access(bea, gid('Optics'))
+        remove_user_from_group(bea, gid('Optics'))
+        assert get_group_member_ids(gid('Optics')) == {1}
+
+    def test_index_shared_across_requests(self, app, tree):
+        from labman.lib import groups
+        optics = gid('Optics')
+        add_user_to_group(1, optics)
+        index = groups.get_membership_index()
+        with app.test_request_context():
+            assert groups.get_membership_index() is index
+            assert delete_group(optics)
+            assert not groups.is_group_member(1, optics)
+            assert groups.get_membership_index() is not index
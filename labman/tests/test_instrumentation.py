@@ -0,0 +1,117 @@
+"""Tests for per-request SQL instrumentation"""
+import os
+import logging
+import pytest
+from labman.lib import instrumentation
+from labman.lib.data import query_db, execute_db, stream_db
+from labman.lib.instrumentation import normalize_sql, start_request, finish_request
+
+
+@pytest.fixture
+def client(app, monkeypatch):
+    monkeypatch.setattr(instrumentation, 'SQL_REPEAT_WARN', 3)
+    app.before_request(start_request)
+    app.after_request(finish_request)
+
+    @app.route('/single')
+    def single():
+        query_db('SELECT 1')
+        return 'ok'
+
+    @app.route('/loop')
+    def loop():
+        execute_db('CREATE TABLE IF NOT EXISTS t (x INTEGER)')
+        for i in range(5):
+            query_db(f'SELECT * FROM t WHERE x = {i}')
+        list(stream_db('SELECT * FROM t'))
+        return 'ok'
+
+    return app.test_client()
+
+
+class TestNormalize:
+    def test_literals_become_placeholders(self):
+        assert normalize_sql("SELECT * FROM users WHERE id = 42 AND name = 'O''Brien'") == \
+            'SELECT * FROM users WHERE id = ? AND name = ?'
+
+    def test_in_lists_and_whitespace_collapse(self):
+        assert normalize_sql('SELECT *\n  FROM t\n  WHERE id IN (?, ?,?)') == 'SELECT * FROM t WHERE id IN (?)'
+
+    def test_identifiers_with_digits_kept(self):
+        assert normalize_sql('SELECT t1.id FROM t1 LIMIT 10') == 'SELECT t1.id FROM t1 LIMIT ?'
+
+
+class TestRequestStats:
+    def test_debug_headers(self, client, monkeypatch):
+        monkeypatch.setattr(instrumentation, 'SQL_DEBUG_HEADERS', True)
+        response = client.get('/single')
+        assert response.headers['X-SQL-Queries'] == '1'
+        assert float(response.headers['X-SQL-Time-Ms']) >= 0
+
+    def test_headers_off_by_default(self, client):
+        assert 'X-SQL-Queries' not in client.get('/single').headers
+
+    def test_repeated_shape_warns(self, client, caplog):
+        with caplog.at_level(logging.WARNING, logger=instrumentation.__name__):
+            client.get('/loop')
+        warnings = [r.getMessage() for r in caplog.records]
+        assert sum('Possible N+1' in m for m in warnings) == 1
+        summary = next(m for m in warnings if m.startswith('sql '))
+        assert '"queries": 7' in summary
+        assert '"count": 5' in summary and 'WHERE x = ?' in summary
+
+    def test_summary_logged_at_configured_level(self, client, caplog):
+        with caplog.at_level(logging.DEBUG, logger=instrumentation.__name__):
+            client.get('/single')
+        assert any('"path": "/single"' in r.getMessage() for r in caplog.records)
+
+    def test_no_stats_outside_requests(self, app):
+        with app.app_context():
+            query_db('SELECT 1')
+            assert instrumentation.get_request_stats() is None
+
+
+class TestSlowLog:
+    @pytest.fixture
+    def slow_log(self, tmp_path, monkeypatch):
+        path = str(tmp_path / 'slow.log')
+        monkeypatch.setattr(instrumentation, 'SQL_SLOW_LOG', path)
+        monkeypatch.setattr(instrumentation, 'SQL_SLOW_MS', 0.000001)
+        return path
+
+    def test_param_shape_hides_values(self):
+        assert instrumentation.param_shape((1, None, 'bob', '%smith%', 'ab%', 2.5)) == \
+            ['int', 'null', 'text', 'like:%...%', 'like:...%', 'real']
+
+    def test_slow_statement_logged_with_plan(self, app, slow_log):
+        with app.app_context():
+            execute_db('CREATE TABLE t (id INTEGER PRIMARY KEY, name TEXT)')
+            query_db('SELECT * FROM t WHERE name LIKE ?', ('%x%',))
+            query_db('SELECT * FROM t WHERE name LIKE ?', ('%y%',))
+
+        entries = list(instrumentation.read_slow_log(slow_log))
+        scans = [e for e in entries if e['sql'].startswith('SELECT')]
+        assert len(scans) == 2
+        assert scans[0]['params'] == ['like:%...%']
+        assert scans[0]['plan'] == ['SCAN t']
+
+        summary = instrumentation.summarize_slow_log(entries)
+        select = next(item for item in summary if item['sql'].startswith('SELECT'))
+        assert select['count'] == 2
+        assert select['fingerprint'] == instrumentation.fingerprint('SELECT * FROM t WHERE name LIKE ?')
+
+    def test_fast_statements_not_logged(self, app, slow_log, monkeypatch):
+        monkeypatch.setattr(instrumentation, 'SQL_SLOW_MS', 60000)
+        with app.app_context():
+            query_db('SELECT 1')
+        assert not os.path.exists(slow_log)
+
+    def test_slowlog_command(self, app, slow_log):
+        from click.testing import CliRunner
+        from labman.cli import slowlog
+        with app.app_context():
+            execute_db('CREATE TABLE t (id INTEGER PRIMARY KEY, name TEXT)')
+            query_db('SELECT * FROM t WHERE name LIKE ?', ('%x%',))
+        result = CliRunner().invoke(slowlog, ['--file', slow_log])
+        assert result.exit_code == 0
+        assert 'plan: SCAN t' in result.output
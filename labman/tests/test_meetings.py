@@ -0,0 +1,90 @@
+"""Tests for meeting tags"""
+import pytest
+from labman.lib import data
+from labman.lib.data import query_db, execute_db
+from labman.lib.meetings import (create_meeting, update_meeting, delete_meeting, get_meetings_by_tags,
+                                 get_meetings_page, get_all_tags, get_tag_counts)
+
+
+@pytest.fixture
+def ctx(app):
+    with app.test_request_context():
+        data.init_db()
+        yield
+
+
+def meeting_id(title):
+    return query_db('SELECT id FROM meetings WHERE title = ?', (title,), one=True)['id']
+
+
+def titles(meetings):
+    return sorted(m['title'] for m in meetings)
+
+
+class TestMeetingTags:
+    def test_tags_stored_as_rows(self, ctx):
+        assert create_meeting('Kickoff', '', '2026-01-05T10:00', 1, tags=[' ML ', 'Weekly', 'ML', ''])
+        assert query_db('SELECT tags FROM meetings', one=True)['tags'] == 'ML,Weekly'
+        rows = query_db('SELECT tag FROM meeting_tags WHERE meeting_id = ? ORDER BY tag', (meeting_id('Kickoff'),))
+        assert [r['tag'] for r in rows] == ['ML', 'Weekly']
+
+    def test_filter_and_counts_follow_writes(self, ctx):
+        create_meeting('A', '', '2026-01-05T10:00', 1, tags=['ML', 'Weekly'])
+        create_meeting('B', '', '2026-01-06T10:00', 1, tags=['Weekly'])
+        create_meeting('C', '', '2026-01-07T10:00', 1)
+        assert titles(get_meetings_by_tags(['weekly'])) == ['A', 'B']  # case-insensitive
+        assert titles(get_meetings_by_tags(['ml', 'Journal'])) == ['A']
+        assert [m['title'] for m in get_meetings_page(tags=['WEEKLY']).items] == ['B', 'A']
+        assert get_tag_counts() == {'ML': 1, 'Weekly': 2}
+
+        update_meeting(meeting_id('B'), 'B', '', '2026-01-06T10:00', tags=['Journal'])
+        assert get_tag_counts() == {'ML': 1, 'Weekly': 1, 'Journal': 1}
+        delete_meeting(meeting_id('A'))
+        assert get_all_tags() == ['Journal']
+        assert query_db('SELECT COUNT(*) FROM meeting_tags', one=True)[0] == 1
+
+    def test_migration_splits_existing_tags(self, app):
+        from labman.lib.migrations import migrate
+        with app.app_context():
+            migrate(data.get_db(), target=6)
+            execute_db("INSERT INTO meetings (title, meeting_time, created_by, tags) VALUES ('Old', '2025-01-01 10:00:00', 1, ' ML , Weekly,ML,')")
+            execute_db("INSERT INTO meetings (title, meeting_time, created_by, tags) VALUES ('Untagged', '2025-01-02 10:00:00', 1, '')")
+            data.init_db()
+            assert titles(get_meetings_by_tags(['weekly'])) == ['Old']
+            assert get_tag_counts() == {'ML': 1, 'Weekly': 1}
+
+
+class TestMeetingTime:
+    def test_times_stored_canonically(self, ctx):
+        from labman.lib.meetings import normalize_meeting_time
+        assert normalize_meeting_time('2026-01-30T14:52') == '2026-01-30 14:52:00'
+        assert normalize_meeting_time('2026-01-30 14:52:07') == '2026-01-30 14:52:07'
+        with pytest.raises(ValueError):
+            normalize_meeting_time('next tuesday')
+
+        assert create_meeting('Kickoff', '', '2026-01-30T14:52', 1)
+        assert not create_meeting('Broken', '', 'soon', 1)
+        update_meeting(meeting_id('Kickoff'), 'Kickoff', '', '2026-02-01T09:00')
+        assert query_db('SELECT meeting_time FROM meetings', one=True)[0] == '2026-02-01 09:00:00'
+
+    def test_month_is_a_half_open_range(self, ctx):
+        from labman.lib.meetings import get_meetings_by_month
+        for title, when in [('last', '2026-01-31T23:59'), ('first', '2026-02-01T00:00'),
+                            ('end', '2026-02-28T23:30'), ('next', '2026-03-01T00:00')]:
+            create_meeting(title, '', when, 1)
+        assert [m['title'] for m in get_meetings_by_month(2026, 2)] == ['first', 'end']
+        plan = query_db('EXPLAIN QUERY PLAN SELECT * FROM meetings m WHERE m.meeting_time >= ? AND m.meeting_time < ?',
+                        ('2026-02-01', '2026-03-01'))
+        assert any('idx_meetings_meeting_time' in row[-1] for row in plan)
+
+    def test_migration_rewrites_old_formats(self, app):
+        from labman.lib.migrations import migrate
+        with app.app_context():
+            migrate(data.get_db(), target=7)
+            for title, when in [('a', '2026-01-30T14:52'), ('b', '2026-01-30T09:00:00'),
+                                ('c', '2026-01-30 10:00:00'), ('d', '2026-01-30T12:00+05:30')]:
+                execute_db('INSERT INTO meetings (title, meeting_time, created_by) VALUES (?, ?, 1)', (title, when))
+            data.init_db()
+            times = {r['title']: r['meeting_time'] for r in query_db('SELECT title, meeting_time FROM meetings')}
+            assert times == {'a': '2026-01-30 14:52:00', 'b': '2026-01-30 09:00:00', 'c': '2026-01-30 10:00:00',
+                             'd': '2026-01-30T12:00+05:30'}  # left alone rather than shifted to UTC
@@ -0,0 +1,248 @@
+"""
+Tests for the PostgreSQL backend.
+
+The integration tests need a disposable PostgreSQL database; point
+LABMAN_TEST_POSTGRES_DSN at one (its public schema is dropped and recreated
+for every test), e.g.
+
+    LABMAN_TEST_POSTGRES_DSN=postgresql://postgres@localhost/labman_test pytest labman/tests/test_postgres.py
+"""
+import os
+from datetime import date, datetime, timedelta
+import pytest
+from labman.lib import data
+from labman.lib.postgres import translate, Row, is_postgres_url
+
+PG_DSN = os.getenv('LABMAN_TEST_POSTGRES_DSN')
+
+
+class TestTranslate:
+    def test_placeholders(self):
+        assert translate('SELECT * FROM t WHERE a = ? AND b IN (?, ?)') == \
+            'SELECT * FROM t WHERE a = %s AND b IN (%s, %s)'
+
+    def test_literals_left_alone(self):
+        assert translate("SELECT '?', \"a?\" FROM t WHERE x = ?") == "SELECT '?', \"a?\" FROM t WHERE x = %s"
+
+    def test_percent_escaped(self):
+        assert translate("SELECT 100 % 7, 'a%' FROM t") == "SELECT 100 %% 7, 'a%%' FROM t"
+
+    def test_like_is_case_insensitive(self):
+        assert translate("WHERE name LIKE ? AND tags NOT like ?") == "WHERE name ILIKE %s AND tags NOT ILIKE %s"
+
+    def test_comments_left_alone(self):
+        assert translate('-- why?\nSELECT ? /* or? */') == '-- why?\nSELECT %s /* or? */'
+
+    def test_explain(self):
+        assert translate('EXPLAIN QUERY PLAN SELECT 1') == 'EXPLAIN SELECT 1'
+
+    def test_url_scheme(self):
+        assert is_postgres_url('postgresql://u@host/db') and is_postgres_url('postgres://host/db')
+        assert not is_postgres_url('sqlite:///x.db') and not is_postgres_url('')
+
+
+def test_row_behaves_like_sqlite_row():
+    row = Row((1, 'Ada'), {'id': 0, 'name': 1})
+    assert row[0] == 1 and row['name'] == 'Ada'
+    assert dict(row) == {'id': 1, 'name': 'Ada'}
+    assert tuple(row) == (1, 'Ada')
+
+
+@pytest.fixture
+def pg_app(app, monkeypatch):
+    """The test app wired to a freshly emptied PostgreSQL database"""
+    if not PG_DSN:
+        pytest.skip('LABMAN_TEST_POSTGRES_DSN is not set')
+    psycopg = pytest.importorskip('psycopg')
+    with psycopg.connect(PG_DSN, autocommit=True) as conn:
+        conn.execute('DROP SCHEMA public CASCADE')
+        conn.execute('CREATE SCHEMA public')
+    monkeypatch.setattr(data, 'DATABASE_URL', PG_DSN)
+    monkeypatch.setattr(data, '_schema_ready', set())
+    with app.test_request_context():
+        data.init_db()
+        yield app
+
+
+@pytest.fixture
+def no_email(monkeypatch):
+    from labman.lib import email_service
+    monkeypatch.setattr(email_service, 'send_activation_email', lambda *args: True)
+
+
+class TestPostgres:
+    def test_schema_and_defaults(self, pg_app):
+        from labman.lib.migrations import get_schema_version, latest_version
+        db = data.get_db()
+        assert data.get_pool().backend == 'postgresql'
+        assert get_schema_version(db) == latest_version(data.get_pool().migrations_dir) == latest_version()
+        admin = data.query_db('SELECT * FROM users WHERE is_admin = 1', one=True)
+        assert admin['name'] == 'Admin User'
+        assert isinstance(admin['created_at'], str) and len(admin['created_at']) == 19
+
+        data.init_db()  # idempotent
+        assert data.query_db('SELECT COUNT(*) FROM users', one=True)[0] == 1
+
+    def test_create_user_uses_lastrowid(self, pg_app, no_email):
+        from labman.lib.users import create_user, get_user_by_email, verify_reset_token, get_latest_activation_token
+        from labman.lib.groups import add_user_to_group, get_all_groups_with_counts
+        from labman.lib.helpers import get_lab_group, get_lab_name
+        assert create_user('Ada Lovelace', 'ada@example.com', None)
+        user = get_user_by_email('ada@example.com')
+        assert user['id'] > 1
+
+        lab = get_lab_group()
+        assert add_user_to_group(user['id'], lab['id'])  # already a member: ON CONFLICT DO NOTHING
+        counts = {g['name']: g['member_count'] for g in get_all_groups_with_counts()}
+        assert counts[get_lab_name()] == 2
+
+        token = get_latest_activation_token(user['id'])['token']
+        assert verify_reset_token(token) == user['id']
+
+        from labman.lib.users import get_user_directory
+        directory = get_user_directory(search='LOVELACE')
+        assert [(u['status'], u['activation_sent_at'] is not None) for u in directory.items] == [('pending', True)]
+        assert get_user_directory(search='%').items == get_user_directory(search='a_a').items == []
+
+    def test_meeting_queries(self, pg_app):
+        from labman.lib.meetings import (create_meeting, get_meetings_this_week, get_meetings_by_month,
+                                         record_meeting_response, get_meeting_responses, get_all_tags,
+                                         get_meetings_page)
+        today = date.today()
+        monday = today - timedelta(days=today.weekday())
+        for title, day in [('before', monday - timedelta(days=1)), ('monday', monday),
+                           ('sunday', monday + timedelta(days=6)), ('after', monday + timedelta(days=7))]:
+            assert create_meeting(title, '', f'{day.isoformat()}T23:30', 1, tags=['ML', 'Weekly'])
+
+        assert [m['title'] for m in get_meetings_this_week()] == ['monday', 'sunday']
+        in_month = get_meetings_by_month(monday.year, monday.month)
+        assert 'monday' in [m['title'] for m in in_month]
+        assert all(m['meeting_time'].startswith(f'{monday.year}-{monday.month:02d}') for m in in_month)
+        assert get_all_tags() == ['ML', 'Weekly']
+
+        meeting_id = get_meetings_this_week()[0]['id']
+        assert record_meeting_response(meeting_id, 1, 'wont_join')
+        assert [r['response'] for r in get_meeting_responses(meeting_id)] == ['wont_join']
+
+        page = get_meetings_page(page_size=3, tags=['ml'])
+        assert len(page.items) == 3 and page.next_cursor
+        assert [m['title'] for m in get_meetings_page(page.next_cursor, page_size=3).items] == ['before']
+
+    def test_transactions(self, pg_app):
+        data.execute_db('CREATE TABLE t (x INTEGER UNIQUE)')
+        with data.transaction():
+            data.execute_db('INSERT INTO t VALUES (?)', (1,))
+            with pytest.raises(Exception):
+                with data.transaction():
+                    data.execute_db('INSERT INTO t VALUES (?)', (2,))
+                    data.execute_db('INSERT INTO t VALUES (?)', (1,))  # unique violation
+            data.execute_db('INSERT INTO t VALUES (?)', (3,))
+        assert [r['x'] for r in data.stream_db('SELECT x FROM t ORDER BY x', arraysize=1)] == [1, 3]
+
+        with pytest.raises(RuntimeError):
+            with data.transaction():
+                data.execute_db('INSERT INTO t VALUES (?)', (4,))
+                raise RuntimeError('undo')
+        assert data.query_db('SELECT COUNT(*) FROM t', one=True)[0] == 2
+        assert not data.get_db().in_transaction
+
+    def test_case_insensitive_search(self, pg_app):
+        from labman.lib.inventory import add_inventory_item, search_inventory
+        assert add_inventory_item('Oscilloscope', 'Tektronix 100% digital', 2, 'Lab A')
+        assert [i['name'] for i in search_inventory('oscillo')] == ['Oscilloscope']
+
+    def test_slow_query_plan(self, pg_app):
+        from labman.lib import instrumentation
+        plan = instrumentation.explain(data.get_db(), 'SELECT * FROM users WHERE email = ?', ('a@b.c',))
+        assert plan and any('users' in line for line in plan)
+
+    def test_lab_timestamps_roundtrip(self, pg_app, no_email):
+        from labman.lib.meetings import create_meeting, get_meeting_by_id
+        from labman.lib.datetimes import format_meeting_datetime
+        assert create_meeting('Kickoff', '', '2026-01-30T14:52', 1)
+        meeting = get_meeting_by_id(data.query_db('SELECT MAX(id) FROM meetings', one=True)[0])
+        assert meeting['meeting_time'] == '2026-01-30 14:52:00'
+        assert format_meeting_datetime(meeting['meeting_time']).startswith('30 Jan, 2026')
+        assert meeting['created_at'] <= datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')
+
+    def test_content_search(self, pg_app):
+        from labman.lib.content import search_content, _PG_DOCUMENT
+        for title, description, filename in [('Lab meeting', 'the telescope schedule', 'a.pdf'),
+                                             ('Telescope schedule', '', 'b.pdf'),
+                                             ('Other', '', 'report_v2.pdf')]:
+            data.execute_db('INSERT INTO content (title, description, filename, file_path, uploaded_by) VALUES (?, ?, ?, ?, 1)',
+                            (title, description, filename, '/tmp/' + filename))
+        assert [c['title'] for c in search_content('telesc')] == ['Telescope schedule', 'Lab meeting']
+        assert [c['title'] for c in search_content('v2 REPORT')] == ['Other']
+        assert search_content('telescope', user_id=2) == [] and search_content("'&!") == []
+
+        data.get_db().execute('SET enable_seqscan = off')
+        plan = data.query_db(f"EXPLAIN SELECT id FROM content c WHERE {_PG_DOCUMENT} @@ to_tsquery('simple', 'x:*')")
+        assert any('idx_content_search' in row[0] for row in plan)
+        data.get_db().execute('SET enable_seqscan = on')
+
+    def test_document_text_search(self, pg_app, tmp_path):
+        from labman.lib.content import search_content, _PG_BODY
+        from labman.lib.extraction import index_content_text
+        path = tmp_path / 'paper.txt'
+        path.write_text(' '.join(['filler'] * 2000) + ' superconducting vortices\x00 at low temperature')
+        data.execute_db("INSERT INTO content (title, filename, file_path, uploaded_by) VALUES ('Paper', 'paper.txt', ?, 1)", (str(path),))
+        content_id = data.query_db('SELECT MAX(id) FROM content', one=True)[0]
+        assert index_content_text(data.get_db(), content_id) == 'indexed'
+        assert [c['title'] for c in search_content('"superconducting vortices" temp')] == ['Paper']
+        assert search_content('"vortices superconducting"') == []
+
+        data.get_db().execute('SET enable_seqscan = off')
+        plan = data.query_db(f"EXPLAIN SELECT id FROM content_chunks ch WHERE {_PG_BODY} @@ to_tsquery('simple', 'x:*')")
+        assert any('idx_content_chunks_search' in row[0] for row in plan)
+        data.get_db().execute('SET enable_seqscan = on')
+
+        data.execute_db('DELETE FROM content WHERE id = ?', (content_id,))
+        assert data.query_db('SELECT COUNT(*) FROM content_chunks', one=True)[0] == 0
+
+    def test_group_writes_bump_data_version(self, pg_app):
+        from labman.lib.cache import get_data_version
+        from labman.lib.groups import create_group, get_research_tree
+        before = get_data_version('groups')
+        tree = get_research_tree()
+        assert get_research_tree() is tree
+        create_group('Optics', '')
+        assert get_data_version('groups') > before
+        assert 'Optics' in [g['name'] for g in get_research_tree()]
+        version = get_data_version('groups')
+        data.execute_db("UPDATE users SET name = 'Renamed' WHERE id = 1")
+        assert get_data_version('groups') > version
+        from labman.lib.groups import add_user_to_group, is_group_member, get_group_by_name
+        optics = get_group_by_name('Optics')['id']
+        assert not is_group_member(1, optics)
+        add_user_to_group(1, optics)
+        assert is_group_member(1, optics)
+        from labman.lib.groups import update_group, get_group_hierarchy
+        lasers = create_group('Lasers', '', optics) and get_group_by_name('Lasers')['id']
+        assert not update_group(optics, 'Optics', '', lasers)
+        assert [g['name'] for g in get_group_hierarchy(lasers)] == ['Optics', 'Lasers']
+
+    def test_research_portfolio(self, pg_app):
+        from labman.lib.research import add_research_task, get_research_portfolio
+        assert add_research_task(1, 'Survey', '2026-03-20', start_date='2026-03-02')
+        page = get_research_portfolio('2026-03-01', '2026-03-21', group_id=1)
+        assert [row['task']['task_name'] for row in page.items[0]['plan']['timeline']['rows']] == ['Survey']
+
+        from labman.lib.cache import get_data_version
+        from labman.lib.research import get_research_timeline
+        plan = get_research_timeline(1, '2026-03-01', '2026-03-21')
+        data.execute_db("INSERT INTO users (id, name, email) VALUES (2, 'Bea', 'bea@example.com')")
+        data.execute_db("INSERT INTO research_tasks (user_id, task_name) VALUES (2, 'Elsewhere')")
+        assert get_research_timeline(1, '2026-03-01', '2026-03-21') is plan
+        data.execute_db("UPDATE research_tasks SET user_id = 2 WHERE user_id = 1")
+        assert get_research_timeline(1, '2026-03-01', '2026-03-21')['tasks'] == []
+        assert get_data_version('research:2') == 2
+
+    def test_upload_records_size_and_hash(self, pg_app, tmp_path):
+        import hashlib
+        from io import BytesIO
+        from werkzeug.datastructures import FileStorage
+        from labman.lib.content import upload_content
+        assert upload_content(FileStorage(BytesIO(b'spectrum'), filename='s.csv'), 'Spectrum', '', 1, upload_folder=str(tmp_path))
+        row = data.query_db('SELECT file_size, sha256 FROM content', one=True)
+        assert (row['file_size'], row['sha256']) == (8, hashlib.sha256(b'spectrum').hexdigest())
@@ -0,0 +1,69 @@
+"""
+Query-plan regression tests.
+
+Runs every read query in the meetings, content, groups, audit and users
+modules against a synthetic dataset and fails when its plan falls back to a
+full SCAN of a large table (see benchmark_queries.LARGE_TABLES). Run
+``python -m labman.tests.benchmark_queries`` for timings at full scale.
+"""
+import os
+import pytest
+from labman.lib import data
+from labman.tests.benchmark_queries import (QUERY_CASES, create_app, generate_dataset, capture_statements,
+                                            explain, large_table_scans)
+
+# Listing the whole table is the point of these; they are paginated or
+# streamed by their callers instead
+FULL_LISTINGS = {
+    'meetings.get_all_meetings',
+    'content.get_content',
+    'groups.get_research_tree',
+    'groups.get_membership_index',
+    'audit.get_audit_logs_export',
+    'users.get_all_users',
+}
+
+# Known scans awaiting a query rewrite. strict=True makes the test fail once
+# a case is fixed, so it has to be removed from this list.
+KNOWN_SCANS = {}
+
+
+@pytest.fixture(scope='module')
+def dataset(tmp_path_factory):
+    original = data.DATABASE
+    app = create_app(str(tmp_path_factory.mktemp('plans') / 'plans.db'))
+    with app.app_context():
+        db = data.get_db()
+        data.migrate(db)
+        samples = generate_dataset(db, scale=float(os.getenv('LABMAN_PLAN_SCALE', '0.05')))
+    yield app, samples
+    data.get_pool().close_all()
+    data.DATABASE = original
+
+
+def case_params():
+    params = []
+    for name, run in QUERY_CASES:
+        marks = [pytest.mark.xfail(reason=KNOWN_SCANS[name], strict=True)] if name in KNOWN_SCANS else []
+        params.append(pytest.param(name, run, id=name, marks=marks))
+    return params
+
+
+@pytest.mark.parametrize('name,run', case_params())
+def test_query_avoids_full_scans(dataset, name, run):
+    app, samples = dataset
+    with app.test_request_context():
+        statements = capture_statements(run, samples)
+        assert statements, f"{name} ran no SQL"
+        if name in FULL_LISTINGS:
+            return
+        for sql, args in statements:
+            scans = large_table_scans(sql, explain(sql, args))
+            assert not scans, f"{name} scans a large table: {scans}\n{sql}"
+
+
+def test_large_table_scans_resolves_aliases():
+    sql = 'SELECT m.* FROM meetings m LEFT JOIN users u ON m.created_by = u.id WHERE m.title = ?'
+    assert large_table_scans(sql, ['SCAN m', 'SEARCH u USING INTEGER PRIMARY KEY (rowid=?)']) == ['SCAN m']
+    assert large_table_scans('SELECT * FROM research_groups', ['SCAN research_groups']) == []
+    assert large_table_scans('SELECT * FROM users ORDER BY name LIMIT 5', ['SCAN users USING INDEX idx_users_name']) == []
@@ -0,0 +1,132 @@
+"""Tests for research plans and their timeline layout"""
+import pytest
+from labman.lib import data
+from labman.lib.research import (layout_timeline, get_research_plan, get_research_plans, get_research_timeline,
+                                 get_research_portfolio, add_research_task)
+
+
+def bars(timeline):
+    return {row['task']['task_name']: (round(row['left_pct'], 2), round(row['width_pct'], 2)) for row in timeline['rows']}
+
+
+class TestLayoutTimeline:
+    def test_bars_are_clipped_to_the_window(self):
+        tasks = [
+            {'task_name': 'inside', 'start_date': '2026-03-05', 'due_date': '2026-03-10'},
+            {'task_name': 'left', 'start_date': '2026-02-20', 'due_date': '2026-03-06'},
+            {'task_name': 'right', 'start_date': '2026-03-15 09:00:00', 'due_date': '2026-04-01'},
+            {'task_name': 'open', 'created_at': '2026-03-11 12:00:00', 'due_date': None},
+            {'task_name': 'undated'},
+            {'task_name': 'before', 'start_date': '2026-01-01', 'due_date': '2026-02-01'},
+            {'task_name': 'after', 'start_date': '2026-04-01', 'due_date': '2026-04-02'},
+        ]
+        timeline = layout_timeline(tasks, '2026-03-01', '2026-03-21')
+        assert (timeline['start'], timeline['end']) == ('2026-03-01', '2026-03-21')
+        assert bars(timeline) == {
+            'inside': (20.0, 25.0),
+            'left': (0, 25.0),
+            'right': (70.0, 30.0),
+            'open': (50.0, 50.0),
+            'undated': (0.0, 100.0),
+        }
+        right = next(row for row in timeline['rows'] if row['task']['task_name'] == 'right')
+        assert (right['start'], right['end']) == ('2026-03-15', '2026-04-01')
+
+    def test_task_due_before_its_start(self):
+        tasks = [{'task_name': 'inverted', 'start_date': '2026-10-20', 'due_date': '2026-10-15'}]
+        timeline = layout_timeline(tasks, '2026-10-01', '2026-10-22')
+        assert bars(timeline) == {'inverted': (90.48, 0.0)}
+        assert timeline['rows'][0]['end'] == '2026-10-15'
+
+    def test_empty_window(self):
+        assert layout_timeline([{'task_name': 'x'}], '2026-03-01', '2026-03-01') is None
+        assert layout_timeline([{'task_name': 'x'}], None, '2026-03-01') is None
+
+
+@pytest.fixture
+def ctx(app):
+    with app.test_request_context():
+        data.init_db()
+        yield
+
+
+class TestResearchTimeline:
+    def test_plan_date_range(self, ctx):
+        add_research_task(1, 'Survey', '2026-03-20', start_date='2026-03-02')
+        add_research_task(1, 'Draft', None, start_date='2026-03-10')
+        plan = get_research_plan(1)
+        assert (plan['start_date'], plan['end_date']) == ('2026-03-02', '2026-03-20')
+
+    def test_cached_per_plan_version(self, ctx):
+        assert get_research_timeline(1, '2026-03-01', '2026-03-21')['timeline'] is None
+        add_research_task(1, 'Survey', '2026-03-20', start_date='2026-03-02')
+        plan = get_research_timeline(1, '2026-03-01', '2026-03-21')
+        assert get_research_timeline(1, '2026-03-01', '2026-03-21') is plan
+        assert bars(plan['timeline']) == {'Survey': (5.0, 90.0)}
+        add_research_task(1, 'Draft', '2026-03-21', start_date='2026-03-11')
+        assert len(get_research_timeline(1, '2026-03-01', '2026-03-21')['timeline']['rows']) == 2
+
+    def test_other_plans_keep_their_cached_timeline(self, ctx):
+        from labman.lib.cache import get_data_version
+        data.execute_db("INSERT INTO users (name, email) VALUES ('Bea', 'bea@example.com')")
+        other = data.query_db("SELECT id FROM users WHERE name = 'Bea'", one=True)['id']
+        add_research_task(1, 'Survey', '2026-03-20', start_date='2026-03-02')
+        plan = get_research_timeline(1, '2026-03-01', '2026-03-21')
+        add_research_task(other, 'Elsewhere', '2026-03-20')
+        data.execute_db("UPDATE research_tasks SET status = 'done' WHERE user_id = ?", (other,))
+        assert get_research_timeline(1, '2026-03-01', '2026-03-21') is plan
+
+        data.execute_db("INSERT INTO content (title, filename, file_path, uploaded_by, research_plan_id) VALUES ('Notes', 'n.txt', '/tmp/n.txt', 1, 1)")
+        assert [d['title'] for d in get_research_timeline(1, '2026-03-01', '2026-03-21')['documents']] == ['Notes']
+        before = get_data_version(f'research:{other}')
+        data.execute_db('UPDATE research_tasks SET user_id = ? WHERE user_id = 1', (other,))
+        assert get_research_timeline(1, '2026-03-01', '2026-03-21')['tasks'] == []
+        assert get_data_version(f'research:{other}') > before
+
+
+class TestResearchPortfolio:
+    @pytest.fixture
+    def lab(self, ctx):
+        from labman.lib.groups import create_group, add_user_to_group, get_group_by_name
+        for name in ['Bea', 'Cy', 'Dee']:
+            data.execute_db('INSERT INTO users (name, email, password_hash) VALUES (?, ?, ?)',
+                            (name, f'{name.lower()}@example.com', 'x'))
+        ids = {row['name']: row['id'] for row in data.query_db('SELECT id, name FROM users')}
+        add_research_task(ids['Bea'], 'Survey', '2026-03-20', start_date='2026-03-02')
+        add_research_task(ids['Cy'], 'Build rig', '2026-03-15', start_date='2026-03-05')
+        add_research_task(ids['Cy'], 'Measure', None, start_date='2026-03-16')
+        data.execute_db("INSERT INTO content (title, filename, file_path, uploaded_by, research_plan_id) "
+                        "VALUES ('Notes', 'notes.txt', '/tmp/notes.txt', ?, ?)", (ids['Cy'], ids['Cy']))
+        data.execute_db("INSERT INTO research_plans (user_id, problem_statement) VALUES (?, 'Optics')", (ids['Dee'],))
+        create_group('Physics', '')
+        create_group('Optics', '', get_group_by_name('Physics')['id'])
+        add_user_to_group(ids['Cy'], get_group_by_name('Optics')['id'])
+        return ids
+
+    def test_bulk_load_matches_single_plans(self, lab, monkeypatch):
+        statements = []
+        record_query = data.record_query
+        monkeypatch.setattr(data, 'record_query', lambda sql, *a: statements.append(sql) or record_query(sql, *a))
+        plans = get_research_plans(lab.values())
+        assert len(statements) == 3
+        monkeypatch.undo()
+        for user_id, plan in plans.items():
+            single = get_research_plan(user_id)
+            assert [t['id'] for t in plan['tasks']] == [t['id'] for t in single['tasks']]
+            assert [d['id'] for d in plan['documents']] == [d['id'] for d in single['documents']]
+            assert plan['problem_statement'] == single['problem_statement']
+        assert plans[lab['Dee']]['problem_statement'] == 'Optics' and plans[lab['Dee']]['tasks'] == []
+        assert len(plans[lab['Cy']]['documents']) == 1
+
+    def test_pages_and_group_filter(self, lab):
+        from labman.lib.groups import get_group_by_name
+        first = get_research_portfolio('2026-03-01', '2026-03-21', page_size=2)
+        assert [m['name'] for m in first.items] == ['Admin User', 'Bea']
+        assert bars(first.items[1]['plan']['timeline']) == {'Survey': (5.0, 90.0)}
+        assert first.items[0]['plan']['timeline'] is None
+        second = get_research_portfolio('2026-03-01', '2026-03-21', first.next_cursor, page_size=2)
+        assert [m['name'] for m in second.items] == ['Cy', 'Dee']
+        assert bars(second.items[0]['plan']['timeline']) == {'Build rig': (20.0, 50.0), 'Measure': (75.0, 25.0)}
+
+        physics = get_research_portfolio('2026-03-01', '2026-03-21', group_id=get_group_by_name('Physics')['id'])
+        assert [m['name'] for m in physics.items] == ['Cy']
@@ -0,0 +1,47 @@
+"""Tests for the user directory"""
+import pytest
+from labman.lib import data
+from labman.lib.users import get_user_directory
+
+
+@pytest.fixture
+def directory(app):
+    with app.test_request_context():
+        data.init_db()
+        data.execute_db("UPDATE users SET name = 'Admin' WHERE id = 1")
+        for i, name in enumerate(['Alice', 'Bob', 'Carol', 'Dan']):
+            data.execute_db('INSERT INTO users (name, email, password_hash) VALUES (?, ?, ?)',
+                            (name, f'{name.lower()}@example.com', None if i % 2 else 'hash'))
+        bob = data.query_db("SELECT id FROM users WHERE name = 'Bob'", one=True)['id']
+        for created_at, used in [('2026-01-01 10:00:00', 0), ('2026-01-02 10:00:00', 0), ('2026-01-03 10:00:00', 1)]:
+            data.execute_db('INSERT INTO password_reset_tokens (user_id, token, expires_at, used, created_at) '
+                            'VALUES (?, ?, ?, ?, ?)', (bob, created_at, '2030-01-01 00:00:00', used, created_at))
+        yield
+
+
+class TestUserDirectory:
+    def test_status_and_latest_token(self, directory):
+        users = {u['name']: u for u in get_user_directory().items}
+        assert [u['status'] for u in users.values()] == ['active', 'active', 'pending', 'active', 'pending']
+        assert users['Bob']['activation_sent_at'] == '2026-01-02 10:00:00'
+        assert users['Dan']['activation_sent_at'] is None
+        assert users['Alice']['activation_sent_at'] is None
+        assert 'password_hash' not in users['Alice']
+
+    def test_pages_and_search(self, directory):
+        first = get_user_directory(page_size=2)
+        assert [u['name'] for u in first.items] == ['Admin', 'Alice']
+        second = get_user_directory(first.next_cursor, page_size=2)
+        assert [u['name'] for u in second.items] == ['Bob', 'Carol']
+        assert [u['name'] for u in get_user_directory(search='CAROL@').items] == ['Carol']
+        assert [u['name'] for u in get_user_directory(search='a', page_size=2).items] == ['Admin', 'Alice']
+        assert get_user_directory(search='nobody').items == []
+        assert get_user_directory(search='%').items == get_user_directory(search='a_i').items == []
+        assert [u['name'] for u in get_user_directory(search='ali').items] == ['Alice']
+
+    def test_one_query_per_page(self, directory, monkeypatch):
+        calls = []
+        query_db = data.query_db
+        monkeypatch.setattr(data, 'query_db', lambda *a, **k: calls.append(a) or query_db(*a, **k))
+        get_user_directory()
+        assert len(calls) == 1